@@ -0,0 +1,76 @@
+import csv
+import json
+import logging
+from datetime import datetime, timedelta
+from itertools import batched
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping
+
+from app.core.model.call import CASE_SEPARATOR, Call
+from app.core.ports.api.calls_port_api import CallsPortAPI
+
+logger = logging.getLogger(__name__)
+
+
+def record_to_call(record: Mapping) -> Call:
+    """
+    Converts an imported record to a new call.
+
+    A record has a "phone_number", an ISO 8601 "start_time", a "duration" in seconds and "cases", which is either a
+    list of case identifiers or a string of identifiers separated by semicolons.
+    """
+
+    cases = record.get("cases") or ()
+    if isinstance(cases, str):
+        cases = (case.strip() for case in cases.split(CASE_SEPARATOR))
+
+    return Call(
+        None,
+        str(record["phone_number"]),
+        datetime.fromisoformat(record["start_time"]),
+        timedelta(seconds=int(record["duration"])),
+        tuple(case for case in cases if case)
+    )
+
+
+def read_csv_records(path: Path) -> Iterator[Mapping]:
+    with path.open(newline='', encoding="UTF-8") as file:
+        yield from csv.DictReader(file)
+
+
+def read_jsonl_records(path: Path) -> Iterator[Mapping]:
+    with path.open(encoding="UTF-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+READERS = {
+    ".csv": read_csv_records,
+    ".jsonl": read_jsonl_records,
+}
+
+
+class FileImportAdapterAPI:
+    def __init__(self, calls_port_api: CallsPortAPI, batch_size: int = 5000):
+        assert batch_size > 0
+
+        self.calls_port_api = calls_port_api
+        self.batch_size = batch_size
+
+    def import_calls(self, calls: Iterable[Call]) -> int:
+        imported = 0
+        for batch in batched(calls, self.batch_size):
+            imported += len(self.calls_port_api.create_calls(batch))
+        return imported
+
+    def import_file(self, path: Path) -> int:
+        try:
+            reader = READERS[path.suffix.lower()]
+        except KeyError:
+            logger.exception("Unsupported import file '%s'", path)
+            raise ValueError(f"Unsupported import file '{path}'")
+
+        imported = self.import_calls(map(record_to_call, reader(path)))
+        logger.info("Imported %d calls from '%s'", imported, path)
+        return imported
@@ -1,17 +1,26 @@
+import heapq
+import logging
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Callable, Iterable, Optional
 
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QDateTime, Qt
+from PySide6.QtCore import QDateTime, QEvent, QObject, QRunnable, QThreadPool, QTimer, Qt, Signal
 
-from app.core.model.call import Call
+from app.core.model.call import Call, to_seconds
+from app.core.model.call_events import CallCreated, CallDeleted, CallEvent, CallUpdated
+from app.core.model.report_progress import ReportCancelledError, ReportProgress
+from app.core.model.summary import CallerStatistics
 from app.gui.util import Call as QtCall
+from app.gui.util import CallerStatistics as QtCallerStatistics
 from app.gui.util import NewCall as QtNewCall
 from app.core.ports.api.calls_port_api import CallsPortAPI
 from app.core.ports.api.report_port_api import ReportPortAPI
 from app.gui.main_window import MainWindow
 
+logger = logging.getLogger(__name__)
+
 
 def qt_call_to_call(qt_call: QtCall | QtNewCall) -> Call:
     return Call(
@@ -33,12 +42,145 @@ def call_to_qt_call(call: Call) -> QtCall:
     )
 
 
+def datetime_to_qt_datetime(moment: datetime) -> QDateTime:
+    return QDateTime.fromString(moment.isoformat(), Qt.DateFormat.ISODate)
+
+
+def caller_statistics_to_qt_caller_statistics(caller_statistics: CallerStatistics) -> QtCallerStatistics:
+    return (
+        caller_statistics.phone_number,
+        caller_statistics.call_count,
+        round(caller_statistics.total_duration.total_seconds()),
+        round(caller_statistics.average_duration.total_seconds()),
+        datetime_to_qt_datetime(caller_statistics.first_start_time),
+        datetime_to_qt_datetime(caller_statistics.last_start_time)
+    )
+
+
+class _RangeStatistics:
+    """
+    The summary and caller statistics of the calls in the table, kept up to date from the call events instead of being
+    queried again after every change.
+    """
+
+    def __init__(self, calls: Iterable[Call] = ()) -> None:
+        self.call_count = 0
+        self.total_duration = timedelta()
+        self._calls: dict[int, Call] = {}
+        self._calls_by_phone_number: dict[str, dict[int, Call]] = {}
+        self._callers: dict[str, CallerStatistics] = {}
+        # Callers are summed up again only when they are next asked for, once however many of their calls changed
+        self._stale: set[str] = set()
+        for call in calls:
+            self.add(call)
+
+    def add(self, call: Call) -> None:
+        self.remove(call.id)
+        self._calls[call.id] = call
+        self._calls_by_phone_number.setdefault(call.phone_number, {})[call.id] = call
+        self._stale.add(call.phone_number)
+        self.call_count += 1
+        self.total_duration += call.duration
+
+    def remove(self, id_: int) -> None:
+        call = self._calls.pop(id_, None)
+        if call is None:
+            return
+        calls = self._calls_by_phone_number[call.phone_number]
+        del calls[id_]
+        if not calls:
+            del self._calls_by_phone_number[call.phone_number]
+        self._stale.add(call.phone_number)
+        self.call_count -= 1
+        self.total_duration -= call.duration
+
+    def top_callers(self, limit: int) -> list[CallerStatistics]:
+        for phone_number in self._stale:
+            calls = self._calls_by_phone_number.get(phone_number)
+            if calls is None:
+                self._callers.pop(phone_number, None)
+                continue
+            start_times = [call.start_time for call in calls.values()]
+            self._callers[phone_number] = CallerStatistics(phone_number, len(calls),
+                                                           sum((call.duration for call in calls.values()), timedelta()),
+                                                           min(start_times), max(start_times))
+        self._stale.clear()
+        # In the order the calls SPI ranks them in
+        return heapq.nsmallest(limit, self._callers.values(),
+                               key=lambda caller: (-caller.call_count, -caller.total_duration, caller.phone_number))
+
+
+class ReportWorkerSignals(QObject):
+    progressed = Signal(tuple)  # Rows fetched, intervals grouped, bytes written
+    finished = Signal(str)  # Status message
+
+
+class ReportWorker(QRunnable):
+    """
+    Generates and exports a report on a thread pool thread, reporting progress back through queued signals.
+    """
+
+    def __init__(self, report_port_api: ReportPortAPI, start: datetime, end: datetime, interval_size: timedelta,
+                 name: str, flavor: str) -> None:
+        super().__init__()
+        self.signals = ReportWorkerSignals()
+        self.progress = ReportProgress(self._progressed)
+
+        self._report_port_api = report_port_api
+        self._request = (start, end, interval_size, name, flavor)
+
+    def _progressed(self, progress: ReportProgress) -> None:
+        self.signals.progressed.emit((progress.rows_fetched, progress.intervals_grouped, progress.bytes_written))
+
+    def run(self) -> None:
+        try:
+            report = self._report_port_api.export_report(*self._request, self.progress)
+        except ReportCancelledError:
+            logger.info("Report generation cancelled")
+            self.signals.finished.emit("Report cancelled")
+        except Exception as exception:
+            logger.exception("Report generation failed")
+            self.signals.finished.emit(f"Report failed: {exception}")
+        else:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Report cache: %s", self._report_port_api.get_cache_statistics())
+            self.signals.finished.emit(f"Report saved: {report.call_count} calls, {report.interval_count} intervals")
+
+
+class CallEventSignals(QObject):
+    received = Signal(object)  # CallEvent
+
+
+class FirstPaintFilter(QObject):
+    painted = Signal()
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            self.painted.emit()
+        return False
+
+
 class QTAdapterAPI:
-    def __init__(self, calls_port_api: CallsPortAPI, report_port_api: ReportPortAPI):
+    def __init__(self, calls_port_api: CallsPortAPI, report_port_api: ReportPortAPI, date_range_debounce: int = 150,
+                 top_callers: int = 10, first_paint_timeout: int = 1000,
+                 startup_phase: Optional[Callable[[str], None]] = None):
+        """
+        The window is shown before anything is read from the ports. Calls are first loaded once it has been painted,
+        or after first_paint_timeout milliseconds if it is not painted before then.
+
+        :param startup_phase: Called with the name of every phase of startup as it ends
+        """
+
         self.calls_port_api = calls_port_api
         self.report_port_api = report_port_api
+        self.top_callers = top_callers
+        self._startup_phase = startup_phase
 
         self.app = QApplication(sys.argv)
+        self.thread_pool = QThreadPool()
+        self._report_worker: Optional[ReportWorker] = None
+        self._range_statistics = _RangeStatistics()
 
         self.window = MainWindow()
         self.window.resize(1280, 720)
@@ -46,34 +188,118 @@ class QTAdapterAPI:
         self.window.call_form.updateCallSubmitted.connect(self._update_call)
         self.window.top_bar.date_range_edit.dateRangeChanged.connect(self._date_range_changed)
         self.window.top_bar.generateReportPressed.connect(self._generate_report)
+        self.window.top_bar.cancelReportPressed.connect(self._cancel_report)
         self.window.call_table.callSelected.connect(self._populate_form)
         self.window.call_table.deleteCall.connect(self._delete_call)
+        self.window.top_bar.set_flavors(sorted(self.report_port_api.get_flavors(),
+                                               key=lambda flavor: (not flavor.startswith("text"), flavor)))
+
+        # Changes may be made on any thread, but are applied to the table on the GUI thread
+        self._call_events = CallEventSignals()
+        self._call_events.received.connect(self._apply_call_event)
+        self._unsubscribe = self.calls_port_api.subscribe(self._call_events.received.emit)
+
+        self._call_summary_timer = QTimer()
+        self._call_summary_timer.setSingleShot(True)
+        self._call_summary_timer.setInterval(0)
+        self._call_summary_timer.timeout.connect(self._show_call_summary)
+
+        # Spinning through a date field changes the range many times a second, only the last change is queried
+        self._date_range_timer = QTimer()
+        self._date_range_timer.setSingleShot(True)
+        self._date_range_timer.setInterval(date_range_debounce)
+        self._date_range_timer.timeout.connect(self._refresh_call_table)
+
+        self._loaded = False
+        self._first_paint_filter = FirstPaintFilter()
+        self._first_paint_filter.painted.connect(self._first_painted)
+        self.window.installEventFilter(self._first_paint_filter)
+        QTimer.singleShot(first_paint_timeout, self._load)
+        self._end_startup_phase("window")
+
+    def _end_startup_phase(self, name: str) -> None:
+        if self._startup_phase is not None:
+            self._startup_phase(name)
+
+    def _first_painted(self) -> None:
+        self._end_startup_phase("first paint")
+        # Queued, so that the paint finishes before the database is opened
+        QTimer.singleShot(0, self._load)
 
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
         self._refresh_call_table()
+        self._end_startup_phase("first table fill")
 
     def _refresh_call_table(self) -> None:
         start, end = self.window.top_bar.date_range_edit.get_date_range()
         calls = self.calls_port_api.get_calls_by_date_range(start.toPython(), end.toPython())
         self.window.call_table.set_calls(map(call_to_qt_call, calls))
+        # Summed up from the calls already read for the table rather than queried for
+        self._range_statistics = _RangeStatistics(calls)
+        self._show_call_summary()
+
+    def _show_call_summary(self) -> None:
+        statistics = self._range_statistics
+        self.window.call_summary.set_summary(statistics.call_count,
+                                             round(statistics.total_duration.total_seconds() / 60))
+        self.window.top_callers.set_callers(map(caller_statistics_to_qt_caller_statistics,
+                                                statistics.top_callers(self.top_callers)))
+
+    def _in_date_range(self, call: Call) -> bool:
+        # Compared in whole seconds, like the range queries of the database
+        start, end = self.window.top_bar.date_range_edit.get_date_range()
+        return to_seconds(start.toPython()) <= to_seconds(call.start_time) <= to_seconds(end.toPython())
+
+    def _apply_call_event(self, event: CallEvent) -> None:
+        if isinstance(event, CallDeleted) or not self._in_date_range(event.call):
+            self.window.call_table.remove_call(event.call.id)
+            self._range_statistics.remove(event.call.id)
+        elif isinstance(event, CallCreated):
+            self.window.call_table.add_call(call_to_qt_call(event.call))
+            self._range_statistics.add(event.call)
+        elif isinstance(event, CallUpdated):
+            self.window.call_table.update_call(call_to_qt_call(event.call))
+            self._range_statistics.add(event.call)
+
+        # Changes made in bulk are shown once they have all been applied
+        self._call_summary_timer.start()
 
     def _register_call(self, qt_call: QtNewCall) -> None:
         self.calls_port_api.create_call(qt_call_to_call(qt_call))
-        self._refresh_call_table()
 
     def _update_call(self, qt_call: QtCall) -> None:
         self.calls_port_api.update_call(qt_call_to_call(qt_call))
-        self._refresh_call_table()
 
     def _date_range_changed(self, _) -> None:
-        self._refresh_call_table()
+        self._date_range_timer.start()
 
-    def _generate_report(self, generate_report_request: tuple[QDateTime, QDateTime, int, Path]) -> None:
+    def _generate_report(self, generate_report_request: tuple[QDateTime, QDateTime, int, Path, str]) -> None:
         start = generate_report_request[0].toPython()
         end = generate_report_request[1].toPython()
         interval_size = generate_report_request[2]
         file_name = str(generate_report_request[3].absolute())
-        self.report_port_api.export_report(start, end, timedelta(minutes=interval_size), file_name,
-                                           self.report_port_api.get_flavors().pop())
+        flavor = generate_report_request[4]
+
+        if self._report_worker is not None:
+            return
+        self._report_worker = ReportWorker(self.report_port_api, start, end, timedelta(minutes=interval_size),
+                                           file_name, flavor)
+        self._report_worker.signals.progressed.connect(self.window.top_bar.set_report_progress)
+        self._report_worker.signals.finished.connect(self._report_finished)
+        self.window.top_bar.set_report_running(True)
+        self.thread_pool.start(self._report_worker)
+
+    def _cancel_report(self) -> None:
+        if self._report_worker is not None:
+            self._report_worker.progress.cancel()
+
+    def _report_finished(self, status: str) -> None:
+        self._report_worker = None
+        self.window.top_bar.set_report_running(False)
+        self.window.top_bar.set_report_status(status)
 
     def _populate_form(self, id_: int) -> None:
         call = self.calls_port_api.get_call(id_)
@@ -81,11 +307,13 @@ class QTAdapterAPI:
 
     def _delete_call(self, id_: int) -> None:
         self.calls_port_api.delete_call(id_)
-        if int(self.window.call_form.id.text()) == id_:
+        if self.window.call_form.id.text() == str(id_):
             self.window.call_form.id.setText("None")
-        self._refresh_call_table()  # TODO optimize this
         self.window.call_form.reset_fields()
 
     def run_gui(self) -> None:
         self.window.show()
         self.app.exec()
+        self._unsubscribe()
+        self._cancel_report()
+        self.thread_pool.waitForDone()
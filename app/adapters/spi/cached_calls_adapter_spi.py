@@ -0,0 +1,299 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+
+from app.core.model.call import Call, to_seconds
+from app.core.model.call_events import ChangedCalls
+from app.core.model.summary import CallerStatistics, CallSummary, DailyCallSummary
+from app.core.ports.spi.calls_port_spi import CallsPortSPI
+
+logger = logging.getLogger(__name__)
+
+
+def _end(call: Call) -> int:
+    # Where the calls SPI considers a call to end when selecting overlapping calls
+    return to_seconds(call.start_time) + round(call.duration.total_seconds())
+
+
+class _SortedCalls:
+    """
+    Calls sorted by start time.
+    """
+
+    def __init__(self) -> None:
+        self.keys: list[int] = []
+        self.calls: list[Call] = []
+
+    def append(self, call: Call) -> None:
+        self.keys.append(to_seconds(call.start_time))
+        self.calls.append(call)
+
+    def add(self, call: Call) -> None:
+        key = to_seconds(call.start_time)
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.calls.insert(index, call)
+
+    def remove(self, call: Call) -> None:
+        index = bisect_left(self.keys, to_seconds(call.start_time))
+        while self.calls[index].id != call.id:
+            index += 1
+        del self.keys[index]
+        del self.calls[index]
+
+    def before(self, end: int) -> list[Call]:
+        return self.calls[:bisect_left(self.keys, end)]
+
+    def slice(self, start: int, end: int) -> list[Call]:
+        return self.calls[bisect_left(self.keys, start):bisect_right(self.keys, end)]
+
+
+class _Bucket:
+    """
+    The calls starting within one slice of time, and those carried into it: the calls starting before it that are
+    still going on once it has begun.
+    """
+
+    def __init__(self) -> None:
+        self.calls = _SortedCalls()
+        self.carried = _SortedCalls()
+
+
+class CachedCallsAdapterSPI:
+    """
+    Keeps recently queried calls in memory in front of another CallsPortSPI, writing through to it.
+
+    Time is divided into buckets of bucket_size, which are loaded from the wrapped SPI in full the first time a query
+    touches them and evicted least recently used first once there are more than max_buckets. Ranges spanning more
+    buckets than that are passed straight through. Every bucket also holds the calls carried into it from before, so
+    that calls overlapping a range are served from the buckets it spans as well. A data version differing from the last
+    one seen here means that someone else changed the calls, which drops every bucket.
+
+    Writes made through here hand back the data version they left behind. Lookups only ask the wrapped SPI for it once
+    validate_interval has passed since it was last seen, so changes made elsewhere may go unnoticed for that long
+    unless invalidate is called.
+    """
+
+    def __init__(self, calls_port_spi: CallsPortSPI, bucket_size: timedelta = timedelta(days=1),
+                 max_buckets: int = 92, validate_interval: timedelta = timedelta(seconds=1)) -> None:
+        assert bucket_size >= timedelta(seconds=1)
+        assert max_buckets > 0
+        assert validate_interval >= timedelta()
+
+        self._calls_port_spi = calls_port_spi
+        self._bucket_size = round(bucket_size.total_seconds())
+        self._max_buckets = max_buckets
+        self._validate_interval = validate_interval.total_seconds()
+
+        self._buckets: OrderedDict[int, _Bucket] = OrderedDict()
+        self._calls_by_id: dict[int, Call] = {}
+        self._data_version: Optional[int] = None
+        self._validated_at = -float("inf")
+        self._lock = threading.RLock()
+
+    def invalidate(self) -> None:
+        """
+        Drops every cached call, for when the calls have been changed other than through here.
+        """
+
+        with self._lock:
+            self._buckets.clear()
+            self._calls_by_id.clear()
+            self._data_version = None
+            self._validated_at = -float("inf")
+
+    def _bucket_of(self, call: Call) -> int:
+        return to_seconds(call.start_time) // self._bucket_size
+
+    def _validate(self) -> None:
+        if time.monotonic() - self._validated_at >= self._validate_interval:
+            self._synchronize(self._calls_port_spi.get_data_version(), self._data_version)
+
+    def _synchronize(self, data_version: int, expected_data_version: Optional[int]) -> None:
+        if data_version != expected_data_version:
+            if self._buckets:
+                logger.debug("Data version changed from %s to %s, dropping %d cached buckets", self._data_version,
+                             data_version, len(self._buckets))
+            self._buckets.clear()
+            self._calls_by_id.clear()
+        self._data_version = data_version
+        self._validated_at = time.monotonic()
+
+    def _written(self, calls: ChangedCalls) -> None:
+        # Every changed call bumps the data version once. Any further change means someone else changed the calls too.
+        self._synchronize(calls.data_version, None if self._data_version is None else self._data_version + len(calls))
+
+    def _carried_into(self, call: Call) -> list[_Bucket]:
+        # The loaded buckets that begin after the call's own while it is still going on
+        keys = range(self._bucket_of(call) + 1, (_end(call) - 1) // self._bucket_size + 1)
+        if len(keys) > len(self._buckets):
+            return [bucket for key, bucket in self._buckets.items() if key in keys]
+        return [self._buckets[key] for key in keys if key in self._buckets]
+
+    def _holds(self, call: Call) -> bool:
+        return self._bucket_of(call) in self._buckets or bool(self._carried_into(call))
+
+    def _evict(self) -> None:
+        while len(self._buckets) > self._max_buckets:
+            _, bucket = self._buckets.popitem(last=False)
+            for call in chain(bucket.calls.calls, bucket.carried.calls):
+                if not self._holds(call):
+                    self._calls_by_id.pop(call.id, None)
+
+    def _load(self, first: int, last: int) -> None:
+        calls = self._calls_port_spi.get_calls_overlapping_date_range(
+            datetime.fromtimestamp(first * self._bucket_size),
+            datetime.fromtimestamp((last + 1) * self._bucket_size - 1)
+        )
+        buckets = {key: _Bucket() for key in range(first, last + 1)}
+        for call in calls:
+            key = self._bucket_of(call)
+            if key in buckets:
+                buckets[key].calls.append(call)
+            for carried_key in range(max(key + 1, first), min(last, (_end(call) - 1) // self._bucket_size) + 1):
+                buckets[carried_key].carried.append(call)
+            self._calls_by_id[call.id] = call
+        self._buckets.update(buckets)
+
+    def _cached_range(self, start: datetime, end: datetime, overlapping: bool = False) -> Optional[list[Call]]:
+        start, end = to_seconds(start), to_seconds(end)
+        first, last = start // self._bucket_size, end // self._bucket_size
+        if last - first + 1 > self._max_buckets:
+            return None
+
+        with self._lock:
+            self._validate()
+
+            # Missing buckets are loaded with one query per run of consecutive buckets
+            run_start = None
+            for key in range(first, last + 2):
+                if key <= last and key not in self._buckets:
+                    run_start = key if run_start is None else run_start
+                elif run_start is not None:
+                    self._load(run_start, key - 1)
+                    run_start = None
+
+            calls = []
+            if overlapping:
+                # Calls starting before the range overlap it if they end after it has begun
+                bucket = self._buckets[first]
+                calls.extend(call for call in chain(bucket.carried.calls, bucket.calls.before(start))
+                             if _end(call) > start)
+            for key in range(first, last + 1):
+                self._buckets.move_to_end(key)
+                calls.extend(self._buckets[key].calls.slice(start, end))
+            self._evict()
+            return calls
+
+    def _added(self, calls: Iterable[Call]) -> None:
+        for call in calls:
+            bucket = self._buckets.get(self._bucket_of(call))
+            if bucket is not None:
+                bucket.calls.add(call)
+            carried_into = self._carried_into(call)
+            for carried_bucket in carried_into:
+                carried_bucket.carried.add(call)
+            if bucket is not None or carried_into:
+                self._calls_by_id[call.id] = call
+
+    def _removed(self, ids: Iterable[int]) -> None:
+        for id_ in ids:
+            call = self._calls_by_id.pop(id_, None)
+            if call is None:
+                continue
+            bucket = self._buckets.get(self._bucket_of(call))
+            if bucket is not None:
+                bucket.calls.remove(call)
+            for carried_bucket in self._carried_into(call):
+                carried_bucket.carried.remove(call)
+
+    def store_call(self, call: Call) -> Call:
+        return self.store_calls((call,))[0]
+
+    def store_calls(self, calls: Iterable[Call]) -> ChangedCalls:
+        with self._lock:
+            calls = self._calls_port_spi.store_calls(calls)
+            self._written(calls)
+            self._added(calls)
+            return calls
+
+    def delete_call(self, id_: int) -> Call:
+        return self.delete_calls((id_,))[0]
+
+    def delete_calls(self, ids: Iterable[int]) -> ChangedCalls:
+        with self._lock:
+            calls = self._calls_port_spi.delete_calls(ids)
+            self._written(calls)
+            self._removed(call.id for call in calls)
+            return calls
+
+    def delete_calls_by_date_range(self, start: datetime, end: datetime) -> ChangedCalls:
+        with self._lock:
+            calls = self._calls_port_spi.delete_calls_by_date_range(start, end)
+            self._written(calls)
+            self._removed(call.id for call in calls)
+            return calls
+
+    def update_call(self, call: Call) -> Call:
+        return self.update_calls((call,))[0]
+
+    def update_calls(self, calls: Iterable[Call]) -> ChangedCalls:
+        with self._lock:
+            calls = self._calls_port_spi.update_calls(calls)
+            self._written(calls)
+            self._removed(call.id for call in calls)
+            self._added(calls)
+            return calls
+
+    def get_call(self, id_: int) -> Call:
+        with self._lock:
+            self._validate()
+            call = self._calls_by_id.get(id_)
+        return self._calls_port_spi.get_call(id_) if call is None else call
+
+    def get_calls_by_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        calls = self._cached_range(start, end)
+        return self._calls_port_spi.get_calls_by_date_range(start, end) if calls is None else tuple(calls)
+
+    def iter_calls_by_date_range(self, start: datetime, end: datetime, batch_size: int = 1024) -> Iterator[Call]:
+        calls = self._cached_range(start, end)
+        if calls is None:
+            yield from self._calls_port_spi.iter_calls_by_date_range(start, end, batch_size)
+        else:
+            yield from calls
+
+    def get_calls_overlapping_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        calls = self._cached_range(start, end, overlapping=True)
+        return self._calls_port_spi.get_calls_overlapping_date_range(start, end) if calls is None else tuple(calls)
+
+    def iter_calls_overlapping_date_range(self, start: datetime, end: datetime,
+                                          batch_size: int = 1024) -> Iterator[Call]:
+        calls = self._cached_range(start, end, overlapping=True)
+        if calls is None:
+            yield from self._calls_port_spi.iter_calls_overlapping_date_range(start, end, batch_size)
+        else:
+            yield from calls
+
+    def get_calls_by_case(self, case: str) -> tuple[Call, ...]:
+        return self._calls_port_spi.get_calls_by_case(case)
+
+    def search_calls(self, query: str, limit: int = 100) -> tuple[Call, ...]:
+        return self._calls_port_spi.search_calls(query, limit)
+
+    def get_data_version(self) -> int:
+        return self._calls_port_spi.get_data_version()
+
+    def get_call_summary(self, start: datetime, end: datetime) -> CallSummary:
+        return self._calls_port_spi.get_call_summary(start, end)
+
+    def get_daily_call_summaries(self, start: date, end: date) -> tuple[DailyCallSummary, ...]:
+        return self._calls_port_spi.get_daily_call_summaries(start, end)
+
+    def get_caller_statistics(self, start: datetime, end: datetime,
+                              limit: Optional[int] = None) -> tuple[CallerStatistics, ...]:
+        return self._calls_port_spi.get_caller_statistics(start, end, limit)
@@ -0,0 +1,51 @@
+import csv
+import io
+from typing import Iterator
+
+from app.core.model.call import CASE_SEPARATOR
+from app.core.model.report import ReportFlavor, Report, microseconds_to_datetime
+
+HEADER = ("interval_start", "call_id", "phone_number", "start_time", "duration_seconds", "cases")
+
+
+class CSVReportRendererAdapterSPI:
+    def __init__(self, flavor: ReportFlavor, chunk_size: int = 1 << 16):
+        self._flavor = flavor
+        self._chunk_size = chunk_size
+
+    def get_flavor(self) -> ReportFlavor:
+        return self._flavor
+
+    def render_report(self, report: Report) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(HEADER)
+
+        ids = report.call_ids
+        phone_numbers = report.call_phone_numbers
+        start_times = report.call_start_times
+        durations = report.call_durations
+        cases = report.call_cases
+        offsets = report.interval_offsets
+        call_indices = report.interval_call_indices
+
+        for interval in range(report.interval_count):
+            interval_start = report.interval_start_time(interval).isoformat()
+            writer.writerows(
+                (
+                    interval_start,
+                    ids[call],
+                    phone_numbers[call],
+                    microseconds_to_datetime(start_times[call]).isoformat(),
+                    durations[call] // 1_000_000,
+                    CASE_SEPARATOR.join(cases[call])
+                )
+                for call in call_indices[offsets[interval]:offsets[interval + 1]]
+            )
+
+            if buffer.tell() >= self._chunk_size:
+                yield buffer.getvalue().encode("UTF-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue().encode("UTF-8")
@@ -1,10 +1,42 @@
 from app.core.model.report import ReportFlavor
+import gzip
 import logging
+import os
+import secrets
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+GZIP_SUFFIX = ".gz"
 
 
 class FileReportExporterAdapterSPI:
+    def __init__(self, compress: bool = False, compression_level: int = 6):
+        self._compress = compress
+        self._compression_level = compression_level
+
+    def export_report(self, chunks: Iterable[bytes], name: str, flavor: ReportFlavor) -> None:
+        path = Path(name)
+        compress = self._compress or path.suffix == GZIP_SUFFIX
+        if compress and path.suffix != GZIP_SUFFIX:
+            path = path.with_name(path.name + GZIP_SUFFIX)
+
+        logger.info("Saving report of flavor '%s' to '%s'%s", flavor, path,
+                    " with gzip compression" if compress else "")
 
-    def export_report(self, data: bytes, name: str, flavor: ReportFlavor) -> None:
-        logging.info(f"Saving report of flavor '{flavor}' to '{name}'")
-        Path(name).write_bytes(data)
+        # Written next to the destination and renamed into place, so a failed export never leaves a truncated report
+        temporary_path = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            with temporary_path.open("xb") as file:
+                with (gzip.GzipFile(path.name.removesuffix(GZIP_SUFFIX), "wb", self._compression_level, file)
+                      if compress else nullcontext(file)) as output:
+                    for chunk in chunks:
+                        output.write(chunk)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, path)
+        except BaseException:
+            temporary_path.unlink(missing_ok=True)
+            raise
@@ -0,0 +1,86 @@
+import json
+import math
+import os
+import threading
+from bisect import bisect_left
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterator
+
+from app.core.model.operation_metrics import LATENCY_BUCKET_BOUNDS, OperationMetrics
+
+
+class _Accumulator:
+    __slots__ = ("calls", "failures", "total_seconds", "min_seconds", "max_seconds", "latency_buckets", "rows",
+                 "nbytes", "peak_memory")
+
+    def __init__(self) -> None:
+        self.calls = self.failures = self.rows = self.nbytes = self.peak_memory = 0
+        self.total_seconds = self.max_seconds = 0.0
+        self.min_seconds = math.inf
+        self.latency_buckets = [0] * (len(LATENCY_BUCKET_BOUNDS) + 1)
+
+
+class InMemoryMetricsAdapterSPI:
+    """
+    Keeps call counts, latency histograms, row and byte counts and peak memory per operation for the lifetime of the
+    process. Safe to record into from any thread.
+    """
+
+    def __init__(self) -> None:
+        self._operations: dict[str, _Accumulator] = {}
+        self._lock = threading.Lock()
+
+    def _accumulator(self, operation: str) -> _Accumulator:
+        accumulator = self._operations.get(operation)
+        if accumulator is None:
+            accumulator = self._operations[operation] = _Accumulator()
+        return accumulator
+
+    def record(self, operation: str, seconds: float, rows: int = 0, nbytes: int = 0, failed: bool = False) -> None:
+        bucket = bisect_left(LATENCY_BUCKET_BOUNDS, seconds)
+        with self._lock:
+            accumulator = self._accumulator(operation)
+            accumulator.calls += 1
+            accumulator.failures += failed
+            accumulator.total_seconds += seconds
+            accumulator.min_seconds = min(accumulator.min_seconds, seconds)
+            accumulator.max_seconds = max(accumulator.max_seconds, seconds)
+            accumulator.latency_buckets[bucket] += 1
+            accumulator.rows += rows
+            accumulator.nbytes += nbytes
+
+    def record_peak_memory(self, operation: str, nbytes: int) -> None:
+        with self._lock:
+            accumulator = self._accumulator(operation)
+            accumulator.peak_memory = max(accumulator.peak_memory, nbytes)
+
+    def get_metrics(self) -> tuple[OperationMetrics, ...]:
+        with self._lock:
+            return tuple(
+                OperationMetrics(operation, accumulator.calls, accumulator.failures, accumulator.total_seconds,
+                                 accumulator.min_seconds if accumulator.calls else 0.0, accumulator.max_seconds,
+                                 tuple(accumulator.latency_buckets), accumulator.rows, accumulator.nbytes,
+                                 accumulator.peak_memory)
+                for operation, accumulator in sorted(self._operations.items())
+            )
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "latency_bucket_bounds": LATENCY_BUCKET_BOUNDS,
+            "operations": [asdict(metrics) for metrics in self.get_metrics()],
+        }, indent=2)
+
+    def dump(self, path: Path) -> None:
+        # Written next to the target and moved into place, so a reader never sees a partial dump
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        temporary_path.write_text(self.to_json() + "\n", encoding="utf-8")
+        os.replace(temporary_path, path)
+
+    def summary(self) -> Iterator[str]:
+        for metrics in self.get_metrics():
+            yield (f"{metrics.operation}: {metrics.calls} calls, {metrics.failures} failed, "
+                   f"mean {metrics.mean_latency.total_seconds() * 1000:.3f} ms, "
+                   f"p95 {metrics.latency_quantile(0.95).total_seconds() * 1000:.3f} ms, "
+                   f"max {metrics.max_seconds * 1000:.3f} ms, {metrics.rows} rows, {metrics.nbytes} bytes"
+                   + (f", peak memory {metrics.peak_memory} bytes" if metrics.peak_memory else ""))
@@ -0,0 +1,51 @@
+import json
+from typing import Iterator
+
+from app.core.model.report import ReportFlavor, Report, microseconds_to_datetime
+
+
+class JSONLinesReportRendererAdapterSPI:
+    def __init__(self, flavor: ReportFlavor, chunk_size: int = 1 << 16):
+        self._flavor = flavor
+        self._chunk_size = chunk_size
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def get_flavor(self) -> ReportFlavor:
+        return self._flavor
+
+    def render_report(self, report: Report) -> Iterator[bytes]:
+        encode = self._encoder.encode
+        lines = []
+        size = 0
+
+        ids = report.call_ids
+        phone_numbers = report.call_phone_numbers
+        start_times = report.call_start_times
+        durations = report.call_durations
+        cases = report.call_cases
+        offsets = report.interval_offsets
+        call_indices = report.interval_call_indices
+
+        for interval in range(report.interval_count):
+            interval_start = report.interval_start_time(interval).isoformat()
+            for call in call_indices[offsets[interval]:offsets[interval + 1]]:
+                line = encode({
+                    "interval_start": interval_start,
+                    "call_id": ids[call],
+                    "phone_number": phone_numbers[call],
+                    "start_time": microseconds_to_datetime(start_times[call]).isoformat(),
+                    "duration_seconds": durations[call] // 1_000_000,
+                    "cases": cases[call]
+                })
+                lines.append(line)
+                size += len(line) + 1
+
+            if size >= self._chunk_size:
+                lines.append("")
+                yield '\n'.join(lines).encode("UTF-8")
+                lines = []
+                size = 0
+
+        if lines:
+            lines.append("")
+            yield '\n'.join(lines).encode("UTF-8")
@@ -0,0 +1,27 @@
+import threading
+from typing import Callable, Iterator, Optional
+
+from app.core.model.report import ReportFlavor, Report
+from app.core.ports.spi.report_port_spi import ReportRendererPortSPI
+
+
+class LazyReportRendererAdapterSPI:
+    """
+    Answers for its flavor without creating the renderer, which is only created, and its module imported, when the
+    first report of that flavor is rendered.
+    """
+
+    def __init__(self, flavor: ReportFlavor, factory: Callable[[ReportFlavor], ReportRendererPortSPI]):
+        self._flavor = flavor
+        self._factory = factory
+        self._renderer: Optional[ReportRendererPortSPI] = None
+        self._lock = threading.Lock()
+
+    def get_flavor(self) -> ReportFlavor:
+        return self._flavor
+
+    def render_report(self, report: Report) -> Iterator[bytes]:
+        with self._lock:
+            if self._renderer is None:
+                self._renderer = self._factory(self._flavor)
+        return self._renderer.render_report(report)
@@ -0,0 +1,102 @@
+import zipfile
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from app.core.model.call import CASE_SEPARATOR
+from app.core.model.report import ReportFlavor, Report
+
+ENCODING = "UTF-8"
+
+
+class _ChunkStream:
+    """
+    The unseekable file the archive is written to, which holds on to what was written until it is taken.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+class NPZReportRendererAdapterSPI:
+    """
+    Renders a report as a compressed NumPy archive of its columns, loadable with numpy.load.
+
+    Every call is stored once, in the call_* columns. Interval i starts at interval_start[i] and holds the calls at
+    interval_call_index[interval_offsets[i]:interval_offsets[i + 1]]. Phone numbers and cases, the latter joined with
+    CASE_SEPARATOR, are stored as UTF-8 bytes, call j's at call_phone_number[call_phone_number_offsets[j]:
+    call_phone_number_offsets[j + 1]], so that no string is padded to the length of the longest one.
+    """
+
+    def __init__(self, flavor: ReportFlavor, chunk_size: int = 1 << 20):
+        self._flavor = flavor
+        self._chunk_size = chunk_size
+
+    def get_flavor(self) -> ReportFlavor:
+        return self._flavor
+
+    def _write(self, archive: zipfile.ZipFile, stream: _ChunkStream, name: str, dtype: np.dtype, length: int,
+               parts: Iterable[bytes]) -> Iterator[bytes]:
+        # Written a part at a time, the archive yielding whatever it has compressed so far every chunk_size bytes
+        with archive.open(f"{name}.npy", "w", force_zip64=True) as entry:
+            np.lib.format.write_array_header_1_0(entry, {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (length,)
+            })
+            for part in parts:
+                entry.write(part)
+                if stream.size >= self._chunk_size:
+                    yield stream.take()
+
+    def _write_column(self, archive: zipfile.ZipFile, stream: _ChunkStream, name: str, column: np.ndarray,
+                      dtype: str) -> Iterator[bytes]:
+        step = max(1, self._chunk_size // column.itemsize)
+        return self._write(archive, stream, name, np.dtype(dtype), len(column),
+                           (column[offset:offset + step].tobytes() for offset in range(0, len(column), step)))
+
+    def _write_strings(self, archive: zipfile.ZipFile, stream: _ChunkStream, name: str,
+                       strings: Sequence[str]) -> Iterator[bytes]:
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(string.encode(ENCODING)) for string in strings), np.int64, len(strings)),
+                  out=offsets[1:])
+        yield from self._write_column(archive, stream, f"{name}_offsets", offsets, "i8")
+
+        # Parts of roughly chunk_size bytes for strings of about 16 bytes
+        step = max(1, self._chunk_size // 16)
+        yield from self._write(archive, stream, name, np.dtype(np.uint8), int(offsets[-1]), (
+            "".join(strings[offset:offset + step]).encode(ENCODING) for offset in range(0, len(strings), step)
+        ))
+
+    def render_report(self, report: Report) -> Iterator[bytes]:
+        stream = _ChunkStream()
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, column, dtype in (
+                    ("interval_start", report.interval_start_times, "M8[us]"),
+                    ("interval_offsets", report.interval_offsets, "i8"),
+                    ("interval_call_index", report.interval_call_indices, "i8"),
+                    ("call_id", report.call_ids, "i8"),
+                    ("call_start_time", report.call_start_times, "M8[us]"),
+                    ("call_duration", report.call_durations, "m8[us]")
+            ):
+                yield from self._write_column(archive, stream, name, np.frombuffer(column, dtype=np.int64), dtype)
+
+            yield from self._write_strings(archive, stream, "call_phone_number", report.call_phone_numbers)
+            yield from self._write_strings(archive, stream, "call_cases",
+                                           [CASE_SEPARATOR.join(cases) for cases in report.call_cases])
+        yield stream.take()
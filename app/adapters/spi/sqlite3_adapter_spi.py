@@ -1,106 +1,406 @@
 import json
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 import logging
 
+from app.adapters.spi.sqlite3_call_decoder import ROW_COLUMNS, CallDecoder
+from app.adapters.spi.sqlite3_connection_pool import SQLite3ConnectionPool, SQLite3Pragmas
+from app.adapters.spi.sqlite3_migrations import migrate, verify_schema_version
 from app.core.model.call import Call
+from app.core.model.call_events import ChangedCalls
+from app.core.model.summary import CallerStatistics, CallSummary, DailyCallSummary
 
-Row = tuple[int, str, int, int, str]
-NewRow = tuple[None, str, int, int, str]
+logger = logging.getLogger(__name__)
 
+NewRow = tuple[None, str, int, int]
+StoredRow = tuple[Optional[int], str, int, int]
 
-def call_to_row(call: Call) -> Row | NewRow:
+CALL_COLUMNS = """
+    "id", "phone_number", "start_time", "duration",
+    (SELECT group_concat("case", char(31)) FROM "call_case" WHERE "call_id"="call"."id") AS "cases"
+"""
+
+INSERT_CALL = """
+    INSERT INTO "call" (
+        "id",
+        "phone_number",
+        "start_time",
+        "duration",
+        "end_time"
+    )
+    VALUES (?, ?, ?, ?, ?);
+"""
+
+SELECT_NEXT_CALL_ID = """SELECT coalesce(max("id"), 0) + 1 FROM "call";"""
+
+# Calls inserted in bulk are left alone by the insert triggers while their ids are in "call_batch", and are summarized,
+# indexed and counted by these statements instead, once per batch
+INSERT_CALL_BATCH = """INSERT INTO "call_batch" ("id") VALUES (?);"""
+
+INSERT_CALL_BATCH_DAY_SUMMARIES = """
+    INSERT INTO "call_day_summary"
+    SELECT date("start_time", 'unixepoch', 'localtime'), count(*), sum("duration"), min("start_time"), max("start_time")
+    FROM "call"
+    WHERE "id" IN (SELECT "id" FROM "call_batch")
+    GROUP BY 1
+    ON CONFLICT ("day") DO UPDATE SET
+        "call_count"="call_count" + excluded."call_count",
+        "total_duration"="total_duration" + excluded."total_duration",
+        "first_start_time"=min("first_start_time", excluded."first_start_time"),
+        "last_start_time"=max("last_start_time", excluded."last_start_time");
+"""
+
+INSERT_CALL_BATCH_TIMES = """
+    INSERT INTO "call_time" ("id", "start_time", "end_time")
+    SELECT "id", "start_time", "end_time" FROM "call" WHERE "id" IN (SELECT "id" FROM "call_batch");
+"""
+
+INSERT_CALL_BATCH_SEARCH = """
+    INSERT INTO "call_search" ("rowid", "phone_number", "cases")
+    SELECT "id", "phone_number", coalesce(
+        (SELECT group_concat("case", ' ') FROM "call_case" WHERE "call_id"="call"."id"), ''
+    )
+    FROM "call"
+    WHERE "id" IN (SELECT "id" FROM "call_batch");
+"""
+
+UPDATE_CALL_BATCH_DATA_VERSION = """
+    UPDATE "data_version" SET "version"="version" + (SELECT count(*) FROM "call_batch") WHERE "id"=0;
+"""
+
+DELETE_CALL_BATCH = """DELETE FROM "call_batch";"""
+
+UPDATE_CALL = """
+    UPDATE "call" SET
+        "phone_number"=?,
+        "start_time"=?,
+        "duration"=?,
+        "end_time"=?
+    WHERE "id"=?;
+"""
+
+INSERT_CALL_CASE = """INSERT INTO "call_case" ("call_id", "position", "case") VALUES (?, ?, ?);"""
+
+DELETE_CALL_CASES = """DELETE FROM "call_case" WHERE "call_id"=?;"""
+
+DELETE_CALL = """DELETE FROM "call" WHERE "id"=?;"""
+
+DELETE_CALLS = """DELETE FROM "call" WHERE "id" IN (SELECT "value" FROM json_each(?));"""
+
+DELETE_CALLS_BY_DATE_RANGE = """DELETE FROM "call" WHERE "start_time" BETWEEN ? AND ?;"""
+
+SELECT_CALL = f"""SELECT {CALL_COLUMNS} FROM "call" WHERE "id"=?;"""
+
+SELECT_CALLS = f"""SELECT {CALL_COLUMNS} FROM "call" WHERE "id" IN (SELECT "value" FROM json_each(?));"""
+
+SELECT_CALLS_BY_CASE = f"""
+    SELECT {CALL_COLUMNS} FROM "call"
+    WHERE "id" IN (SELECT "call_id" FROM "call_case" WHERE "case"=?)
+    ORDER BY "start_time" ASC;
+"""
+
+SEARCH_CALLS = f"""
+    SELECT {CALL_COLUMNS} FROM "call"
+    WHERE "id" IN (SELECT "rowid" FROM "call_search" WHERE "call_search" MATCH ?)
+    ORDER BY "start_time" DESC
+    LIMIT ?;
+"""
+
+SELECT_CALLS_BY_DATE_RANGE = f"""
+    SELECT {CALL_COLUMNS} FROM "call" WHERE "start_time" BETWEEN ? AND ? ORDER BY "start_time" ASC;
+"""
+
+# Candidates come from the R*Tree and are checked exactly against the table. A call overlaps the range if it starts
+# within it, or starts before it and ends after the range has begun.
+SELECT_CALLS_OVERLAPPING_DATE_RANGE = f"""
+    SELECT {CALL_COLUMNS} FROM "call"
+    WHERE "id" IN (SELECT "id" FROM "call_time" WHERE "start_time" <= :end AND "end_time" >= :start)
+        AND "start_time" <= :end AND ("start_time" >= :start OR "end_time" > :start)
+    ORDER BY "start_time" ASC;
+"""
+
+SELECT_DATA_VERSION = """SELECT "version" FROM "data_version" WHERE "id"=0;"""
+
+SELECT_DAILY_CALL_SUMMARIES = """
+    SELECT "day", "call_count", "total_duration", "first_start_time", "last_start_time"
+    FROM "call_day_summary"
+    WHERE "day" BETWEEN ? AND ?
+    ORDER BY "day" ASC;
+"""
+
+# Aggregated in SQLite over one of two covering indexes. Reading the calls of a short range by start time and grouping
+# them afterwards is cheapest, while longer ranges are better served by a scan of the phone number index that is already
+# grouped. The busiest callers come first, and a negative limit returns every caller.
+SELECT_CALLER_STATISTICS = """
+    SELECT "phone_number", count(*), sum("duration"), min("start_time"), max("start_time")
+    FROM "call" INDEXED BY "{0}"
+    WHERE "start_time" BETWEEN ? AND ?
+    GROUP BY "phone_number"
+    ORDER BY count(*) DESC, sum("duration") DESC, "phone_number" ASC
+    LIMIT ?;
+"""
+SELECT_CALLER_STATISTICS_BY_START_TIME = SELECT_CALLER_STATISTICS.format("call_start_time")
+SELECT_CALLER_STATISTICS_BY_PHONE_NUMBER = SELECT_CALLER_STATISTICS.format("call_phone_number")
+
+# The share of all calls made on the days of a range, beyond which the phone number index is scanned
+CALLER_STATISTICS_SCAN_SHARE = 1 / 16
+
+SELECT_CALL_COUNTS = """
+    SELECT
+        (SELECT total("call_count") FROM "call_day_summary" WHERE "day" BETWEEN ? AND ?),
+        (SELECT total("call_count") FROM "call_day_summary");
+"""
+
+# Whole days are read from their summaries, and only the partial days at either end of the range from the calls
+SELECT_CALL_SUMMARY = """
+    SELECT sum("call_count"), sum("total_duration"), min("first_start_time"), max("last_start_time")
+    FROM (
+        SELECT "call_count", "total_duration", "first_start_time", "last_start_time"
+        FROM "call_day_summary"
+        WHERE "day" BETWEEN :first_day AND :last_day
+        UNION ALL
+        SELECT 1, "duration", "start_time", "start_time"
+        FROM "call"
+        WHERE "start_time" BETWEEN :start AND :head_end
+        UNION ALL
+        SELECT 1, "duration", "start_time", "start_time"
+        FROM "call"
+        WHERE "start_time" BETWEEN :tail_start AND :end
+    );
+"""
+
+
+def call_to_row(call: Call) -> StoredRow | NewRow:
     return (
         call.id,
         call.phone_number,
         round(call.start_time.timestamp()),
-        round(call.duration.total_seconds()),
-        json.dumps(call.cases)
+        round(call.duration.total_seconds())
     )
 
 
-def row_to_call(row: Row) -> Call:
-    _id, phone_number, start, duration, cases = row
-    return Call(_id, phone_number, datetime.fromtimestamp(start), timedelta(seconds=duration),
-                tuple(json.loads(cases)))
+def with_end_time(row: StoredRow | NewRow) -> tuple:
+    return *row, row[2] + row[3]
+
+
+def case_rows(call_id: int, cases: tuple[str, ...]) -> Iterator[tuple[int, int, str]]:
+    return ((call_id, position, case) for position, case in enumerate(cases))
+
+
+def search_expression(query: str) -> str:
+    # Every word of the query has to prefix a word of a phone number or case, and is quoted so that it is never read as
+    # FTS5 syntax
+    return ' '.join('"' + term.replace('"', '""') + '"*' for term in query.split())
+
+
+def day_start(day: date) -> int:
+    return round(datetime.combine(day, time()).timestamp())
+
+
+def call_summary_parameters(start: int, end: int) -> dict[str, int | str]:
+    # The whole days within the range, and the partial days before and after them
+    first_day = datetime.fromtimestamp(start).date()
+    if day_start(first_day) < start:
+        first_day += timedelta(days=1)
+    last_day = datetime.fromtimestamp(end).date()
+    if day_start(last_day + timedelta(days=1)) - 1 > end:
+        last_day -= timedelta(days=1)
+
+    if first_day > last_day:
+        return {"first_day": first_day.isoformat(), "last_day": last_day.isoformat(), "start": start,
+                "head_end": end, "tail_start": end + 1, "end": end}
+    return {"first_day": first_day.isoformat(), "last_day": last_day.isoformat(), "start": start,
+            "head_end": day_start(first_day) - 1, "tail_start": day_start(last_day + timedelta(days=1)), "end": end}
 
 
 class SQLite3AdapterSPI:
-    def __init__(self, database: Path):
+    def __init__(self, database: Path, pragmas: SQLite3Pragmas = SQLite3Pragmas(), pool_size: int = 4,
+                 cached_statements: int = 128, read_only: bool = False):
+        """
+        :param read_only: Opens the database without migrating it, which must then already be up to date. Anything
+                          that writes fails with a sqlite3.OperationalError.
+        """
+
         self.database = database
+        self._pool = SQLite3ConnectionPool(database, pragmas, pool_size, cached_statements, read_only)
+        self._decoder = CallDecoder()
 
-        with sqlite3.connect(self.database) as connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute("""
-                    CREATE TABLE "call" (
-                        "id" INTEGER NOT NULL PRIMARY KEY,
-                        "phone_number" TEXT,
-                        "start_time"  INTEGER,
-                        "duration" INTEGER,
-                        "cases" TEXT
-                    );
-                """)
-                connection.commit()
-            except sqlite3.OperationalError:
-                logging.debug("Table \"call\" already created")
+        with self._pool.connection() as connection:
+            schema_version = verify_schema_version(connection) if read_only else migrate(connection)
+            # Rows are decoded by position
+            columns = tuple(column[0] for column in connection.execute(SELECT_CALL, (None,)).description)
+            assert columns == ROW_COLUMNS, columns
+        logger.debug("Database '%s' is at schema version %d", database, schema_version)
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _select_calls(self, connection: sqlite3.Connection, sql: str, parameters: tuple | dict) -> sqlite3.Cursor:
+        cursor = connection.cursor()
+        cursor.row_factory = self._decoder
+        return cursor.execute(sql, parameters)
 
     def store_call(self, call: Call) -> Call:
-        with sqlite3.connect(self.database) as connection:
-            cursor = connection.cursor()
-            id_ = cursor.execute(
-                """
-                    INSERT INTO "call" (
-                        "id",
-                        "phone_number",
-                        "start_time",
-                        "duration",
-                        "cases"
-                    )
-                    VALUES (?, ?, ?, ?, ?);
-                """,
-                call_to_row(call)
-            ).lastrowid
-            connection.commit()
-            return Call(id_, call.phone_number, call.start_time, call.duration, call.cases)
+        return self.store_calls((call,))[0]
+
+    def store_calls(self, calls: Iterable[Call]) -> ChangedCalls:
+        calls = tuple(calls)
+        with self._pool.connection() as connection, connection:
+            # New calls are given ids up front, from a single query in a transaction that already holds the write
+            # lock, so that the rows can be inserted in bulk
+            if not connection.in_transaction:
+                connection.execute("BEGIN IMMEDIATE;")
+            next_id = max(connection.execute(SELECT_NEXT_CALL_ID).fetchone()[0],
+                          max((call.id + 1 for call in calls if call.id is not None), default=0))
+            stored = []
+            for call in calls:
+                if call.id is None:
+                    call = Call(next_id, call.phone_number, call.start_time, call.duration, call.cases)
+                    next_id += 1
+                stored.append(call)
+            connection.executemany(INSERT_CALL_BATCH, ((call.id,) for call in stored))
+            connection.executemany(INSERT_CALL, (with_end_time(call_to_row(call)) for call in stored))
+            connection.executemany(INSERT_CALL_CASE, (row for call in stored for row in case_rows(call.id, call.cases)))
+            for sql in (INSERT_CALL_BATCH_DAY_SUMMARIES, INSERT_CALL_BATCH_TIMES, INSERT_CALL_BATCH_SEARCH,
+                        UPDATE_CALL_BATCH_DATA_VERSION, DELETE_CALL_BATCH):
+                connection.execute(sql)
+            return ChangedCalls(stored, connection.execute(SELECT_DATA_VERSION).fetchone()[0])
 
     def delete_call(self, id_: int) -> Call:
-        call = self.get_call(id_)
-        with sqlite3.connect(self.database) as connection:
-            cursor = connection.cursor()
-            cursor.execute("""DELETE FROM "call" WHERE "id"=?;""", (id_,))
-            connection.commit()
-        return call
+        with self._pool.connection() as connection, connection:
+            call = self._decoder.decode(connection.execute(SELECT_CALL, (id_,)).fetchone())
+            connection.execute(DELETE_CALL, (id_,))
+            return call
+
+    def delete_calls(self, ids: Iterable[int]) -> ChangedCalls:
+        ids = json.dumps(list(ids))
+        with self._pool.connection() as connection, connection:
+            calls = sorted(self._select_calls(connection, SELECT_CALLS, (ids,)).fetchall())
+            connection.execute(DELETE_CALLS, (ids,))
+            return ChangedCalls(calls, connection.execute(SELECT_DATA_VERSION).fetchone()[0])
+
+    def delete_calls_by_date_range(self, start: datetime, end: datetime) -> ChangedCalls:
+        range_ = (round(start.timestamp()), round(end.timestamp()))
+        with self._pool.connection() as connection, connection:
+            calls = sorted(self._select_calls(connection, SELECT_CALLS_BY_DATE_RANGE, range_).fetchall())
+            connection.execute(DELETE_CALLS_BY_DATE_RANGE, range_)
+            return ChangedCalls(calls, connection.execute(SELECT_DATA_VERSION).fetchone()[0])
 
     def update_call(self, call: Call) -> Call:
-        with sqlite3.connect(self.database) as connection:
-            cursor = connection.cursor()
-            cursor.execute(
-                """
-                    UPDATE "call" SET
-                        "phone_number"=?,
-                        "start_time"=?,
-                        "duration"=?,
-                        "cases"=?
-                    WHERE "id"=?;
-                """,
-                (*call_to_row(call)[1:], call.id)
-            )
-            connection.commit()
-        return call
+        return self.update_calls((call,))[0]
+
+    def update_calls(self, calls: Iterable[Call]) -> ChangedCalls:
+        calls = tuple(calls)
+        with self._pool.connection() as connection, connection:
+            connection.executemany(UPDATE_CALL, ((*with_end_time(call_to_row(call))[1:], call.id) for call in calls))
+            connection.executemany(DELETE_CALL_CASES, ((call.id,) for call in calls))
+            connection.executemany(INSERT_CALL_CASE, (row for call in calls for row in case_rows(call.id, call.cases)))
+            return ChangedCalls(calls, connection.execute(SELECT_DATA_VERSION).fetchone()[0])
 
     def get_call(self, id_: int) -> Call:
-        with sqlite3.connect(self.database) as connection:
-            cursor = connection.cursor()
-            cursor.execute("""SELECT * FROM "call" WHERE "id"=?;""", (id_,))
-            return row_to_call(cursor.fetchone())
+        with self._pool.connection() as connection:
+            return self._decoder.decode(connection.execute(SELECT_CALL, (id_,)).fetchone())
 
     def get_calls_by_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
-        with sqlite3.connect(self.database) as connection:
-            cursor = connection.cursor()
-            cursor.execute(
-                """SELECT * FROM "call" WHERE "start_time" BETWEEN ? AND ? ORDER BY "start_time" ASC;""",
+        with self._pool.connection() as connection:
+            cursor = self._select_calls(
+                connection,
+                SELECT_CALLS_BY_DATE_RANGE,
                 (round(start.timestamp()), round(end.timestamp()))
             )
-            return tuple(map(row_to_call, cursor.fetchall()))
+            return tuple(cursor.fetchall())
+
+    def iter_calls_by_date_range(self, start: datetime, end: datetime, batch_size: int = 1024) -> Iterator[Call]:
+        # Suspended between batches, so the rows are read over a connection of their own, and closing the iterator
+        # closes the cursor and with it the read transaction
+        with self._pool.dedicated_connection() as connection:
+            cursor = self._select_calls(
+                connection,
+                SELECT_CALLS_BY_DATE_RANGE,
+                (round(start.timestamp()), round(end.timestamp()))
+            )
+            try:
+                while calls := cursor.fetchmany(batch_size):
+                    yield from calls
+            finally:
+                cursor.close()
+
+    def get_calls_overlapping_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        with self._pool.connection() as connection:
+            cursor = self._select_calls(
+                connection,
+                SELECT_CALLS_OVERLAPPING_DATE_RANGE,
+                {"start": round(start.timestamp()), "end": round(end.timestamp())}
+            )
+            return tuple(cursor.fetchall())
+
+    def iter_calls_overlapping_date_range(self, start: datetime, end: datetime,
+                                          batch_size: int = 1024) -> Iterator[Call]:
+        with self._pool.dedicated_connection() as connection:
+            cursor = self._select_calls(
+                connection,
+                SELECT_CALLS_OVERLAPPING_DATE_RANGE,
+                {"start": round(start.timestamp()), "end": round(end.timestamp())}
+            )
+            try:
+                while calls := cursor.fetchmany(batch_size):
+                    yield from calls
+            finally:
+                cursor.close()
+
+    def get_calls_by_case(self, case: str) -> tuple[Call, ...]:
+        with self._pool.connection() as connection:
+            return tuple(self._select_calls(connection, SELECT_CALLS_BY_CASE, (case,)).fetchall())
+
+    def search_calls(self, query: str, limit: int = 100) -> tuple[Call, ...]:
+        expression = search_expression(query)
+        if not expression:
+            return ()
+        with self._pool.connection() as connection:
+            return tuple(self._select_calls(connection, SEARCH_CALLS, (expression, limit)).fetchall())
+
+    def get_data_version(self) -> int:
+        with self._pool.connection() as connection:
+            return connection.execute(SELECT_DATA_VERSION).fetchone()[0]
+
+    def get_call_summary(self, start: datetime, end: datetime) -> CallSummary:
+        with self._pool.connection() as connection:
+            call_count, total_duration, first_start_time, last_start_time = connection.execute(
+                SELECT_CALL_SUMMARY,
+                call_summary_parameters(round(start.timestamp()), round(end.timestamp()))
+            ).fetchone()
+        return CallSummary(
+            call_count or 0,
+            timedelta(seconds=total_duration or 0),
+            None if first_start_time is None else datetime.fromtimestamp(first_start_time),
+            None if last_start_time is None else datetime.fromtimestamp(last_start_time)
+        )
+
+    def get_caller_statistics(self, start: datetime, end: datetime,
+                              limit: Optional[int] = None) -> tuple[CallerStatistics, ...]:
+        with self._pool.connection() as connection:
+            range_count, total_count = connection.execute(
+                SELECT_CALL_COUNTS,
+                (start.date().isoformat(), end.date().isoformat())
+            ).fetchone()
+            cursor = connection.execute(
+                SELECT_CALLER_STATISTICS_BY_PHONE_NUMBER if range_count > total_count * CALLER_STATISTICS_SCAN_SHARE
+                else SELECT_CALLER_STATISTICS_BY_START_TIME,
+                (round(start.timestamp()), round(end.timestamp()), -1 if limit is None else limit)
+            )
+            return tuple(
+                CallerStatistics(phone_number, call_count, timedelta(seconds=total_duration),
+                                 datetime.fromtimestamp(first_start_time), datetime.fromtimestamp(last_start_time))
+                for phone_number, call_count, total_duration, first_start_time, last_start_time in cursor.fetchall()
+            )
+
+    def get_daily_call_summaries(self, start: date, end: date) -> tuple[DailyCallSummary, ...]:
+        with self._pool.connection() as connection:
+            cursor = connection.execute(SELECT_DAILY_CALL_SUMMARIES, (start.isoformat(), end.isoformat()))
+            return tuple(
+                DailyCallSummary(date.fromisoformat(day), call_count, timedelta(seconds=total_duration),
+                                 datetime.fromtimestamp(first_start_time), datetime.fromtimestamp(last_start_time))
+                for day, call_count, total_duration, first_start_time, last_start_time in cursor.fetchall()
+            )
@@ -0,0 +1,58 @@
+import sqlite3
+from dataclasses import fields
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.core.model.call import Call
+
+Row = tuple[int, str, int, int, Optional[str]]
+
+# Cases are stored a row each and read back joined with a separator that can't be typed into a case, in the order of
+# the primary key of "call_case", which is their position
+CASE_SEPARATOR = '\x1f'
+
+# The columns of a row, which are the fields of Call in order
+ROW_COLUMNS = ("id", "phone_number", "start_time", "duration", "cases")
+assert ROW_COLUMNS == tuple(field.name for field in fields(Call))
+
+
+class CallDecoder:
+    """
+    Decodes call rows, sharing the phone numbers, durations and case tuples that repeat between rows and queries.
+
+    Can be used as the row factory of a cursor. Each kind of shared value is dropped all at once when there are more than
+    max_entries of it.
+    """
+
+    def __init__(self, max_entries: int = 1 << 16) -> None:
+        self.max_entries = max_entries
+        self._phone_numbers: dict[str, str] = {}
+        self._durations: dict[int, timedelta] = {}
+        self._cases: dict[Optional[str], tuple[str, ...]] = {None: ()}
+
+    def __call__(self, _cursor: sqlite3.Cursor, row: Row) -> Call:
+        return self.decode(row)
+
+    def decode(self, row: Row, fromtimestamp=datetime.fromtimestamp) -> Call:
+        id_, phone_number, start, duration, cases = row
+
+        shared_phone_number = self._phone_numbers.get(phone_number)
+        if shared_phone_number is None:
+            if len(self._phone_numbers) >= self.max_entries:
+                self._phone_numbers.clear()
+            shared_phone_number = self._phone_numbers[phone_number] = phone_number
+
+        shared_duration = self._durations.get(duration)
+        if shared_duration is None:
+            if len(self._durations) >= self.max_entries:
+                self._durations.clear()
+            shared_duration = self._durations[duration] = timedelta(0, duration)
+
+        shared_cases = self._cases.get(cases)
+        if shared_cases is None:
+            if len(self._cases) >= self.max_entries:
+                self._cases.clear()
+                self._cases[None] = ()
+            shared_cases = self._cases[cases] = tuple(cases.split(CASE_SEPARATOR))
+
+        return Call(id_, shared_phone_number, fromtimestamp(start), shared_duration, shared_cases)
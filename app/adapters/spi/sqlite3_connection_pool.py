@@ -0,0 +1,153 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, LifoQueue
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SQLite3Pragmas:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size: int = -16384  # Negative values are KiB, positive values are pages
+    mmap_size: int = 1 << 28  # Bytes
+    busy_timeout: int = 5000  # Milliseconds
+
+
+class SQLite3ConnectionPool:
+    """
+    A small pool of SQLite connections that are opened once and reused.
+
+    A thread keeps the connection it checked out for as long as it holds it, so nested checkouts on the same thread
+    share one connection (and therefore one transaction). Connections are only ever used by one thread at a time.
+
+    Iterators that are suspended between rows check out a dedicated connection instead, which is theirs alone until they
+    are closed, on whichever thread that happens.
+
+    Read-only pools open their connections in SQLite's read-only mode and leave the journal mode to the writers.
+    """
+
+    def __init__(self, database: Path, pragmas: SQLite3Pragmas = SQLite3Pragmas(), size: int = 4,
+                 cached_statements: int = 128, read_only: bool = False) -> None:
+        assert size > 0
+
+        self.database = database
+        self.pragmas = pragmas
+        self.size = size
+        self.cached_statements = cached_statements
+        self.read_only = read_only
+
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue(size)
+        self._connections: list[sqlite3.Connection] = []
+        self._dedicated: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            f"{Path(self.database).resolve().as_uri()}?mode=ro" if self.read_only else self.database,
+            timeout=self.pragmas.busy_timeout / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            uri=self.read_only
+        )
+        if not self.read_only:
+            connection.execute(f"PRAGMA journal_mode={self.pragmas.journal_mode};")
+            connection.execute(f"PRAGMA synchronous={self.pragmas.synchronous};")
+        connection.execute(f"PRAGMA cache_size={int(self.pragmas.cache_size)};")
+        connection.execute(f"PRAGMA mmap_size={int(self.pragmas.mmap_size)};")
+        connection.execute(f"PRAGMA busy_timeout={int(self.pragmas.busy_timeout)};")
+        logger.debug("Opened a connection to '%s'", self.database)
+        return connection
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed connection pool.")
+            if len(self._connections) < self.size:
+                connection = self._connect()
+                self._connections.append(connection)
+                return connection
+
+        return self._idle.get()
+
+    def _release(self, connection: sqlite3.Connection) -> None:
+        with self._lock:
+            if self._closed:
+                connection.close()
+                return
+        self._idle.put_nowait(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed connection pool.")
+
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        connection = self._acquire()
+        self._local.held = connection
+        self._local.depth = 1
+        try:
+            yield connection
+        finally:
+            self._local.depth -= 1
+            if not self._local.depth:
+                self._local.held = None
+                self._release(connection)
+
+    @contextmanager
+    def dedicated_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Checks out a connection that is not shared with any other checkout, and never waits for one.
+
+        Dedicated connections are kept apart from the pool's own, as the thread may already hold all of those, and are
+        reused by later dedicated checkouts.
+        """
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed connection pool.")
+            connection = self._dedicated.pop() if self._dedicated else self._connect()
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                if self._closed:
+                    connection.close()
+                else:
+                    self._dedicated.append(connection)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+        for connection in self._dedicated:
+            connection.close()
+        self._dedicated.clear()
+        logger.debug("Closed connection pool for '%s'", self.database)
@@ -0,0 +1,356 @@
+import logging
+import sqlite3
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def _create_call_table(connection: sqlite3.Connection) -> None:
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS "call" (
+            "id" INTEGER NOT NULL PRIMARY KEY,
+            "phone_number" TEXT,
+            "start_time"  INTEGER,
+            "duration" INTEGER,
+            "cases" TEXT
+        );
+    """)
+
+
+def _add_end_time_column(connection: sqlite3.Connection) -> None:
+    columns = {column for _, column, *_ in connection.execute("""PRAGMA table_info("call");""")}
+    if "end_time" not in columns:
+        connection.execute("""ALTER TABLE "call" ADD COLUMN "end_time" INTEGER;""")
+    connection.execute("""UPDATE "call" SET "end_time"="start_time" + "duration" WHERE "end_time" IS NULL;""")
+
+
+def _create_start_time_index(connection: sqlite3.Connection) -> None:
+    # Covers every selected column so range queries never have to visit the table itself
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS "call_start_time" ON "call" (
+            "start_time",
+            "end_time",
+            "duration",
+            "phone_number",
+            "cases"
+        );
+    """)
+
+
+def _create_data_version_table(connection: sqlite3.Connection) -> None:
+    # A single row counting changes to the calls, so that derived data can be invalidated across restarts
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS "data_version" (
+            "id" INTEGER NOT NULL PRIMARY KEY CHECK ("id" = 0),
+            "version" INTEGER NOT NULL
+        );
+    """)
+    connection.execute("""INSERT OR IGNORE INTO "data_version" ("id", "version") VALUES (0, 0);""")
+
+
+# The local day of a call, matching datetime.fromtimestamp on the stored start time
+CALL_DAY = """date({0}."start_time", 'unixepoch', 'localtime')"""
+
+# Folds a call into the summary of its day
+ADD_TO_CALL_DAY_SUMMARY = """
+    INSERT INTO "call_day_summary"
+    VALUES (date({0}."start_time", 'unixepoch', 'localtime'), 1, {0}."duration", {0}."start_time", {0}."start_time")
+    ON CONFLICT ("day") DO UPDATE SET
+        "call_count"="call_count" + 1,
+        "total_duration"="total_duration" + excluded."total_duration",
+        "first_start_time"=min("first_start_time", excluded."first_start_time"),
+        "last_start_time"=max("last_start_time", excluded."last_start_time");
+"""
+
+# Takes a call that is no longer stored out of the summary of its day. Days are contiguous, so when the call was the
+# first or last of its day, the nearest remaining call in that direction is the new first or last, and a single index
+# lookup finds it.
+SUBTRACT_FROM_CALL_DAY_SUMMARY = """
+    UPDATE "call_day_summary" SET
+        "call_count"="call_count" - 1,
+        "total_duration"="total_duration" - {0}."duration",
+        "first_start_time"=CASE WHEN "first_start_time"={0}."start_time" THEN coalesce(
+            (SELECT min("start_time") FROM "call" WHERE "start_time" >= {0}."start_time"), "first_start_time"
+        ) ELSE "first_start_time" END,
+        "last_start_time"=CASE WHEN "last_start_time"={0}."start_time" THEN coalesce(
+            (SELECT max("start_time") FROM "call" WHERE "start_time" <= {0}."start_time"), "last_start_time"
+        ) ELSE "last_start_time" END
+    WHERE "day"=date({0}."start_time", 'unixepoch', 'localtime');
+    DELETE FROM "call_day_summary"
+    WHERE "day"=date({0}."start_time", 'unixepoch', 'localtime') AND "call_count"=0;
+"""
+
+
+def _create_call_day_summary_table(connection: sqlite3.Connection) -> None:
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS "call_day_summary" (
+            "day" TEXT NOT NULL PRIMARY KEY,
+            "call_count" INTEGER NOT NULL,
+            "total_duration" INTEGER NOT NULL,
+            "first_start_time" INTEGER NOT NULL,
+            "last_start_time" INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    connection.execute(f"""
+        INSERT OR REPLACE INTO "call_day_summary"
+        SELECT {CALL_DAY.format('"call"')}, count(*), sum("duration"), min("start_time"), max("start_time")
+        FROM "call"
+        GROUP BY 1;
+    """)
+
+    # Keeps the summaries up to date in the same transaction as every write, at the cost of a few index lookups
+    connection.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS "call_day_summary_insert" AFTER INSERT ON "call" BEGIN
+            {ADD_TO_CALL_DAY_SUMMARY.format("NEW")}
+        END;
+    """)
+    connection.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS "call_day_summary_update"
+        AFTER UPDATE OF "start_time", "duration" ON "call" BEGIN
+            {SUBTRACT_FROM_CALL_DAY_SUMMARY.format("OLD")}
+            {ADD_TO_CALL_DAY_SUMMARY.format("NEW")}
+        END;
+    """)
+    connection.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS "call_day_summary_delete" AFTER DELETE ON "call" BEGIN
+            {SUBTRACT_FROM_CALL_DAY_SUMMARY.format("OLD")}
+        END;
+    """)
+
+
+def _create_call_time_index(connection: sqlite3.Connection) -> None:
+    # Indexes every call as the interval [start_time, end_time]. R*Tree coordinates are 32 bit floats, which SQLite rounds
+    # outwards, so a lookup finds every overlapping call plus possibly a few neighbours that need to be filtered out.
+    connection.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS "call_time" USING rtree(
+            "id",
+            "start_time",
+            "end_time"
+        );
+    """)
+    connection.execute("""
+        INSERT OR REPLACE INTO "call_time" ("id", "start_time", "end_time")
+        SELECT "id", "start_time", "end_time" FROM "call";
+    """)
+
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS "call_time_insert" AFTER INSERT ON "call" BEGIN
+            INSERT INTO "call_time" ("id", "start_time", "end_time") VALUES (NEW."id", NEW."start_time", NEW."end_time");
+        END;
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS "call_time_update" AFTER UPDATE OF "id", "start_time", "end_time" ON "call" BEGIN
+            DELETE FROM "call_time" WHERE "id"=OLD."id";
+            INSERT INTO "call_time" ("id", "start_time", "end_time") VALUES (NEW."id", NEW."start_time", NEW."end_time");
+        END;
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS "call_time_delete" AFTER DELETE ON "call" BEGIN
+            DELETE FROM "call_time" WHERE "id"=OLD."id";
+        END;
+    """)
+
+
+def _normalize_cases(connection: sqlite3.Connection) -> None:
+    # Every case of a call is a row of its own, in the order the call lists them
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS "call_case" (
+            "call_id" INTEGER NOT NULL,
+            "position" INTEGER NOT NULL,
+            "case" TEXT NOT NULL,
+            PRIMARY KEY ("call_id", "position")
+        ) WITHOUT ROWID;
+    """)
+    connection.execute("""CREATE INDEX IF NOT EXISTS "call_case_case" ON "call_case" ("case", "call_id");""")
+
+    # Case identifiers and phone numbers are searchable by prefix. The row id of a search entry is the id of its call.
+    connection.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS "call_search" USING fts5(
+            "phone_number",
+            "cases",
+            prefix='2 3 4'
+        );
+    """)
+
+    columns = {column for _, column, *_ in connection.execute("""PRAGMA table_info("call");""")}
+    if "cases" in columns:
+        connection.execute("""
+            INSERT OR REPLACE INTO "call_case" ("call_id", "position", "case")
+            SELECT "call"."id", "json_each"."key", "json_each"."value"
+            FROM "call", json_each("call"."cases");
+        """)
+
+        # The covering index includes the column that is about to be dropped, so it is rebuilt without it
+        connection.execute("""DROP INDEX IF EXISTS "call_start_time";""")
+        connection.execute("""ALTER TABLE "call" DROP COLUMN "cases";""")
+        connection.execute("""
+            CREATE INDEX IF NOT EXISTS "call_start_time" ON "call" (
+                "start_time",
+                "end_time",
+                "duration",
+                "phone_number"
+            );
+        """)
+
+    connection.execute("""DELETE FROM "call_search";""")
+    connection.execute("""
+        INSERT INTO "call_search" ("rowid", "phone_number", "cases")
+        SELECT "id", "phone_number", coalesce(
+            (SELECT group_concat("case", ' ') FROM "call_case" WHERE "call_id"="call"."id"), ''
+        )
+        FROM "call";
+    """)
+
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS "call_search_insert" AFTER INSERT ON "call" BEGIN
+            INSERT INTO "call_search" ("rowid", "phone_number", "cases") VALUES (NEW."id", NEW."phone_number", '');
+        END;
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS "call_search_update" AFTER UPDATE OF "phone_number" ON "call" BEGIN
+            UPDATE "call_search" SET "phone_number"=NEW."phone_number" WHERE "rowid"=NEW."id";
+        END;
+    """)
+    connection.execute("""
+        CREATE TRIGGER IF NOT EXISTS "call_case_delete_call" AFTER DELETE ON "call" BEGIN
+            DELETE FROM "call_search" WHERE "rowid"=OLD."id";
+            DELETE FROM "call_case" WHERE "call_id"=OLD."id";
+        END;
+    """)
+    for event, call_id in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS "call_search_case_{event.lower()}" AFTER {event} ON "call_case" BEGIN
+                UPDATE "call_search" SET "cases"=coalesce(
+                    (SELECT group_concat("case", ' ') FROM "call_case" WHERE "call_id"={call_id}."call_id"), ''
+                )
+                WHERE "rowid"={call_id}."call_id";
+            END;
+        """)
+
+
+def _create_phone_number_index(connection: sqlite3.Connection) -> None:
+    # Calls grouped by caller, with everything the per-caller aggregates read, so they never touch the table
+    connection.execute("""
+        CREATE INDEX IF NOT EXISTS "call_phone_number" ON "call" (
+            "phone_number",
+            "start_time",
+            "duration"
+        );
+    """)
+
+
+def _create_data_version_triggers(connection: sqlite3.Connection) -> None:
+    # Every changed call bumps the data version in the transaction that changed it, so a change can never be committed
+    # without invalidating what was derived from the calls before it. The cases of a call only ever change along with
+    # its row, which an update rewrites.
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS "data_version_{event.lower()}" AFTER {event} ON "call" BEGIN
+                UPDATE "data_version" SET "version"="version" + 1 WHERE "id"=0;
+            END;
+        """)
+
+
+def _batch_call_inserts(connection: sqlite3.Connection) -> None:
+    # Calls inserted in bulk list their ids in "call_batch" for the duration of the insert, which the insert triggers skip
+    # so that the summaries, the indexes and the data version are brought up to date once for the whole batch. The
+    # table is only ever filled within a transaction that empties it again before committing.
+    connection.execute("""CREATE TABLE IF NOT EXISTS "call_batch" ("id" INTEGER NOT NULL PRIMARY KEY);""")
+
+    not_batched = """WHEN NOT EXISTS (SELECT 1 FROM "call_batch" WHERE "id"=NEW."id")"""
+    for trigger, body in (
+            ("call_day_summary_insert", ADD_TO_CALL_DAY_SUMMARY.format("NEW")),
+            ("call_time_insert", """
+                INSERT INTO "call_time" ("id", "start_time", "end_time")
+                VALUES (NEW."id", NEW."start_time", NEW."end_time");
+            """),
+            # The cases of a call may be written before the call, so its search entry is created with them
+            ("call_search_insert", """
+                INSERT INTO "call_search" ("rowid", "phone_number", "cases")
+                VALUES (NEW."id", NEW."phone_number", coalesce(
+                    (SELECT group_concat("case", ' ') FROM "call_case" WHERE "call_id"=NEW."id"), ''
+                ));
+            """),
+            ("data_version_insert", """UPDATE "data_version" SET "version"="version" + 1 WHERE "id"=0;"""),
+    ):
+        connection.execute(f"""DROP TRIGGER IF EXISTS "{trigger}";""")
+        connection.execute(f"""
+            CREATE TRIGGER "{trigger}" AFTER INSERT ON "call" {not_batched} BEGIN
+                {body}
+            END;
+        """)
+
+    connection.execute("""DROP TRIGGER IF EXISTS "call_search_case_insert";""")
+    connection.execute("""
+        CREATE TRIGGER "call_search_case_insert" AFTER INSERT ON "call_case"
+        WHEN NOT EXISTS (SELECT 1 FROM "call_batch" WHERE "id"=NEW."call_id") BEGIN
+            UPDATE "call_search" SET "cases"=coalesce(
+                (SELECT group_concat("case", ' ') FROM "call_case" WHERE "call_id"=NEW."call_id"), ''
+            )
+            WHERE "rowid"=NEW."call_id";
+        END;
+    """)
+
+
+# Ordered, append-only. Migration n brings the database to "PRAGMA user_version" n. Every step must be idempotent so
+# that databases created before versioning was introduced (user_version 0) can be upgraded in place.
+MIGRATIONS: tuple[Migration, ...] = (
+    _create_call_table,
+    _add_end_time_column,
+    _create_start_time_index,
+    _create_data_version_table,
+    _create_call_day_summary_table,
+    _create_call_time_index,
+    _normalize_cases,
+    _create_phone_number_index,
+    _create_data_version_triggers,
+    _batch_call_inserts,
+)
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def verify_schema_version(connection: sqlite3.Connection, migrations: tuple[Migration, ...] = MIGRATIONS) -> int:
+    """
+    Checks that the database is up to date without changing it, for connections that can't migrate it.
+
+    :param connection: An open connection to the database
+    :param migrations: The ordered migrations making up the schema
+    :return: The schema version of the database
+    """
+
+    current_version = get_schema_version(connection)
+    if current_version != len(migrations):
+        logger.error("Database schema version %d is not the supported %d", current_version, len(migrations))
+        raise sqlite3.DatabaseError(f"Unsupported database schema version {current_version}, open the database for "
+                                    f"writing once to migrate it")
+    return current_version
+
+
+def migrate(connection: sqlite3.Connection, migrations: tuple[Migration, ...] = MIGRATIONS) -> int:
+    """
+    Brings the database up to date by running every migration newer than its current schema version.
+
+    :param connection: An open connection to the database
+    :param migrations: The ordered migrations making up the schema
+    :return: The schema version of the database after migrating
+    """
+
+    with connection:
+        connection.execute("BEGIN IMMEDIATE;")
+        current_version = get_schema_version(connection)
+
+        if current_version > len(migrations):
+            logger.error("Database schema version %d is newer than the supported %d", current_version, len(migrations))
+            raise sqlite3.DatabaseError(f"Unsupported database schema version {current_version}")
+
+        for version, migration in enumerate(migrations[current_version:], current_version + 1):
+            logger.info("Migrating database to schema version %d (%s)", version, migration.__name__)
+            migration(connection)
+            connection.execute(f"PRAGMA user_version={version};")
+
+    return len(migrations)
@@ -1,5 +1,4 @@
-from datetime import timedelta
-from functools import reduce
+from typing import Iterator
 
 from app.core.model.report import ReportFlavor, Report
 
@@ -9,42 +8,55 @@ def seconds_to_minutes(seconds: int | float) -> int:
 
 
 class TextReportRendererAdapterSPI:
-    def __init__(self, flavor: ReportFlavor, group_separator: str = '#', call_separator: str = '-'):
+    def __init__(self, flavor: ReportFlavor, group_separator: str = '#', call_separator: str = '-',
+                 chunk_size: int = 1 << 16):
         self._flavor = flavor
         self._group_separator = group_separator
         self._call_separator = call_separator
+        self._chunk_size = chunk_size
 
     def get_flavor(self) -> ReportFlavor:
         return self._flavor
 
-    def render_report(self, report: Report) -> bytes:
-        intervals = sorted(report.intervals.items())
+    def _render_lines(self, report: Report) -> Iterator[str]:
+        # A report without calls has no intervals to take its period from
+        if report.interval_count:
+            period = (f"{report.interval_start_time(0).astimezone().isoformat()} -> "
+                      f"{report.interval_start_time(-1).astimezone().isoformat()}")
+        else:
+            period = "-"
 
-        start = intervals[0][0]
-        end = intervals[-1][0]
-
-        data = [
-            f"Period: {start.astimezone().isoformat()} -> {end.astimezone().isoformat()}",
+        yield from (
+            f"Period: {period}",
             "",
-            f"Calls: {len(report.calls)}", f"Initiated {seconds_to_minutes(report.interval_size.total_seconds())} minute intervals: {len(intervals)}",
-            f"Active work time: {reduce(lambda td, c: td + c.duration, report.calls, timedelta())}",
+            f"Calls: {report.call_count}", f"Initiated {seconds_to_minutes(report.interval_size.total_seconds())} minute intervals: {report.interval_count}",
+            f"Active work time: {report.total_active_time}",
             ""
-        ]
-
-        for n, (half_hour, group) in enumerate(intervals, 1):
-            data.append(f"{f" {n}. {half_hour.isoformat()} ".center(64, self._group_separator)}")
-            data.append("")
-            data.append(
-                f"\n\n{self._call_separator * 48}\n\n".join((
-                    '\n'.join((
-                        f"Tel: {call.phone_number}",
-                        f"Start time: {call.start_time.isoformat()}",
-                        f"Duration: Ca. {call.duration}",
-                        f"Cases: {", ".join(call.cases)}",
-                        f"{seconds_to_minutes(report.interval_size.total_seconds())} minute interval: {half_hour.isoformat()}"
-                    )) for call in group
-                ))
-            )
-            data.append("")
-
-        return '\n'.join(data).encode("UTF-8")
+        )
+
+        for n, (half_hour, group) in enumerate(report.iter_intervals(), 1):
+            yield f"{f" {n}. {half_hour.isoformat()} ".center(64, self._group_separator)}"
+            yield ""
+            yield f"\n\n{self._call_separator * 48}\n\n".join((
+                '\n'.join((
+                    f"Tel: {call.phone_number}",
+                    f"Start time: {call.start_time.isoformat()}",
+                    f"Duration: Ca. {call.duration}",
+                    f"Cases: {", ".join(call.cases)}",
+                    f"{seconds_to_minutes(report.interval_size.total_seconds())} minute interval: {half_hour.isoformat()}"
+                )) for call in group
+            ))
+            yield ""
+
+    def render_report(self, report: Report) -> Iterator[bytes]:
+        lines = self._render_lines(report)
+        chunk = [next(lines)]
+        size = len(chunk[0])
+        for line in lines:
+            chunk.append(line)
+            size += len(line) + 1
+            if size >= self._chunk_size:
+                yield '\n'.join(chunk).encode("UTF-8")
+                chunk = [""]
+                size = 0
+        yield '\n'.join(chunk).encode("UTF-8")
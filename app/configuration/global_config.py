@@ -1,9 +1,36 @@
+import os
 from pathlib import Path
+from typing import Optional
 
 __version__ = "1.0.0"
 
 DATABASE = Path("./njord.db")
 
+# Port timings are only recorded when NJORD_METRICS names the file they are dumped to. They are logged every
+# METRICS_LOG_INTERVAL seconds, and NJORD_TRACE_MEMORY adds the peak memory of every report to them.
+METRICS: Optional[Path] = Path(os.environ["NJORD_METRICS"]) if os.environ.get("NJORD_METRICS") else None
+METRICS_LOG_INTERVAL = 300.0
+TRACE_MEMORY = bool(os.environ.get("NJORD_TRACE_MEMORY"))
+
+# The log file is rotated once it exceeds LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT gzip compressed predecessors
+LOG_FILE = Path("./logs.log")
+LOG_MAX_BYTES = 8 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+
+def _log_levels(default: dict[str, str]) -> dict[str, str]:
+    # NJORD_LOG_LEVELS overrides levels, e.g. "app.adapters.spi=DEBUG,app.gui=ERROR"
+    levels = dict(default)
+    for entry in os.environ.get("NJORD_LOG_LEVELS", "").split(","):
+        name, separator, level = entry.partition("=")
+        if separator:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+# Levels per subsystem, the empty name being the root logger
+LOG_LEVELS = _log_levels({"": "WARNING", "app": "INFO"})
+
 
 def get_version() -> str:
     return __version__
@@ -0,0 +1,128 @@
+import tracemalloc
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Collection, Iterator, Optional, TypeVar
+
+from app.core.ports.spi.metrics_port_spi import MetricsPortSPI
+
+Port = TypeVar("Port")
+
+
+def _count(item: Any) -> tuple[int, int]:
+    # Rows and bytes an item of a result stands for
+    return (0, len(item)) if isinstance(item, (bytes, bytearray, memoryview)) else (1, 0)
+
+
+def _instrumented_iterator(iterator: Iterator, operation: str, metrics_spi: MetricsPortSPI,
+                           seconds: float) -> Iterator:
+    # Only the time spent producing items counts, not the time the consumer spends between them
+    rows = nbytes = 0
+    failed = False
+    try:
+        while True:
+            begin = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds += perf_counter() - begin
+                return
+            seconds += perf_counter() - begin
+            item_rows, item_bytes = _count(item)
+            rows += item_rows
+            nbytes += item_bytes
+            yield item
+    except BaseException as exception:
+        failed = not isinstance(exception, GeneratorExit)
+        raise
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+        metrics_spi.record(operation, seconds, rows, nbytes, failed)
+
+
+def _counted(items: Iterator, counts: list[int]) -> Iterator:
+    for item in items:
+        item_rows, item_bytes = _count(item)
+        counts[0] += item_rows
+        counts[1] += item_bytes
+        yield item
+
+
+def _instrument_method(method: Callable, operation: str, metrics_spi: MetricsPortSPI,
+                       trace_memory: bool) -> Callable:
+    @wraps(method)
+    def instrumented(*args, **kwargs):
+        # Items handed in as iterators, like the chunks of a report to export, are counted as they are consumed
+        counts = [0, 0]
+        args = tuple(_counted(arg, counts) if isinstance(arg, Iterator) else arg for arg in args)
+
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if trace_memory:
+            tracemalloc.reset_peak()
+
+        begin = perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            metrics_spi.record(operation, perf_counter() - begin, counts[0], counts[1], True)
+            raise
+        finally:
+            if trace_memory:
+                metrics_spi.record_peak_memory(operation, tracemalloc.get_traced_memory()[1])
+            if started_tracing:
+                tracemalloc.stop()
+        seconds = perf_counter() - begin
+
+        if isinstance(result, Iterator):
+            return _instrumented_iterator(result, operation, metrics_spi, seconds)
+        if isinstance(result, (tuple, list)):
+            metrics_spi.record(operation, seconds, len(result), counts[1])
+        else:
+            metrics_spi.record(operation, seconds, counts[0], counts[1])
+        return result
+
+    return instrumented
+
+
+class _InstrumentedPort:
+    def __init__(self, port: Any, name: str, metrics_spi: MetricsPortSPI, trace_memory: Collection[str]) -> None:
+        self._port = port
+        self._name = name
+        self._metrics_spi = metrics_spi
+        self._trace_memory = trace_memory
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(self._port, attribute)
+        if attribute.startswith("_") or not callable(value):
+            return value
+
+        # Wrapped once, later lookups find the wrapper on the instance without reaching __getattr__
+        instrumented = _instrument_method(value, f"{self._name}.{attribute}", self._metrics_spi,
+                                          attribute in self._trace_memory)
+        setattr(self, attribute, instrumented)
+        return instrumented
+
+
+def instrument(port: Port, name: str, metrics_spi: Optional[MetricsPortSPI],
+               trace_memory: Collection[str] = ()) -> Port:
+    """
+    Wraps a port implementation so that every public method records its latency, call count, and the rows and bytes
+    it returns or consumes.
+
+    Results that are iterators are timed while they are consumed, counting items as rows and bytes objects as bytes.
+    Iterators passed in, like the chunks handed to an exporter, are counted the same way. Exceptions count as failures.
+
+    :param port: The implementation to wrap
+    :param name: Prefixes the names of the recorded operations
+    :param metrics_spi: Receives the measurements. The port is returned as is when None, so that turned off,
+                        instrumentation costs nothing.
+    :param trace_memory: Methods whose peak memory is captured with tracemalloc, which slows them down considerably
+    :return: The wrapped port, which can be used in place of the original
+    """
+
+    if metrics_spi is None:
+        return port
+    return _InstrumentedPort(port, name, metrics_spi, frozenset(trace_memory))
@@ -0,0 +1,48 @@
+import threading
+from typing import Any, Callable, Optional, TypeVar
+
+Port = TypeVar("Port")
+
+
+class _LazyPort:
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._instance: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(self._get(), attribute)
+        if callable(value):
+            # Later lookups find the bound method on the instance without reaching __getattr__
+            setattr(self, attribute, value)
+        return value
+
+
+def lazy(factory: Callable[[], Port]) -> Port:
+    """
+    Defers creating a port implementation, and whatever its factory imports, until one of its attributes is first used.
+    Safe to first use from any thread.
+
+    :param factory: Creates the implementation, called at most once
+    :return: A stand-in that can be used in place of the implementation
+    """
+
+    return _LazyPort(factory)
+
+
+def created(port: Port) -> Optional[Port]:
+    """
+    :return: The implementation behind a port made by lazy, None if it was never used. Ports that are not lazy are
+             returned as they are.
+    """
+
+    if isinstance(port, _LazyPort):
+        return port._instance
+    return port
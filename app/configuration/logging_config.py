@@ -1,12 +1,105 @@
+import atexit
+import gzip
 import logging
+import os
+import queue
+import shutil
 import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Callable, Iterator, Mapping, Optional, Protocol
 
+logger = logging.getLogger(__name__)
+
+GZIP_SUFFIX = ".gz"
+
+
+class LoggedMetrics(Protocol):
+    """
+    Metrics that can be logged periodically, such as those of the InMemoryMetricsAdapterSPI.
+    """
+
+    def summary(self) -> Iterator[str]:
+        ...
+
+    def dump(self, path: Path) -> None:
+        ...
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Puts records on the queue as they are, leaving them to be formatted by the handlers of the listener. The queue
+    never leaves the process, so records need not be made picklable first, which QueueHandler does by formatting them.
+    Arguments are therefore formatted as they are when the listener gets to them.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _log_metrics(metrics: LoggedMetrics, interval: float, dump_path: Optional[Path],
+                 stopped: threading.Event) -> None:
+    while not stopped.wait(interval):
+        for line in metrics.summary():
+            logger.info("Metrics: %s", line)
+        if dump_path is not None:
+            metrics.dump(dump_path)
+
+
+def _compressed_name(name: str) -> str:
+    return name + GZIP_SUFFIX
+
+
+def _compress(source: str, destination: str) -> None:
+    with open(source, "rb") as uncompressed, gzip.open(destination, "wb") as compressed:
+        shutil.copyfileobj(uncompressed, compressed)
+    os.remove(source)
+
+
+class LoggerHandler(logging.Handler):
+    """
+    Hands records to the logger they were logged with in this process, for a QueueListener receiving the records of
+    other processes, such as those set up with configure_queue_logging.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def configure_queue_logging(log_queue: queue.Queue, levels: Optional[Mapping[str, str]] = None) -> None:
+    """
+    Logs by putting records on a queue shared with another process, which writes them out along with its own.
+
+    :param levels: Level names by logger name, the empty name being the root logger, which logs at INFO by default
+    """
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    # Formats the records before they are put on the queue, so that their arguments need not be picklable
+    root_logger.addHandler(QueueHandler(log_queue))
+    for name, level in (levels or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def configure_logging(metrics: Optional[LoggedMetrics] = None, metrics_interval: float = 300.0,
+                      metrics_dump_path: Optional[Path] = None, log_file: Path = Path("logs.log"),
+                      max_bytes: int = 8 * 1024 * 1024, backup_count: int = 5,
+                      levels: Optional[Mapping[str, str]] = None) -> Callable[[], None]:
+    """
+    Logs to standard output and to a file that is rotated by size, with the rotated files gzip compressed.
+
+    Loggers only put records on a queue. Formatting the output, writing it and compressing rotated files happens on a
+    listener thread, so that no caller waits on the disk.
+
+    :param metrics: Logged every metrics_interval seconds, if given, on a daemon thread
+    :param metrics_dump_path: Receives a JSON dump of the metrics whenever they are logged
+    :param levels: Level names by logger name, the empty name being the root logger, which logs at INFO by default
+    :return: Stops the periodic logging of metrics and flushes the queued records. Also called at exit.
+    """
 
-def configure_logging() -> None:
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
     formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(message)s",
+        "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
         "%Y-%m-%dT%H:%M:%S"
     )
 
@@ -14,9 +107,41 @@ def configure_logging() -> None:
     stdout_handler.setLevel(logging.DEBUG)
     stdout_handler.setFormatter(formatter)
 
-    file_handler = logging.FileHandler('logs.log')
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8",
+                                       delay=True)
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
+    file_handler.namer = _compressed_name
+    file_handler.rotator = _compress
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stdout_handler, file_handler, respect_handler_level=True)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    queue_handler = _QueueHandler(log_queue)
+    root_logger.addHandler(queue_handler)
+    for name, level in (levels or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener.start()
+
+    stopped = threading.Event()
+    if metrics is not None:
+        threading.Thread(target=_log_metrics, args=(metrics, metrics_interval, metrics_dump_path, stopped),
+                         name="metrics-logger", daemon=True).start()
+
+    lock = threading.Lock()
+
+    def stop_logging() -> None:
+        # The listener can only be stopped once
+        with lock:
+            if stopped.is_set():
+                return
+            stopped.set()
+            root_logger.removeHandler(queue_handler)
+            listener.stop()
+            file_handler.close()
 
-    logger.addHandler(file_handler)
-    logger.addHandler(stdout_handler)
+    atexit.register(stop_logging)
+    return stop_logging
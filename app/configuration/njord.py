@@ -1,9 +1,14 @@
+from time import perf_counter
+
 from app.configuration.global_config import DATABASE
-from app.configuration.njord_gui import njord_gui
+from app.configuration.startup_timings import StartupTimings
 
 
 def main() -> None:
-    njord_gui(DATABASE)
+    # Imported here, so that the time it takes to import the application counts towards startup
+    startup_timings = StartupTimings(perf_counter())
+    from app.configuration.njord_gui import njord_gui
+    njord_gui(DATABASE, startup_timings)
 
 
 if __name__ == "__main__":
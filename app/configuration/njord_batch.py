@@ -0,0 +1,261 @@
+import argparse
+import logging
+import multiprocessing
+import queue
+import sqlite3
+import sys
+from calendar import monthrange
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from itertools import chain
+from logging.handlers import QueueListener
+from math import ceil
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Optional
+
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.configuration.global_config import DATABASE, LOG_BACKUP_COUNT, LOG_FILE, LOG_LEVELS, LOG_MAX_BYTES
+from app.configuration.logging_config import LoggerHandler, configure_logging, configure_queue_logging
+from app.configuration.report_adapters import REPORT_RENDERERS, report_exporter_adapter_spi, \
+    report_renderer_adapter_spis
+from app.core.model.report import ReportFlavor, report_file_type
+from app.core.services.report_service import ReportService
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FILE_NAME_FORMAT = "%Y%m%d%H%M%S"
+
+# Consecutive jobs handed to a worker at once, their reports being generated together. No more than the report cache
+# holds, so that every report is still cached when it is exported.
+MAX_JOBS_PER_TASK = 16
+
+
+def _days(moment: datetime, count: int) -> datetime:
+    return moment + timedelta(days=count)
+
+
+def _weeks(moment: datetime, count: int) -> datetime:
+    return moment + timedelta(weeks=count)
+
+
+def _months(moment: datetime, count: int) -> datetime:
+    # Days past the end of the month land on its last day
+    year, month = divmod(moment.year * 12 + moment.month - 1 + count, 12)
+    return moment.replace(year=year, month=month + 1, day=min(moment.day, monthrange(year, month + 1)[1]))
+
+
+def _years(moment: datetime, count: int) -> datetime:
+    return _months(moment, 12 * count)
+
+
+# The moment a number of periods after another
+PERIODS: dict[str, Callable[[datetime, int], datetime]] = {
+    "day": _days,
+    "week": _weeks,
+    "month": _months,
+    "year": _years,
+}
+
+
+@dataclass(frozen=True)
+class ReportJob:
+    start: datetime
+    end: datetime
+    interval_size: timedelta
+    flavors: tuple[ReportFlavor, ...]
+    directory: Path
+
+    def path(self, flavor: ReportFlavor) -> Path:
+        extension, _ = report_file_type(flavor)
+        return self.directory / (f"{self.start.strftime(DATETIME_FILE_NAME_FORMAT)}-"
+                                 f"{self.end.strftime(DATETIME_FILE_NAME_FORMAT)}_"
+                                 f"({round(self.interval_size.total_seconds() / 60)}_minutes)."
+                                 f"{extension}")
+
+
+@dataclass(frozen=True)
+class ReportJobResult:
+    job: ReportJob
+    seconds: float
+    call_count: int = 0
+    interval_count: int = 0
+    errors: dict[ReportFlavor, str] = field(default_factory=dict)  # By the flavors that failed to export
+
+
+def report_jobs(start: datetime, end: datetime, period: str, interval_sizes: tuple[timedelta, ...],
+                flavors: tuple[ReportFlavor, ...], directory: Path) -> tuple[ReportJob, ...]:
+    """
+    Splits a range into consecutive periods, with a job for every period and interval size.
+
+    :param end: Exclusive, every period ends a second before the next one starts
+    :return: Jobs that each export one report in every flavor
+    """
+
+    jobs = []
+    period_start = start
+    periods = 0
+    while period_start < end:
+        # Counted from the start, so that a month starting on the 31st is followed by one starting on the 31st again
+        # wherever there is one
+        periods += 1
+        period_end = min(PERIODS[period](start, periods), end)
+        jobs.extend(ReportJob(period_start, period_end - timedelta(seconds=1), interval_size, flavors, directory)
+                    for interval_size in interval_sizes)
+        period_start = period_end
+    return tuple(jobs)
+
+
+# Every worker process generates reports from a read-only connection of its own
+_report_service: Optional[ReportService] = None
+
+
+def _initialize_worker(database: Path, log_queue: Optional[queue.Queue] = None) -> None:
+    global _report_service
+    # Records are written out by the parent process, which owns the log file
+    if log_queue is not None:
+        configure_queue_logging(log_queue, LOG_LEVELS)
+    # Never closed, the connection is read-only and goes away with the process
+    sqlite3_adapter_spi = SQLite3AdapterSPI(database, pool_size=1, read_only=True)
+    _report_service = ReportService(sqlite3_adapter_spi, report_renderer_adapter_spis(), report_exporter_adapter_spi())
+
+
+def _run_job(job: ReportJob) -> ReportJobResult:
+    begin = perf_counter()
+    report = None
+    errors = {}
+    # The report is generated for the first flavor, the others are rendered from the cached report. Every flavor is
+    # exported on its own, so that one failing leaves the others in place.
+    for flavor in job.flavors:
+        try:
+            report = _report_service.export_report(job.start, job.end, job.interval_size, str(job.path(flavor)),
+                                                   flavor)
+        except Exception as exception:
+            logger.exception("Exporting %s - %s in flavor '%s' failed", job.start, job.end, flavor)
+            errors[flavor] = f"{type(exception).__name__}: {exception}"
+    if report is None:
+        return ReportJobResult(job, perf_counter() - begin, errors=errors)
+    return ReportJobResult(job, perf_counter() - begin, report.call_count, report.interval_count, errors)
+
+
+def _run_jobs(jobs: tuple[ReportJob, ...]) -> tuple[ReportJobResult, ...]:
+    begin = perf_counter()
+    # Adjacent windows are fetched in one query and grouped all at once, leaving every job to export cached reports
+    try:
+        _report_service.generate_reports([(job.start, job.end, job.interval_size) for job in jobs])
+    except Exception:
+        # Every job then generates its own report, failing on its own
+        logger.exception("Generating %d reports together failed", len(jobs))
+    # Generating is shared evenly between the jobs
+    seconds = (perf_counter() - begin) / len(jobs)
+    return tuple(replace(result, seconds=result.seconds + seconds) for result in map(_run_job, jobs))
+
+
+def _tasks(jobs: tuple[ReportJob, ...], workers: int) -> list[tuple[ReportJob, ...]]:
+    # Jobs are ordered by period, so every task covers consecutive periods
+    size = max(1, min(MAX_JOBS_PER_TASK, ceil(len(jobs) / workers)))
+    return [jobs[index:index + size] for index in range(0, len(jobs), size)]
+
+
+def njord_batch(database: Path, jobs: tuple[ReportJob, ...], workers: int) -> tuple[ReportJobResult, ...]:
+    """
+    Runs report jobs across a pool of worker processes.
+
+    :param workers: Processes to spread the jobs across, the jobs are run in this process if 1
+    :return: The results in the order of the jobs
+    """
+
+    # Fails before any worker is started if the database is missing or not up to date
+    SQLite3AdapterSPI(database, pool_size=1, read_only=True).close()
+
+    tasks = _tasks(jobs, workers)
+    if workers == 1:
+        _initialize_worker(database)
+        return tuple(chain.from_iterable(map(_run_jobs, tasks)))
+
+    # Spawned rather than forked, so that workers behave the same on every platform and inherit no logging threads.
+    # Their records are passed back to be logged here.
+    context = multiprocessing.get_context("spawn")
+    log_queue = context.Queue()
+    listener = QueueListener(log_queue, LoggerHandler())
+    listener.start()
+    try:
+        with ProcessPoolExecutor(workers, context, _initialize_worker, (database, log_queue)) as executor:
+            futures: list[Future[tuple[ReportJobResult, ...]]] = [executor.submit(_run_jobs, task) for task in tasks]
+            return tuple(chain.from_iterable(future.result() for future in futures))
+    finally:
+        listener.stop()
+
+
+def summary(results: tuple[ReportJobResult, ...], seconds: float, workers: int) -> str:
+    lines = [f"{'Start':<19} {'End':<19} {'Interval':>8} {'Calls':>9} {'Intervals':>9} {'Seconds':>9}"]
+    for result in results:
+        job = result.job
+        line = (f"{job.start.isoformat(sep=' '):<19} {job.end.isoformat(sep=' '):<19} "
+                f"{round(job.interval_size.total_seconds() / 60):>6} m ")
+        if len(result.errors) < len(job.flavors):
+            line += f"{result.call_count:>9} {result.interval_count:>9} {result.seconds:>9.3f}"
+        for flavor, error in result.errors.items():
+            line += f" {flavor} failed: {error}"
+        lines.append(line)
+
+    failed = sum(bool(result.errors) for result in results)
+    busy = sum(result.seconds for result in results)
+    calls = sum(result.call_count for result in results)
+    lines.append(f"{len(results) - failed} of {len(results)} jobs succeeded in {seconds:.3f} s on {workers} workers, "
+                 f"{busy:.3f} s spent in jobs ({busy / seconds if seconds else 0.0:.1f} jobs running on average), "
+                 f"{calls / seconds if seconds else 0.0:,.0f} calls/s")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    flavors = tuple(flavor for flavor, _, _ in REPORT_RENDERERS)
+    parser = argparse.ArgumentParser(prog="python -m app.configuration.njord_batch",
+                                     description="Generates reports for consecutive periods without the GUI, for "
+                                                 "example every month of a year, spread across processes.")
+    parser.add_argument("--database", type=Path, default=DATABASE, help="Database to read the calls from")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, required=True,
+                        help="Start of the first period, e.g. 2024-01-01")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, required=True,
+                        help="End of the last period, exclusive, e.g. 2025-01-01")
+    parser.add_argument("--period", choices=sorted(PERIODS), default="month", help="Length of every report")
+    parser.add_argument("--interval", type=int, nargs="+", default=[30],
+                        help="Interval sizes in minutes, a report is made for every one of them")
+    parser.add_argument("--flavor", choices=flavors, nargs="+", default=list(flavors),
+                        help="Flavors every report is exported in")
+    parser.add_argument("--output", type=Path, default=Path("."), help="Directory the reports are written to")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Processes to spread the reports across")
+    arguments = parser.parse_args(argv)
+
+    if arguments.start >= arguments.end:
+        parser.error("--from must be before --to")
+    if min(arguments.interval) <= 0 or arguments.workers <= 0:
+        parser.error("--interval and --workers must be positive")
+
+    stop_logging = configure_logging(log_file=LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                                     levels=LOG_LEVELS)
+    try:
+        arguments.output.mkdir(parents=True, exist_ok=True)
+        jobs = report_jobs(arguments.start, arguments.end, arguments.period,
+                           tuple(timedelta(minutes=interval) for interval in arguments.interval),
+                           tuple(arguments.flavor), arguments.output)
+        workers = min(arguments.workers, len(jobs))
+
+        begin = perf_counter()
+        try:
+            results = njord_batch(arguments.database, jobs, workers)
+        except sqlite3.DatabaseError as error:
+            print(f"Can't read '{arguments.database}': {error}", file=sys.stderr)
+            return 2
+        print(summary(results, perf_counter() - begin, workers))
+    finally:
+        stop_logging()
+
+    return 1 if any(result.errors for result in results) else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
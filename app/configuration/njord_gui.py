@@ -1,29 +1,62 @@
 from pathlib import Path
+from typing import Optional
 
 from app.adapters.api.qt_adapter_api import QTAdapterAPI
-from app.adapters.spi.file_report_exporter_adapter_spi import FileReportExporterAdapterSPI
+from app.adapters.spi.cached_calls_adapter_spi import CachedCallsAdapterSPI
+from app.adapters.spi.in_memory_metrics_adapter_spi import InMemoryMetricsAdapterSPI
 from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
-from app.adapters.spi.text_report_renderer_adapter_spi import TextReportRendererAdapterSPI
-from app.configuration.global_config import DATABASE
+from app.configuration.global_config import DATABASE, LOG_BACKUP_COUNT, LOG_FILE, LOG_LEVELS, LOG_MAX_BYTES, METRICS, \
+    METRICS_LOG_INTERVAL, TRACE_MEMORY
+from app.configuration.instrumentation import instrument
+from app.configuration.lazy import created, lazy
+from app.configuration.logging_config import configure_logging
+from app.configuration.report_adapters import report_exporter_adapter_spi, report_renderer_adapter_spis
+from app.configuration.startup_timings import StartupTimings
 from app.core.services.calls_service import CallsService
 from app.core.services.report_service import ReportService
 
 
-def njord_gui(database: Path) -> None:
-    sqlite3_adapter_spi = SQLite3AdapterSPI(database)
-    calls_service = CallsService(sqlite3_adapter_spi)
-
-    text_report_renderer_adapter_spis = (
-        TextReportRendererAdapterSPI("text.utf-8"),
+def njord_gui(database: Path, startup_timings: Optional[StartupTimings] = None) -> None:
+    """
+    :param startup_timings: Measures startup from when it was created, which is now if None
+    """
+
+    # Instrumentation is left out entirely unless metrics are turned on
+    metrics = None if METRICS is None else InMemoryMetricsAdapterSPI()
+    stop_logging = configure_logging(metrics, METRICS_LOG_INTERVAL, METRICS, LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+                                     LOG_LEVELS)
+    startup_timings = StartupTimings() if startup_timings is None else startup_timings
+    startup_timings.phase("imports")
+
+    # Opened, and migrated, on first use, which is after the window has been painted
+    sqlite3_adapter_spi = lazy(lambda: SQLite3AdapterSPI(database))
+    cached_calls_adapter_spi = instrument(
+        CachedCallsAdapterSPI(instrument(sqlite3_adapter_spi, "SQLite3AdapterSPI", metrics)),
+        "CachedCallsAdapterSPI",
+        metrics
     )
-
-    file_report_exporter_adapter_spi = FileReportExporterAdapterSPI()
-
-    report_service = ReportService(sqlite3_adapter_spi, text_report_renderer_adapter_spis,
-                                   file_report_exporter_adapter_spi)
-    qt_adapter_api = QTAdapterAPI(calls_service, report_service)
-
-    qt_adapter_api.run_gui()
+    calls_service = CallsService(cached_calls_adapter_spi)
+
+    report_service = instrument(
+        ReportService(cached_calls_adapter_spi, report_renderer_adapter_spis(metrics),
+                      report_exporter_adapter_spi(metrics), metrics_spi=metrics),
+        "ReportService",
+        metrics,
+        ("export_report",) if TRACE_MEMORY else ()
+    )
+    startup_timings.phase("composition")
+
+    qt_adapter_api = QTAdapterAPI(calls_service, report_service, startup_phase=startup_timings.phase)
+
+    try:
+        qt_adapter_api.run_gui()
+    finally:
+        opened_sqlite3_adapter_spi = created(sqlite3_adapter_spi)
+        if opened_sqlite3_adapter_spi is not None:
+            opened_sqlite3_adapter_spi.close()
+        stop_logging()
+        if metrics is not None:
+            metrics.dump(METRICS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+from app.adapters.api.file_import_adapter_api import FileImportAdapterAPI
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.configuration.global_config import DATABASE
+from app.core.services.calls_service import CallsService
+
+
+def njord_import(database: Path, paths: tuple[Path, ...]) -> None:
+    sqlite3_adapter_spi = SQLite3AdapterSPI(database)
+    calls_service = CallsService(sqlite3_adapter_spi)
+    file_import_adapter_api = FileImportAdapterAPI(calls_service)
+
+    try:
+        for path in paths:
+            file_import_adapter_api.import_file(path)
+    finally:
+        sqlite3_adapter_spi.close()
+
+
+if __name__ == "__main__":
+    njord_import(DATABASE, tuple(map(Path, sys.argv[1:])))
@@ -0,0 +1,64 @@
+from typing import Callable, Optional
+
+from app.adapters.spi.lazy_report_renderer_adapter_spi import LazyReportRendererAdapterSPI
+from app.configuration.instrumentation import instrument
+from app.configuration.lazy import lazy
+from app.core.model.report import ReportFlavor
+from app.core.ports.spi.metrics_port_spi import MetricsPortSPI
+from app.core.ports.spi.report_port_spi import ReportExporterPortSPI, ReportRendererPortSPI
+
+# The adapters are imported inside the factories, where the bundler still finds them, so that none of them is imported
+# before it is first used
+
+
+def _text_report_renderer(flavor: ReportFlavor) -> ReportRendererPortSPI:
+    from app.adapters.spi.text_report_renderer_adapter_spi import TextReportRendererAdapterSPI
+    return TextReportRendererAdapterSPI(flavor)
+
+
+def _csv_report_renderer(flavor: ReportFlavor) -> ReportRendererPortSPI:
+    from app.adapters.spi.csv_report_renderer_adapter_spi import CSVReportRendererAdapterSPI
+    return CSVReportRendererAdapterSPI(flavor)
+
+
+def _json_lines_report_renderer(flavor: ReportFlavor) -> ReportRendererPortSPI:
+    from app.adapters.spi.json_lines_report_renderer_adapter_spi import JSONLinesReportRendererAdapterSPI
+    return JSONLinesReportRendererAdapterSPI(flavor)
+
+
+def _npz_report_renderer(flavor: ReportFlavor) -> ReportRendererPortSPI:
+    from app.adapters.spi.npz_report_renderer_adapter_spi import NPZReportRendererAdapterSPI
+    return NPZReportRendererAdapterSPI(flavor)
+
+
+def _file_report_exporter() -> ReportExporterPortSPI:
+    from app.adapters.spi.file_report_exporter_adapter_spi import FileReportExporterAdapterSPI
+    return FileReportExporterAdapterSPI()
+
+
+# Flavor, the name its measurements are recorded under, and the factory of its renderer
+REPORT_RENDERERS: tuple[tuple[ReportFlavor, str, Callable[[ReportFlavor], ReportRendererPortSPI]], ...] = (
+    ("text.utf-8", "TextReportRendererAdapterSPI", _text_report_renderer),
+    ("csv.utf-8", "CSVReportRendererAdapterSPI", _csv_report_renderer),
+    ("jsonl.utf-8", "JSONLinesReportRendererAdapterSPI", _json_lines_report_renderer),
+    ("npz", "NPZReportRendererAdapterSPI", _npz_report_renderer),
+)
+
+
+def report_renderer_adapter_spis(metrics_spi: Optional[MetricsPortSPI] = None) -> tuple[ReportRendererPortSPI, ...]:
+    """
+    :return: A renderer of every flavor, each imported and created when it first renders a report
+    """
+
+    return tuple(
+        instrument(LazyReportRendererAdapterSPI(flavor, factory), f"{name}[{flavor}]", metrics_spi)
+        for flavor, name, factory in REPORT_RENDERERS
+    )
+
+
+def report_exporter_adapter_spi(metrics_spi: Optional[MetricsPortSPI] = None) -> ReportExporterPortSPI:
+    """
+    :return: The file exporter, imported and created when it first exports a report
+    """
+
+    return instrument(lazy(_file_report_exporter), "FileReportExporterAdapterSPI", metrics_spi)
@@ -0,0 +1,31 @@
+import logging
+from time import perf_counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimings:
+    """
+    Logs how long every phase of startup took, and how long since startup began, as each one ends.
+    """
+
+    def __init__(self, started: Optional[float] = None) -> None:
+        """
+        :param started: perf_counter reading startup is measured from, now if None
+        """
+
+        self.started = perf_counter() if started is None else started
+        self._phase_started = self.started
+
+    def phase(self, name: str) -> None:
+        """
+        Ends a phase, the next one beginning now.
+
+        :param name: Of the phase that ended
+        """
+
+        now = perf_counter()
+        logger.info("Startup phase '%s' took %.1f ms, %.1f ms since start", name, (now - self._phase_started) * 1000,
+                    (now - self.started) * 1000)
+        self._phase_started = now
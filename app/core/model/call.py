@@ -5,8 +5,11 @@ from datetime import datetime, timedelta
 from functools import total_ordering
 from typing import Optional
 
+# Separates the cases of a call where they are written out as text, in reports and in imported files
+CASE_SEPARATOR = ';'
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 @total_ordering
 class Call:
     id: Optional[int]
@@ -26,7 +29,9 @@ class Call:
         return self.start_time + self.duration
 
 
+def to_seconds(moment: datetime) -> int:
+    """
+    A moment in the whole-second resolution that the calls SPI stores times in and compares ranges in.
+    """
 
-
-
-
+    return round(moment.timestamp())
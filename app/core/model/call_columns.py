@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import batched
+from typing import Iterable, Iterator
+
+from app.core.model.call import Call
+from app.core.model.report import MICROSECOND, datetime_to_microseconds, microseconds_to_datetime
+
+
+@dataclass
+class CallColumns:
+    """
+    Calls stored column by column, encoded the same way as the calls of a report, so that a long range of calls takes a
+    few bytes per call rather than a Call object and its datetimes.
+    """
+
+    ids: array = field(default_factory=lambda: array('q'))
+    phone_numbers: list[str] = field(default_factory=list)
+    start_times: array = field(default_factory=lambda: array('q'))
+    durations: array = field(default_factory=lambda: array('q'))
+    cases: list[tuple[str, ...]] = field(default_factory=list)
+
+    @classmethod
+    def from_calls(cls, calls: Iterable[Call], batch_size: int = 1024) -> CallColumns:
+        """
+        :param calls: Consumed a batch at a time, so only one batch of Call objects is held at once
+        """
+
+        columns = cls()
+        for batch in batched(calls, batch_size):
+            columns.ids.extend(call.id for call in batch)
+            columns.phone_numbers.extend(call.phone_number for call in batch)
+            columns.start_times.extend(datetime_to_microseconds(call.start_time) for call in batch)
+            columns.durations.extend(call.duration // MICROSECOND for call in batch)
+            columns.cases.extend(call.cases for call in batch)
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Call]:
+        return map(self.call, range(len(self)))
+
+    def call(self, index: int) -> Call:
+        return Call(
+            self.ids[index],
+            self.phone_numbers[index],
+            microseconds_to_datetime(self.start_times[index]),
+            timedelta(microseconds=self.durations[index]),
+            self.cases[index]
+        )
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from app.core.model.call import Call
+
+
+class ChangedCalls(tuple[Call, ...]):
+    """
+    The calls a write changed, along with the data version it left behind, read in the same transaction as the change.
+    """
+
+    data_version: int
+
+    def __new__(cls, calls: Iterable[Call], data_version: int) -> ChangedCalls:
+        changed = super().__new__(cls, calls)
+        changed.data_version = data_version
+        return changed
+
+
+@dataclass(frozen=True)
+class CallCreated:
+    call: Call
+    data_version: int  # The data version after the change
+
+
+@dataclass(frozen=True)
+class CallUpdated:
+    call: Call
+    data_version: int  # The data version after the change
+
+
+@dataclass(frozen=True)
+class CallDeleted:
+    call: Call
+    data_version: int  # The data version after the change
+
+
+CallEvent = CallCreated | CallUpdated | CallDeleted
+CallEventListener = Callable[[CallEvent], None]
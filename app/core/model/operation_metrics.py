@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from datetime import timedelta
+
+# Upper bounds of the latency histogram buckets, doubling from a microsecond to about a minute. The last bucket holds
+# everything slower.
+LATENCY_BUCKET_BOUNDS: tuple[float, ...] = tuple(2 ** exponent / 1_000_000 for exponent in range(27))
+
+
+@dataclass(frozen=True)
+class OperationMetrics:
+    operation: str
+    calls: int
+    failures: int
+    total_seconds: float
+    min_seconds: float
+    max_seconds: float
+    latency_buckets: tuple[int, ...]  # One more than there are bounds
+    rows: int
+    nbytes: int
+    peak_memory: int  # Bytes, 0 unless memory is traced
+
+    @property
+    def mean_latency(self) -> timedelta:
+        return timedelta(seconds=self.total_seconds / self.calls if self.calls else 0.0)
+
+    def latency_quantile(self, quantile: float) -> timedelta:
+        """
+        An upper bound of a latency quantile, read from the histogram.
+
+        :param quantile: Between 0 and 1
+        """
+
+        rank = quantile * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKET_BOUNDS, self.latency_buckets):
+            seen += count
+            if seen >= rank and seen:
+                return timedelta(seconds=min(bound, self.max_seconds))
+        return timedelta(seconds=self.max_seconds)
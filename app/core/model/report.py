@@ -1,18 +1,161 @@
+from __future__ import annotations
+
+from array import array
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Iterable, Iterator, Sequence
 
 from app.core.model.call import Call
 
+# Times are stored as microseconds since a wall-clock epoch, which represents naive datetimes exactly
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def datetime_to_microseconds(moment: datetime) -> int:
+    return (moment - EPOCH) // MICROSECOND
+
+
+def microseconds_to_datetime(microseconds: int) -> datetime:
+    return EPOCH + timedelta(microseconds=microseconds)
+
 
 @dataclass(frozen=True)
 class Report:
+    """
+    Calls grouped by the intervals they intersect, stored column by column.
+
+    Every call is stored once. Interval i holds the calls at interval_call_indices[interval_offsets[i]:
+    interval_offsets[i + 1]].
+    """
+
     interval_size: timedelta
-    intervals: dict[datetime, tuple[Call, ...]]
+    call_ids: array
+    call_phone_numbers: tuple[str, ...]
+    call_start_times: array
+    call_durations: array
+    call_cases: tuple[tuple[str, ...], ...]
+    interval_start_times: array
+    interval_offsets: array
+    interval_call_indices: array
+
+    @classmethod
+    def from_interval_groups(cls, interval_size: timedelta,
+                             groups: Iterable[tuple[datetime, Sequence[Call]]]) -> Report:
+        """
+        Builds a report from interval groups, which are consumed one at a time.
+
+        :param interval_size: The size of the intervals
+        :param groups: Intervals in ascending order and the calls in each interval
+        :return: The report
+        """
+
+        # A call's intervals are consecutive, so only the previous group's calls can reappear. Holding on to that group
+        # also keeps the ids of its calls from being reused.
+        previous_group = ()
+        previous_indices = {}
+        call_ids = array('q')
+        call_phone_numbers = []
+        call_start_times = array('q')
+        call_durations = array('q')
+        call_cases = []
+        interval_start_times = array('q')
+        interval_offsets = array('q', (0,))
+        interval_call_indices = array('q')
+
+        for interval, group in groups:
+            indices = {}
+            for call in group:
+                index = previous_indices.get(id(call))
+                if index is None:
+                    index = len(call_ids)
+                    call_ids.append(call.id)
+                    call_phone_numbers.append(call.phone_number)
+                    call_start_times.append(datetime_to_microseconds(call.start_time))
+                    call_durations.append(call.duration // MICROSECOND)
+                    call_cases.append(call.cases)
+                indices[id(call)] = index
+                interval_call_indices.append(index)
+            previous_group, previous_indices = group, indices
+            interval_start_times.append(datetime_to_microseconds(interval))
+            interval_offsets.append(len(interval_call_indices))
+
+        return cls(interval_size, call_ids, tuple(call_phone_numbers), call_start_times, call_durations,
+                   tuple(call_cases), interval_start_times, interval_offsets, interval_call_indices)
+
+    @cached_property
+    def call_count(self) -> int:
+        return len(self.call_ids)
+
+    @cached_property
+    def interval_count(self) -> int:
+        return len(self.interval_start_times)
+
+    @cached_property
+    def total_active_time(self) -> timedelta:
+        return timedelta(microseconds=sum(self.call_durations))
+
+    @cached_property
+    def nbytes(self) -> int:
+        """
+        An estimate of the memory held by the report, counting the columns and the strings they reference.
+        """
+
+        arrays = (self.call_ids, self.call_start_times, self.call_durations, self.interval_start_times,
+                  self.interval_offsets, self.interval_call_indices)
+        return (sum(len(column) * column.itemsize for column in arrays)
+                + sum(map(len, self.call_phone_numbers))
+                + sum(len(case) for cases in self.call_cases for case in cases)
+                + 8 * (len(self.call_phone_numbers) + len(self.call_cases)))
+
+    def call(self, index: int) -> Call:
+        return Call(
+            self.call_ids[index],
+            self.call_phone_numbers[index],
+            microseconds_to_datetime(self.call_start_times[index]),
+            timedelta(microseconds=self.call_durations[index]),
+            self.call_cases[index]
+        )
+
+    def interval_start_time(self, index: int) -> datetime:
+        return microseconds_to_datetime(self.interval_start_times[index])
+
+    def interval_calls(self, index: int) -> tuple[Call, ...]:
+        return tuple(map(self.call, self.interval_call_indices[
+            self.interval_offsets[index]:self.interval_offsets[index + 1]
+        ]))
+
+    def iter_intervals(self) -> Iterator[tuple[datetime, tuple[Call, ...]]]:
+        for index in range(self.interval_count):
+            yield self.interval_start_time(index), self.interval_calls(index)
+
+    @property
+    def intervals(self) -> dict[datetime, tuple[Call, ...]]:
+        return dict(self.iter_intervals())
 
     @property
     def calls(self) -> tuple[Call, ...]:
-        return tuple({value for values in self.intervals.values() for value in values})
+        return tuple(map(self.call, range(self.call_count)))
 
 
 ReportFlavor = str
 ReportFlavors = set[ReportFlavor]
+ReportSpec = tuple[datetime, datetime, timedelta]  # Start, end and interval size
+
+# Report flavors are named "<format>.<encoding>" or "<format>"
+REPORT_FILE_TYPES: dict[str, tuple[str, str]] = {
+    "text": ("txt", "Text files"),
+    "csv": ("csv", "CSV files"),
+    "jsonl": ("jsonl", "JSON Lines files"),
+    "npz": ("npz", "NumPy archives"),
+}
+
+
+def report_file_type(flavor: ReportFlavor) -> tuple[str, str]:
+    """
+    :return: The extension and the description of the files a flavor is exported to
+    """
+
+    format_ = flavor.split('.', 1)[0]
+    return REPORT_FILE_TYPES.get(format_, (format_, f"{format_.upper()} files"))
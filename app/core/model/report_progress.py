@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+from typing import Callable, Optional
+
+
+class ReportCancelledError(Exception):
+    pass
+
+
+class ReportProgress:
+    """
+    Tracks the progress of a report being generated on another thread, and lets it be cancelled.
+
+    Cancellation is cooperative: the generating thread checks for it every time it reports progress, and stops by
+    raising ReportCancelledError.
+    """
+
+    def __init__(self, on_progress: Optional[Callable[[ReportProgress], None]] = None) -> None:
+        self.rows_fetched = 0
+        self.intervals_grouped = 0
+        self.bytes_written = 0
+
+        self._on_progress = on_progress
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise ReportCancelledError("Report generation was cancelled")
+
+    def _progressed(self) -> None:
+        self.check_cancelled()
+        if self._on_progress is not None:
+            self._on_progress(self)
+
+    def add_rows_fetched(self, count: int) -> None:
+        self.rows_fetched += count
+        self._progressed()
+
+    def add_intervals_grouped(self, count: int) -> None:
+        self.intervals_grouped += count
+        self._progressed()
+
+    def add_bytes_written(self, count: int) -> None:
+        self.bytes_written += count
+        self._progressed()
@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class CallSummary:
+    call_count: int
+    total_duration: timedelta
+    first_start_time: Optional[datetime]
+    last_start_time: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class CallerStatistics:
+    phone_number: str
+    call_count: int
+    total_duration: timedelta
+    first_start_time: datetime
+    last_start_time: datetime
+
+    @property
+    def average_duration(self) -> timedelta:
+        return self.total_duration / self.call_count
+
+
+@dataclass(frozen=True)
+class DailyCallSummary:
+    day: date
+    call_count: int
+    total_duration: timedelta
+    first_start_time: datetime
+    last_start_time: datetime
@@ -1,21 +1,67 @@
-from datetime import datetime
-from typing import Protocol
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, Optional, Protocol
 
 from app.core.model.call import Call
+from app.core.model.call_events import CallEventListener
+from app.core.model.summary import CallerStatistics, CallSummary, DailyCallSummary
 
 
 class CallsPortAPI(Protocol):
     def create_call(self, call: Call) -> Call:
         ...
 
+    def create_calls(self, calls: Iterable[Call]) -> tuple[Call, ...]:
+        ...
+
     def delete_call(self, id_: int) -> Call:
         ...
 
+    def delete_calls(self, ids: Iterable[int]) -> tuple[Call, ...]:
+        ...
+
+    def delete_calls_by_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        ...
+
     def update_call(self, call: Call) -> Call:
         ...
 
+    def update_calls(self, calls: Iterable[Call]) -> tuple[Call, ...]:
+        ...
+
     def get_call(self, id_: int) -> Call:
         ...
 
     def get_calls_by_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
         ...
+
+    def iter_calls_by_date_range(self, start: datetime, end: datetime, batch_size: int = 1024) -> Iterator[Call]:
+        ...
+
+    def get_calls_overlapping_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        ...
+
+    def iter_calls_overlapping_date_range(self, start: datetime, end: datetime,
+                                          batch_size: int = 1024) -> Iterator[Call]:
+        ...
+
+    def get_calls_by_case(self, case: str) -> tuple[Call, ...]:
+        ...
+
+    def search_calls(self, query: str, limit: int = 100) -> tuple[Call, ...]:
+        ...
+
+    def get_data_version(self) -> int:
+        ...
+
+    def get_call_summary(self, start: datetime, end: datetime) -> CallSummary:
+        ...
+
+    def get_daily_call_summaries(self, start: date, end: date) -> tuple[DailyCallSummary, ...]:
+        ...
+
+    def get_caller_statistics(self, start: datetime, end: datetime,
+                              limit: Optional[int] = None) -> tuple[CallerStatistics, ...]:
+        ...
+
+    def subscribe(self, listener: CallEventListener) -> Callable[[], None]:
+        ...
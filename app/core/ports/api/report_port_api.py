@@ -1,13 +1,23 @@
 from datetime import datetime, timedelta
-from typing import Protocol
+from typing import Optional, Protocol, Sequence
 
-from app.core.model.report import Report, ReportFlavor, ReportFlavors
+from app.core.model.cache_statistics import CacheStatistics
+from app.core.model.report import Report, ReportFlavor, ReportFlavors, ReportSpec
+from app.core.model.report_progress import ReportProgress
 
 
 class ReportPortAPI(Protocol):
 
-    def export_report(self, start: datetime, end: datetime, interval: timedelta, name: str, flavor: ReportFlavor) -> Report:
+    def export_report(self, start: datetime, end: datetime, interval: timedelta, name: str, flavor: ReportFlavor,
+                      progress: Optional[ReportProgress] = None) -> Report:
+        ...
+
+    def generate_reports(self, specs: Sequence[ReportSpec],
+                         progress: Optional[ReportProgress] = None) -> tuple[Report, ...]:
         ...
 
     def get_flavors(self) -> ReportFlavors:
-        ...
\ No newline at end of file
+        ...
+
+    def get_cache_statistics(self) -> CacheStatistics:
+        ...
@@ -0,0 +1,14 @@
+from typing import Protocol
+
+from app.core.model.operation_metrics import OperationMetrics
+
+
+class MetricsPortSPI(Protocol):
+    def record(self, operation: str, seconds: float, rows: int = 0, nbytes: int = 0, failed: bool = False) -> None:
+        ...
+
+    def record_peak_memory(self, operation: str, nbytes: int) -> None:
+        ...
+
+    def get_metrics(self) -> tuple[OperationMetrics, ...]:
+        ...
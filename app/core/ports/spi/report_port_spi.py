@@ -1,4 +1,4 @@
-from typing import Protocol
+from typing import Iterable, Iterator, Protocol
 
 from app.core.model.report import Report, ReportFlavor
 
@@ -8,11 +8,11 @@ class ReportRendererPortSPI(Protocol):
     def get_flavor(self) -> ReportFlavor:
         ...
 
-    def render_report(self, report: Report) -> bytes:
+    def render_report(self, report: Report) -> Iterator[bytes]:
         ...
 
 
 class ReportExporterPortSPI(Protocol):
 
-    def export_report(self, data: bytes, name: str, flavor: ReportFlavor) -> None:
+    def export_report(self, chunks: Iterable[bytes], name: str, flavor: ReportFlavor) -> None:
         ...
@@ -1,23 +1,70 @@
-from datetime import datetime
+import logging
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, Optional
 
 from app.core.model.call import Call
+from app.core.model.call_events import CallCreated, CallDeleted, CallEvent, CallEventListener, CallUpdated, ChangedCalls
+from app.core.model.summary import CallerStatistics, CallSummary, DailyCallSummary
 from app.core.ports.spi.calls_port_spi import CallsPortSPI
 
+logger = logging.getLogger(__name__)
+
 
 class CallsService:
     def __init__(self, calls_spi: CallsPortSPI) -> None:
         self.calls_spi = calls_spi
+        self._listeners: list[CallEventListener] = []
+
+    def subscribe(self, listener: CallEventListener) -> Callable[[], None]:
+        """
+        Calls the listener with an event for every call that is created, updated or deleted from now on. Listeners are
+        called on the thread that made the change, after it has been stored.
+
+        :param listener: Receives the events
+        :return: A function that unsubscribes the listener
+        """
+
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _changed(self, calls: ChangedCalls, event: type[CallEvent]) -> tuple[Call, ...]:
+        # The calls SPI bumps the data version in the same transaction as every change, invalidating anything derived
+        # from the calls before it, and hands back the version it left behind
+        for listener in tuple(self._listeners):
+            for call in calls:
+                try:
+                    listener(event(call, calls.data_version))
+                except Exception:
+                    logger.exception("Call event listener %s failed", listener)
+        return calls
 
     def create_call(self, call: Call) -> Call:
         assert call.id is None
-        return self.calls_spi.store_call(call)
+        return self._changed(self.calls_spi.store_calls((call,)), CallCreated)[0]
+
+    def create_calls(self, calls: Iterable[Call]) -> tuple[Call, ...]:
+        calls = tuple(calls)
+        assert all(call.id is None for call in calls)
+        return self._changed(self.calls_spi.store_calls(calls), CallCreated)
 
     def delete_call(self, id_: int) -> Call:
-        return self.calls_spi.delete_call(id_)
+        return self._changed(self.calls_spi.delete_calls((id_,)), CallDeleted)[0]
+
+    def delete_calls(self, ids: Iterable[int]) -> tuple[Call, ...]:
+        return self._changed(self.calls_spi.delete_calls(ids), CallDeleted)
+
+    def delete_calls_by_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        assert start <= end
+        return self._changed(self.calls_spi.delete_calls_by_date_range(start, end), CallDeleted)
 
     def update_call(self, call: Call) -> Call:
         assert call.id is not None
-        return self.calls_spi.update_call(call)
+        return self._changed(self.calls_spi.update_calls((call,)), CallUpdated)[0]
+
+    def update_calls(self, calls: Iterable[Call]) -> tuple[Call, ...]:
+        calls = tuple(calls)
+        assert all(call.id is not None for call in calls)
+        return self._changed(self.calls_spi.update_calls(calls), CallUpdated)
 
     def get_call(self, id_: int) -> Call:
         return self.calls_spi.get_call(id_)
@@ -25,3 +72,42 @@ class CallsService:
     def get_calls_by_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
         assert start <= end
         return self.calls_spi.get_calls_by_date_range(start, end)
+
+    def iter_calls_by_date_range(self, start: datetime, end: datetime, batch_size: int = 1024) -> Iterator[Call]:
+        assert start <= end
+        assert batch_size > 0
+        return self.calls_spi.iter_calls_by_date_range(start, end, batch_size)
+
+    def get_calls_overlapping_date_range(self, start: datetime, end: datetime) -> tuple[Call, ...]:
+        assert start <= end
+        return self.calls_spi.get_calls_overlapping_date_range(start, end)
+
+    def iter_calls_overlapping_date_range(self, start: datetime, end: datetime,
+                                          batch_size: int = 1024) -> Iterator[Call]:
+        assert start <= end
+        assert batch_size > 0
+        return self.calls_spi.iter_calls_overlapping_date_range(start, end, batch_size)
+
+    def get_calls_by_case(self, case: str) -> tuple[Call, ...]:
+        return self.calls_spi.get_calls_by_case(case)
+
+    def search_calls(self, query: str, limit: int = 100) -> tuple[Call, ...]:
+        assert limit > 0
+        return self.calls_spi.search_calls(query, limit)
+
+    def get_data_version(self) -> int:
+        return self.calls_spi.get_data_version()
+
+    def get_call_summary(self, start: datetime, end: datetime) -> CallSummary:
+        assert start <= end
+        return self.calls_spi.get_call_summary(start, end)
+
+    def get_daily_call_summaries(self, start: date, end: date) -> tuple[DailyCallSummary, ...]:
+        assert start <= end
+        return self.calls_spi.get_daily_call_summaries(start, end)
+
+    def get_caller_statistics(self, start: datetime, end: datetime,
+                              limit: Optional[int] = None) -> tuple[CallerStatistics, ...]:
+        assert start <= end
+        assert limit is None or limit >= 0
+        return self.calls_spi.get_caller_statistics(start, end, limit)
@@ -0,0 +1,83 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.core.model.cache_statistics import CacheStatistics
+from app.core.model.report import Report
+
+logger = logging.getLogger(__name__)
+
+ReportKey = tuple[datetime, datetime, timedelta]
+
+
+class ReportCache:
+    """
+    A least recently used cache of generated reports, bounded both by entry count and by size.
+
+    Every entry belongs to the data version it was generated from. Seeing a different data version drops every entry,
+    so a report is never served after the calls it was built from have changed.
+    """
+
+    def __init__(self, max_entries: int = 32, max_size: int = 1 << 26) -> None:
+        assert max_entries >= 0
+        assert max_size >= 0
+
+        self.max_entries = max_entries
+        self.max_size = max_size
+
+        self._reports: OrderedDict[ReportKey, Report] = OrderedDict()
+        self._data_version: Optional[int] = None
+        self._size = 0
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def _validate(self, data_version: int) -> None:
+        if data_version == self._data_version:
+            return
+        if self._reports:
+            logger.debug("Data version changed from %s to %s, dropping %d cached reports", self._data_version,
+                         data_version, len(self._reports))
+            self._invalidations += 1
+            self._reports.clear()
+            self._size = 0
+        self._data_version = data_version
+
+    def get(self, key: ReportKey, data_version: int) -> Optional[Report]:
+        with self._lock:
+            self._validate(data_version)
+            report = self._reports.get(key)
+            if report is None:
+                self._misses += 1
+                return None
+            self._reports.move_to_end(key)
+            self._hits += 1
+            return report
+
+    def put(self, key: ReportKey, data_version: int, report: Report) -> None:
+        with self._lock:
+            self._validate(data_version)
+            if report.nbytes > self.max_size or not self.max_entries:
+                return
+
+            previous = self._reports.pop(key, None)
+            if previous is not None:
+                self._size -= previous.nbytes
+            self._reports[key] = report
+            self._size += report.nbytes
+
+            while len(self._reports) > self.max_entries or self._size > self.max_size:
+                _, evicted = self._reports.popitem(last=False)
+                self._size -= evicted.nbytes
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reports.clear()
+            self._size = 0
+
+    def get_statistics(self) -> CacheStatistics:
+        with self._lock:
+            return CacheStatistics(self._hits, self._misses, self._evictions, self._invalidations,
+                                   len(self._reports), self._size)
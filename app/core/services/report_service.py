@@ -1,13 +1,36 @@
 import logging
-from collections import defaultdict, deque
+from collections import deque
+from contextlib import closing
+from functools import cache
 from datetime import datetime, timedelta
 from math import ceil
-from typing import Sequence
+from itertools import batched, chain, islice
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional, Sequence
 
-from app.core.model.call import Call
-from app.core.model.report import Report, ReportFlavors, ReportFlavor
+from app.core.model.cache_statistics import CacheStatistics
+from app.core.model.call import Call, to_seconds
+from app.core.model.call_columns import CallColumns
+from app.core.model.report import Report, ReportFlavors, ReportFlavor, ReportSpec
+from app.core.model.report_progress import ReportProgress
 from app.core.ports.spi.calls_port_spi import CallsPortSPI
+from app.core.ports.spi.metrics_port_spi import MetricsPortSPI
 from app.core.ports.spi.report_port_spi import ReportRendererPortSPI, ReportExporterPortSPI
+from app.core.services.report_cache import ReportCache
+
+logger = logging.getLogger(__name__)
+
+VectorizedReport = Callable[[CallColumns, timedelta], Optional[Report]]
+
+
+@cache
+def _vectorized_report() -> Optional[VectorizedReport]:
+    # Imported on first use, since importing numpy takes a large share of startup
+    try:
+        from app.core.services.vectorized_interval_groups import vectorized_report
+    except ImportError:
+        return None
+    return vectorized_report
 
 
 def _intersecting_intervals(call: Call, initial_half_hour: datetime, interval_size: timedelta) -> tuple[datetime, ...]:
@@ -21,17 +44,24 @@ def _intersecting_intervals(call: Call, initial_half_hour: datetime, interval_si
     )
 
 
-def _interval_groups(calls: Sequence[Call], interval_size: timedelta) -> dict[datetime, tuple[Call, ...]]:
+IntervalGroup = tuple[datetime, tuple[Call, ...]]
+
+
+def _iter_interval_groups(calls: Iterable[Call], interval_size: timedelta) -> Iterator[IntervalGroup]:
     """
     Groups calls by intersecting intervals. Assumes that calls are sorted in ascending order.
 
-    :param calls: A sequence of Call objects
-    :param interval: The intervals to group in
-    :return: A dictionary representing the calls in each interval
+    Groups are yielded in ascending order as soon as no later call can intersect them, so only the intervals around the
+    current call are held in memory.
+
+    :param calls: An iterable of Call objects
+    :param interval_size: The size of the intervals to group in
+    :return: An iterator of intervals and the calls in each interval
     """
 
     intervals = deque()
-    groups = defaultdict(list)
+    groups = {}
+    pending = deque()
 
     for call in calls:
         # Remove intervals that are too far to the left
@@ -41,11 +71,19 @@ def _interval_groups(calls: Sequence[Call], interval_size: timedelta) -> dict[da
         # Determine the initial interval
         initial_interval = intervals[0] if intervals else call.start_time
 
+        # Yield groups that no longer intersect with any upcoming call
+        while pending and pending[0] < initial_interval:
+            interval = pending.popleft()
+            yield interval, tuple(groups.pop(interval))
+
         # Compute new intersecting intervals
         new_intervals = _intersecting_intervals(call, initial_interval, interval_size)
 
         # Append data point to all intersecting intervals
         for interval in new_intervals:
+            if interval not in groups:
+                groups[interval] = []
+                pending.append(interval)
             groups[interval].append(call)
 
         # Initialize intervals deque if empty
@@ -60,37 +98,235 @@ def _interval_groups(calls: Sequence[Call], interval_size: timedelta) -> dict[da
         # Update intervals to include only those intersecting with new intervals
         intervals = deque(new_intervals[new_intervals.index(intervals[-1]):])
 
-    return {interval: tuple(group) for interval, group in groups.items()}
+    for interval in pending:
+        yield interval, tuple(groups[interval])
+
+
+def _interval_groups(calls: Iterable[Call], interval_size: timedelta) -> dict[datetime, tuple[Call, ...]]:
+    """
+    Groups calls by intersecting intervals. Assumes that calls are sorted in ascending order.
+
+    :param calls: An iterable of Call objects
+    :param interval_size: The size of the intervals to group in
+    :return: A dictionary representing the calls in each interval
+    """
+
+    return dict(_iter_interval_groups(calls, interval_size))
+
+
+def _partition_calls(calls: Iterable[Call], specs: Sequence[ReportSpec]) -> list[list[Call]]:
+    """
+    Sorts calls into the ranges of many reports in a single pass. Assumes that calls are sorted in ascending order.
+
+    A call goes to every range it overlaps, by the rules the calls SPI selects overlapping calls with, so that each
+    range gets exactly the calls it would have been generated from on its own, in the same order.
+
+    :param calls: Every call overlapping any of the ranges
+    :param specs: Start, end and interval size of every report
+    :return: The calls of every range, in the order of the specs
+    """
+
+    bounds = [(to_seconds(start), to_seconds(end)) for start, end, _ in specs]
+    partitions: list[list[Call]] = [[] for _ in specs]
+
+    # Ranges are opened once a call reaches them and closed once calls start after them, so every call is only compared
+    # with the ranges around it
+    unopened = deque(sorted(range(len(specs)), key=lambda index: bounds[index][0]))
+    opened: list[int] = []
+
+    for call in calls:
+        start = to_seconds(call.start_time)
+        end = start + round(call.duration.total_seconds())
+
+        while unopened and (bounds[unopened[0]][0] <= start or bounds[unopened[0]][0] < end):
+            opened.append(unopened.popleft())
+
+        closed = False
+        for index in opened:
+            range_start, range_end = bounds[index]
+            if start > range_end:
+                closed = True
+            elif start >= range_start or end > range_start:
+                partitions[index].append(call)
+        if closed:
+            opened = [index for index in opened if start <= bounds[index][1]]
+
+    return partitions
+
+
+def _track_rows(calls: Iterable[Call], progress: ReportProgress, batch_size: int) -> Iterator[Call]:
+    for batch in batched(calls, batch_size):
+        progress.add_rows_fetched(len(batch))
+        yield from batch
+
+
+def _track_intervals(groups: Iterable[IntervalGroup], progress: ReportProgress,
+                     batch_size: int = 256) -> Iterator[IntervalGroup]:
+    count = 0
+    for group in groups:
+        yield group
+        count += 1
+        if count == batch_size:
+            progress.add_intervals_grouped(count)
+            count = 0
+    progress.add_intervals_grouped(count)
+
+
+def _track_bytes(chunks: Iterable[bytes], progress: ReportProgress) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+        progress.add_bytes_written(len(chunk))
 
 
 class ReportService:
     def __init__(self, calls_port_spi: CallsPortSPI, _report_renderer_spis: tuple[ReportRendererPortSPI, ...],
-                 report_exporter_spi: ReportExporterPortSPI) -> None:
+                 report_exporter_spi: ReportExporterPortSPI, fetch_batch_size: int = 1024,
+                 vectorized_threshold: int = 4096, report_cache: Optional[ReportCache] = None,
+                 metrics_spi: Optional[MetricsPortSPI] = None) -> None:
+        assert fetch_batch_size > 0
+        assert vectorized_threshold > 0
+
         self._calls_port_spi = calls_port_spi
         self._report_renderer_spis = _report_renderer_spis
         self._report_exporter = report_exporter_spi
+        self._fetch_batch_size = fetch_batch_size
+        self._vectorized_threshold = vectorized_threshold
+        self._report_cache = ReportCache() if report_cache is None else report_cache
+        self._metrics_spi = metrics_spi
+
+    def _group(self, calls: Iterable[Call], interval_size: timedelta, progress: ReportProgress) -> Report:
+        groups = _track_intervals(_iter_interval_groups(calls, interval_size), progress)
+        return Report.from_interval_groups(interval_size, groups)
+
+    def _build_report(self, calls: Iterator[Call], interval_size: timedelta, progress: ReportProgress) -> Report:
+        # Only ranges with enough calls to outweigh the cost of converting them use the vectorized engine
+        head = tuple(islice(calls, self._vectorized_threshold))
+        if len(head) < self._vectorized_threshold:
+            return self._group(head, interval_size, progress)
+
+        vectorized_report = _vectorized_report()
+        if vectorized_report is None or head[0].start_time.tzinfo is not None:
+            return self._group(chain(head, calls), interval_size, progress)
 
-    def _generate_report(self, start: datetime, end: datetime, interval_size: timedelta) -> Report:
+        # The rest of the range is read straight into columns, never holding more than a batch of Call objects
+        columns = CallColumns.from_calls(chain(head, calls), self._fetch_batch_size)
+        report = vectorized_report(columns, interval_size)
+        if report is None:
+            return self._group(iter(columns), interval_size, progress)
+        progress.add_intervals_grouped(report.interval_count)
+        return report
+
+    def _generate_report(self, start: datetime, end: datetime, interval_size: timedelta,
+                         progress: ReportProgress) -> Report:
         assert start <= end
         assert interval_size > timedelta()
 
-        calls = self._calls_port_spi.get_calls_by_date_range(start, end)
-        groups = _interval_groups(calls, interval_size)
-        return Report(interval_size, groups)
+        # The version is read before the calls, so a change made while generating leaves the report stale, never the
+        # other way round
+        key = (start, end, interval_size)
+        data_version = self._calls_port_spi.get_data_version()
+        report = self._report_cache.get(key, data_version)
+        if report is not None:
+            logger.debug("Using cached report for %s - %s in intervals of %s", start, end, interval_size)
+            progress.add_intervals_grouped(report.interval_count)
+            return report
+
+        # Closed explicitly, so that a cancelled report releases its database connection right away
+        # Calls that started before the range but are still ongoing within it belong in the report as well
+        begin = perf_counter()
+        with closing(self._calls_port_spi.iter_calls_overlapping_date_range(start, end,
+                                                                            self._fetch_batch_size)) as calls:
+            report = self._build_report(_track_rows(calls, progress, self._fetch_batch_size), interval_size, progress)
+        if self._metrics_spi is not None:
+            # Includes fetching the calls, which the calls SPI records on its own when it is instrumented
+            self._metrics_spi.record("ReportService.build_report", perf_counter() - begin, report.call_count)
+        self._report_cache.put(key, data_version, report)
+        return report
+
+    def generate_reports(self, specs: Sequence[ReportSpec],
+                         progress: Optional[ReportProgress] = None) -> tuple[Report, ...]:
+        """
+        Generates many reports at once, for example weekly reports for a quarter, or one period in several interval
+        sizes. Reports that are not cached are generated together: the calls of overlapping or adjacent ranges are
+        fetched in one query and sorted into the range of every report in a single pass, so that fetching grows with
+        the calls rather than with the number of reports. Ranges further apart are fetched separately, leaving the calls
+        between them unread.
+
+        :param specs: Start, end and interval size of every report
+        :param progress: Receives progress updates while the reports are generated. Cancelling it stops generation
+                         with a ReportCancelledError.
+        :return: The reports in the order of the specs, which are also cached
+        """
+
+        for start, end, interval_size in specs:
+            assert start <= end
+            assert interval_size > timedelta()
+
+        progress = ReportProgress() if progress is None else progress
+        data_version = self._calls_port_spi.get_data_version()
+
+        reports: list[Optional[Report]] = [self._report_cache.get(spec, data_version) for spec in specs]
+        for report in reports:
+            if report is not None:
+                progress.add_intervals_grouped(report.interval_count)
+
+        # Uncached reports in runs of overlapping or adjacent ranges, each run being fetched in one query
+        runs: list[list[int]] = []
+        run_end = None
+        for index in sorted((index for index, report in enumerate(reports) if report is None),
+                            key=lambda index: specs[index][0]):
+            start, end, _ = specs[index]
+            if run_end is None or to_seconds(start) > to_seconds(run_end) + 1:
+                runs.append([])
+                run_end = end
+            runs[-1].append(index)
+            run_end = max(run_end, end)
+
+        for run in runs:
+            run_specs = [specs[index] for index in run]
+            begin = perf_counter()
+            start = min(spec[0] for spec in run_specs)
+            end = max(spec[1] for spec in run_specs)
+            with closing(self._calls_port_spi.iter_calls_overlapping_date_range(start, end,
+                                                                                self._fetch_batch_size)) as calls:
+                partitions = _partition_calls(_track_rows(calls, progress, self._fetch_batch_size), run_specs)
+
+            # Each report is grouped by whichever engine suits its size, as it would have been on its own
+            for index, spec, partition in zip(run, run_specs, partitions):
+                report = self._build_report(iter(partition), spec[2], progress)
+                self._report_cache.put(spec, data_version, report)
+                reports[index] = report
+            if self._metrics_spi is not None:
+                self._metrics_spi.record("ReportService.build_reports", perf_counter() - begin,
+                                         sum(map(len, partitions)))
+
+        return tuple(reports)
 
     def export_report(self, start: datetime, end: datetime, interval_size: timedelta, name: str,
-                      flavor: ReportFlavor) -> Report:
-        report = self._generate_report(start, end, interval_size)
+                      flavor: ReportFlavor, progress: Optional[ReportProgress] = None) -> Report:
+        """
+        Generates a report and exports it in the given flavor.
+
+        :param progress: Receives progress updates while the report is generated. Cancelling it stops generation and
+                         export with a ReportCancelledError, leaving no partial report behind.
+        """
+
+        progress = ReportProgress() if progress is None else progress
 
         try:
             report_renderer = next((report_renderer for report_renderer in self._report_renderer_spis if
                                     report_renderer.get_flavor() == flavor))
-            rendered_report = report_renderer.render_report(report)
-            self._report_exporter.export_report(rendered_report, name, flavor)
-            return report
         except StopIteration:
-            logging.exception("Invalid flavor")
+            logger.exception("Invalid flavor")
             raise ValueError("Invalid flavor")
 
+        report = self._generate_report(start, end, interval_size, progress)
+        rendered_report = _track_bytes(report_renderer.render_report(report), progress)
+        self._report_exporter.export_report(rendered_report, name, flavor)
+        return report
+
     def get_flavors(self) -> ReportFlavors:
         return {report_renderer.get_flavor() for report_renderer in self._report_renderer_spis}
+
+    def get_cache_statistics(self) -> CacheStatistics:
+        return self._report_cache.get_statistics()
@@ -0,0 +1,268 @@
+"""
+A NumPy implementation of the interval grouping in app.core.services.report_service.
+
+Times are handled as int64 seconds since a wall-clock epoch, which mirrors the naive datetime arithmetic of the
+reference implementation exactly, daylight saving transitions included.
+"""
+
+from array import array
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.model.call import Call
+from app.core.model.call_columns import CallColumns
+from app.core.model.report import Report
+
+SECOND = timedelta(seconds=1)
+SECONDS_PER_DAY = 86400
+MICROSECONDS_PER_SECOND = 1_000_000
+
+
+def _ceil_div(dividend: np.ndarray, divisor: int) -> np.ndarray:
+    return -(-dividend // divisor)
+
+
+def _chain_anchors(starts: np.ndarray, ends: np.ndarray, interval_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the chains of calls that share an interval grid, and the start time each grid is anchored to.
+
+    A new chain begins whenever a call starts after the last interval of the current chain has ended. That can only
+    happen where no earlier call is still ongoing, and is certain where the gap to the earlier calls is at least one
+    interval long, so only the shorter gaps in the union of all calls need to be visited one by one.
+    """
+
+    reach = np.maximum.accumulate(ends)
+    segment_starts = np.flatnonzero(np.concatenate(([True], starts[1:] > reach[:-1])))
+    segment_reach = np.maximum.reduceat(ends, segment_starts)
+    segment_start_times = starts[segment_starts]
+
+    breaks = np.concatenate(([True], segment_start_times[1:] - segment_reach[:-1] >= interval_size))
+    ambiguous = np.flatnonzero(~breaks).tolist()
+    segment_start_times_list = segment_start_times.tolist()
+    segment_reach_list = segment_reach.tolist()
+
+    anchor = chain_end = previous = None
+    for segment in ambiguous:
+        if previous != segment - 1:
+            anchor = segment_start_times_list[segment - 1]
+            chain_end = anchor + interval_size * -(-(segment_reach_list[segment - 1] - anchor) // interval_size)
+
+        start = segment_start_times_list[segment]
+        if start > chain_end:
+            breaks[segment] = True
+            anchor = chain_end = start
+        chain_end = max(chain_end, anchor + interval_size * -(-(segment_reach_list[segment] - anchor) // interval_size))
+        previous = segment
+
+    return segment_starts[breaks], segment_start_times[breaks]
+
+
+def _closed_form_bounds(starts: np.ndarray, ends: np.ndarray,
+                        interval_size: int) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    Computes the first and last interval of every call with vectorized operations only.
+
+    Only valid while every call ends less than a day after, but not before, the start of its first interval. Returns
+    None otherwise.
+    """
+
+    # Anchor every call to the interval grid of its chain
+    chain_starts, anchors = _chain_anchors(starts, ends, interval_size)
+    chain_lengths = np.diff(np.append(chain_starts, len(starts)))
+    chain_ids = np.repeat(np.arange(len(anchors)), chain_lengths)
+    anchor = np.repeat(anchors, chain_lengths)
+    relative_starts = starts - anchor
+    relative_ends = ends - anchor
+
+    # Index of the last interval of each call, and the highest one reached so far within its chain
+    last = _ceil_div(relative_ends, interval_size) - 1
+    offset = last.max() + 2
+    reached = np.maximum.accumulate(last + chain_ids * offset) - chain_ids * offset
+    is_first = np.zeros(len(starts), dtype=bool)
+    is_first[chain_starts] = True
+    previously_reached = np.concatenate(([0], reached[:-1]))
+
+    # A call that reaches past every earlier interval moves the front of the interval window to the previously reached
+    # interval. Otherwise the front only moves as intervals are left behind by later starting calls.
+    advances = is_first | (last > previously_reached)
+    front_after_advance = np.where(is_first, 0, previously_reached)
+    last_advance = np.maximum.accumulate(np.where(advances, np.arange(len(starts)), -1))
+    front = front_after_advance[np.concatenate(([0], last_advance[:-1]))]
+    first = np.where(is_first, 0, np.maximum(_ceil_div(relative_starts, interval_size) - 1, front))
+
+    remaining = relative_ends - first * interval_size
+    if (remaining <= 0).any() or (remaining >= SECONDS_PER_DAY).any():
+        return None
+
+    return anchor + first * interval_size, anchor + last * interval_size
+
+
+def _scanned_bounds(starts: np.ndarray, ends: np.ndarray,
+                    interval_size: int) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    Computes the first and last interval of every call by replaying the reference implementation on integers.
+
+    Returns None where the reference implementation fails.
+    """
+
+    firsts = np.empty_like(starts)
+    lasts = np.empty_like(starts)
+    front = back = None
+
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        # Remove intervals that are too far to the left
+        if front is not None and front + interval_size < start:
+            front += interval_size * -(-(start - interval_size - front) // interval_size)
+            if front > back:
+                front = back = None
+
+        initial = start if front is None else front
+        count = -(-((end - initial) % SECONDS_PER_DAY) // interval_size)
+        last = initial + (count - 1) * interval_size
+
+        if not count:
+            if front is not None:
+                return None
+        elif front is None:
+            front, back = initial, last
+        elif back < last:
+            front, back = back, last
+        else:
+            front = initial
+
+        firsts[i] = initial
+        lasts[i] = last
+
+    return firsts, lasts
+
+
+def interval_membership(starts: np.ndarray, durations: np.ndarray,
+                        interval_size: int) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Computes which calls intersect which intervals. Assumes that calls are sorted in ascending order.
+
+    Interval membership is computed in closed form when possible, and otherwise by a scan over integers that
+    reproduces every quirk of the reference implementation.
+
+    :param starts: The start time of every call in whole seconds since the wall-clock epoch
+    :param durations: The duration of every call in whole seconds, all positive
+    :param interval_size: The size of the intervals in whole seconds
+    :return: The ascending interval start times, the offsets of each interval's calls into the call indices (one more
+             than there are intervals), and the call indices, or None where the reference implementation fails
+    """
+
+    ends = starts + durations
+    bounds = _closed_form_bounds(starts, ends, interval_size) or _scanned_bounds(starts, ends, interval_size)
+    if bounds is None:
+        return None
+    firsts, lasts = bounds
+
+    # Expand every call into the intervals it intersects
+    counts = (lasts - firsts) // interval_size + 1
+    call_indices = np.repeat(np.arange(len(starts)), counts)
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    intervals = firsts[call_indices] + steps * interval_size
+
+    order = np.argsort(intervals, kind="stable")
+    intervals = intervals[order]
+    call_indices = call_indices[order]
+
+    boundaries = np.flatnonzero(np.diff(intervals)) + 1
+    offsets = np.concatenate(([0], boundaries, [len(intervals)]))
+    return intervals[offsets[:-1]], offsets, call_indices
+
+
+def _membership(columns: CallColumns, interval_size: timedelta) -> Optional[tuple[np.ndarray, ...]]:
+    if interval_size % SECOND or interval_size <= timedelta():
+        return None
+
+    starts = np.frombuffer(columns.start_times, np.int64)
+    durations = np.frombuffer(columns.durations, np.int64)
+    if (starts % MICROSECONDS_PER_SECOND).any() or (durations % MICROSECONDS_PER_SECOND).any():
+        return None
+    starts = starts // MICROSECONDS_PER_SECOND
+    durations = durations // MICROSECONDS_PER_SECOND
+    if (durations <= 0).any() or (starts[1:] < starts[:-1]).any():
+        return None
+
+    return interval_membership(starts, durations, interval_size // SECOND)
+
+
+def _int64_array(values: np.ndarray) -> array:
+    result = array('q')
+    result.frombytes(values.astype(np.int64).tobytes())
+    return result
+
+
+def vectorized_interval_groups(calls: Sequence[Call],
+                               interval_size: timedelta) -> Optional[dict[datetime, tuple[Call, ...]]]:
+    """
+    Groups calls by intersecting intervals. Assumes that calls are sorted in ascending order.
+
+    Produces exactly the same groups as app.core.services.report_service._interval_groups. Inputs with sub-second
+    times or interval sizes, non-positive durations or timezone-aware times, and inputs the reference implementation
+    fails on, are rejected by returning None, in which case the caller should fall back to the reference
+    implementation.
+
+    :param calls: A sequence of Call objects
+    :param interval_size: The size of the intervals to group in
+    :return: A dictionary representing the calls in each interval, or None if the input is unsupported
+    """
+
+    if not calls:
+        return {}
+    if calls[0].start_time.tzinfo is not None:
+        return None
+
+    membership = _membership(CallColumns.from_calls(calls), interval_size)
+    if membership is None:
+        return None
+    intervals, offsets, call_indices = membership
+
+    keys = intervals.astype("datetime64[s]").astype(object)
+    members = np.array(calls, dtype=object)[call_indices].tolist()
+    offsets = offsets.tolist()
+    return {key: tuple(members[low:high]) for key, low, high in zip(keys, offsets, offsets[1:])}
+
+
+def vectorized_report(columns: CallColumns, interval_size: timedelta) -> Optional[Report]:
+    """
+    Groups calls by intersecting intervals straight into a columnar report. Assumes that calls are sorted in ascending
+    order.
+
+    Produces the same report as Report.from_interval_groups on the groups of
+    app.core.services.report_service._interval_groups, and rejects the same inputs as vectorized_interval_groups.
+
+    :param columns: The calls to group, which are never turned into Call objects
+    :param interval_size: The size of the intervals to group in
+    :return: The report, or None if the input is unsupported
+    """
+
+    if not columns:
+        return Report.from_interval_groups(interval_size, ())
+
+    membership = _membership(columns, interval_size)
+    if membership is None:
+        return None
+    intervals, offsets, call_indices = membership
+
+    # Number the calls in order of first appearance, leaving out calls that don't intersect any interval
+    first_appearances = np.unique(call_indices, return_index=True)[1]
+    referenced = call_indices[np.sort(first_appearances)]
+    renumbered = np.empty(len(columns), dtype=np.int64)
+    renumbered[referenced] = np.arange(len(referenced))
+    referenced_list = referenced.tolist()
+
+    return Report(
+        interval_size,
+        _int64_array(np.frombuffer(columns.ids, np.int64)[referenced]),
+        tuple(columns.phone_numbers[index] for index in referenced_list),
+        _int64_array(np.frombuffer(columns.start_times, np.int64)[referenced]),
+        _int64_array(np.frombuffer(columns.durations, np.int64)[referenced]),
+        tuple(columns.cases[index] for index in referenced_list),
+        _int64_array(intervals * MICROSECONDS_PER_SECOND),
+        _int64_array(offsets),
+        _int64_array(renumbered[call_indices])
+    )
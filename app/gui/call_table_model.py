@@ -0,0 +1,245 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QPersistentModelIndex, Qt
+
+from .util import Call
+
+ModelIndex = QModelIndex | QPersistentModelIndex
+
+
+class _Reversed(Sequence):
+    # Rows sorted in descending order, seen in ascending order for bisect
+    def __init__(self, calls: list[Call]) -> None:
+        self._calls = calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __getitem__(self, index: int) -> Call:
+        return self._calls[len(self._calls) - 1 - index]
+
+
+class CallTableModel(QAbstractTableModel):
+    """
+    Calls shown in a table, pulled from an iterable in batches as the view scrolls towards them.
+
+    Display values are derived on demand, so only the rows that are visible ever get formatted. Sorting happens here
+    rather than in a QSortFilterProxyModel, which would call back into data() for every comparison. Calls arrive in
+    ascending order of start time, so sorting by anything else fetches every remaining call first.
+
+    Rows are always in sort order, so a call's row is found by binary search. Calls inserted or removed before they
+    were fetched are kept aside and applied to the pending calls as they are fetched.
+    """
+
+    HEADERS = ("id", "Phone Number", "Start Time", "Duration", "Cases", "")
+
+    ID_COLUMN = 0
+    START_TIME_COLUMN = 2
+    DELETE_COLUMN = 5
+
+    def __init__(self, batch_size: int = 256) -> None:
+        super().__init__()
+
+        assert batch_size > 0
+
+        self.batch_size = batch_size
+        self._calls: list[Call] = []
+        self._calls_by_id: dict[int, Call] = {}
+        self._pending: Optional[Iterator[Call]] = None
+        self._next_pending: Optional[Call] = None
+        self._pending_inserted: list[Call] = []
+        self._pending_inserted_by_id: dict[int, Call] = {}
+        self._pending_removed: set[int] = set()
+        self._sort_column = self.START_TIME_COLUMN
+        self._sort_order = Qt.SortOrder.AscendingOrder
+
+    def rowCount(self, parent: ModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._calls)
+
+    def columnCount(self, parent: ModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index: ModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or index.column() == self.DELETE_COLUMN:
+            return None
+
+        call = self._calls[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 3:
+                return f"{call[3]} minutes"
+            if column == 4:
+                return ", ".join(call[4])
+            return call[column]
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignHCenter
+        return None
+
+    def canFetchMore(self, parent: ModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._pending is not None
+
+    def _take_pending(self, limit: Optional[int] = None) -> list[Call]:
+        # Merges the pending calls with those inserted since, by start time, leaving out those removed since. Pending
+        # calls go first among calls starting at the same time.
+        start_time = itemgetter(self.START_TIME_COLUMN)
+        taken = []
+        inserted = 0
+        while self._pending is not None and (limit is None or len(taken) < limit):
+            if self._next_pending is None:
+                self._next_pending = next(self._pending, None)
+            if inserted < len(self._pending_inserted) and (
+                    self._next_pending is None
+                    or start_time(self._pending_inserted[inserted]) < start_time(self._next_pending)):
+                taken.append(self._pending_inserted[inserted])
+                inserted += 1
+            elif self._next_pending is not None:
+                call, self._next_pending = self._next_pending, None
+                if call[0] in self._pending_removed:
+                    self._pending_removed.discard(call[0])
+                else:
+                    taken.append(call)
+            else:
+                self._pending = None
+                self._pending_removed.clear()
+
+        for call in self._pending_inserted[:inserted]:
+            del self._pending_inserted_by_id[call[0]]
+        del self._pending_inserted[:inserted]
+        return taken
+
+    def _append(self, calls: list[Call]) -> None:
+        if not calls:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._calls), len(self._calls) + len(calls) - 1)
+        self._calls.extend(calls)
+        self._calls_by_id.update((call[0], call) for call in calls)
+        self.endInsertRows()
+
+    def fetchMore(self, parent: ModelIndex = QModelIndex()) -> None:
+        if parent.isValid() or self._pending is None:
+            return
+        self._append(self._take_pending(self.batch_size))
+
+    def fetch_all(self) -> None:
+        self._append(self._take_pending())
+
+    def _requires_all_calls(self) -> bool:
+        return (self._sort_column, self._sort_order) != (self.START_TIME_COLUMN, Qt.SortOrder.AscendingOrder)
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:
+        if column < 0 or column == self.DELETE_COLUMN:
+            return
+
+        self._sort_column = column
+        self._sort_order = order
+        if self._requires_all_calls():
+            self.fetch_all()
+
+        self.layoutAboutToBeChanged.emit()
+        persistent_indices = self.persistentIndexList()
+        persistent_calls = [id(self._calls[index.row()]) for index in persistent_indices]
+
+        self._calls.sort(key=itemgetter(column), reverse=order == Qt.SortOrder.DescendingOrder)
+
+        rows = {id(call): row for row, call in enumerate(self._calls)}
+        self.changePersistentIndexList(persistent_indices, [
+            self.index(rows[call], index.column()) for call, index in zip(persistent_calls, persistent_indices)
+        ])
+        self.layoutChanged.emit()
+
+    def set_calls(self, calls: Iterable[Call]) -> None:
+        self.beginResetModel()
+        self._calls = []
+        self._calls_by_id = {}
+        self._pending = iter(calls)
+        self._next_pending = None
+        self._pending_inserted = []
+        self._pending_inserted_by_id = {}
+        self._pending_removed = set()
+        self.endResetModel()
+
+        if self._requires_all_calls():
+            self.sort(self._sort_column, self._sort_order)
+
+    def call(self, row: int) -> Call:
+        return self._calls[row]
+
+    def _bounds(self, call: Call) -> tuple[int, int]:
+        # The rows whose sort key equals the call's
+        key = itemgetter(self._sort_column)
+        if self._sort_order == Qt.SortOrder.AscendingOrder:
+            return (bisect_left(self._calls, key(call), key=key),
+                    bisect_right(self._calls, key(call), key=key))
+        reversed_calls = _Reversed(self._calls)
+        return (len(self._calls) - bisect_right(reversed_calls, key(call), key=key),
+                len(self._calls) - bisect_left(reversed_calls, key(call), key=key))
+
+    def _row(self, id_: int) -> Optional[int]:
+        call = self._calls_by_id.get(id_)
+        if call is None:
+            return None
+        low, high = self._bounds(call)
+        return next(row for row in range(low, high) if self._calls[row] is call)
+
+    def _insertion_row(self, call: Call) -> int:
+        # After the rows that sort the same
+        low, high = self._bounds(call)
+        return high if self._sort_order == Qt.SortOrder.AscendingOrder else low
+
+    def insert_call(self, call: Call) -> None:
+        # While calls are still pending they arrive in ascending order of start time, so a call past the last loaded one
+        # is set aside to be merged into the pending calls, and fetched in its turn
+        start_time = itemgetter(self.START_TIME_COLUMN)
+        if self._pending is not None and (not self._calls or start_time(call) >= start_time(self._calls[-1])):
+            insort(self._pending_inserted, call, key=start_time)
+            self._pending_inserted_by_id[call[0]] = call
+            return
+
+        row = self._insertion_row(call)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._calls.insert(row, call)
+        self._calls_by_id[call[0]] = call
+        self.endInsertRows()
+
+    def _remove_pending(self, id_: int) -> None:
+        start_time = itemgetter(self.START_TIME_COLUMN)
+        inserted = self._pending_inserted_by_id.pop(id_, None)
+        if inserted is not None:
+            low = bisect_left(self._pending_inserted, start_time(inserted), key=start_time)
+            del self._pending_inserted[self._pending_inserted.index(inserted, low)]
+        self._pending_removed.add(id_)
+
+    def remove_call(self, id_: int) -> None:
+        row = self._row(id_)
+        if row is None:
+            if self._pending is not None:
+                self._remove_pending(id_)
+            return
+
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._calls[row]
+        del self._calls_by_id[id_]
+        self.endRemoveRows()
+
+    def update_call(self, call: Call) -> None:
+        row = self._row(call[0])
+        if row is not None:
+            # A call that would go after the last loaded one may belong among the pending calls instead
+            old = self._calls.pop(row)
+            in_place = self._insertion_row(call) == row and (self._pending is None or row < len(self._calls))
+            self._calls.insert(row, call if in_place else old)
+            if in_place:
+                self._calls_by_id[call[0]] = call
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+                return
+
+        self.remove_call(call[0])
+        self.insert_call(call)
@@ -2,16 +2,23 @@ import logging
 from pathlib import Path
 from typing import Optional, Iterable
 
-from PySide6.QtCore import QDateTime, QDate, QTime, Qt, Signal
+from PySide6.QtCore import QDateTime, QDate, QTime, Qt, Signal, QModelIndex
 from PySide6.QtGui import QGuiApplication
 from PySide6.QtWidgets import QLineEdit, QWidget, QFormLayout, QLabel, QHBoxLayout, QGroupBox, QFileDialog, \
-    QTableWidget, QHeaderView, QTableWidgetItem, QAbstractItemView, QPushButton
+    QTableView, QHeaderView, QAbstractItemView, QPushButton, QComboBox, QProgressBar, QVBoxLayout, QTableWidget, \
+    QTableWidgetItem
 
-from .custom_base_widgets import PositiveSpinbox, ExpandableLineEditList, BetterDateTimeEdit, ConfirmationMessageBox
-from .util import Call, NewCall
+from app.core.model.report import report_file_type
 
+from .call_table_model import CallTableModel
+from .custom_base_widgets import PositiveSpinbox, ExpandableLineEditList, BetterDateTimeEdit, ConfirmationMessageBox, \
+    PushButtonDelegate
+from .util import Call, CallerStatistics, NewCall
+
+logger = logging.getLogger(__name__)
 
 DATETIME_FILE_NAME_FORMAT = "yyyyMMddHHmmss"
+DATETIME_DISPLAY_FORMAT = "yyyy-MM-dd HH:mm"
 
 
 class CallForm(QWidget):
@@ -93,10 +100,10 @@ class DateTimeRangeEdit(QWidget):
         if start is not None or end is not None:
             if start is not None and end is not None:
                 if start > end:
-                    logging.error("Start can't be greater than end.")
+                    logger.error("Start can't be greater than end.")
                     raise ValueError("Start can't be greater than end.")
             else:
-                logging.error("Both start and end must be set if one of them is set.")
+                logger.error("Both start and end must be set if one of them is set.")
                 raise ValueError("Both start and end must be set if one of them is set.")
 
         self._layout = QHBoxLayout(self)
@@ -145,6 +152,7 @@ class DateTimeRangeEdit(QWidget):
 
 class GenerateReportBar(QWidget):
     generateReportPressed = Signal(tuple)
+    cancelReportPressed = Signal()
 
     def __init__(self, default_interval_value: int = 30):
         super().__init__()
@@ -164,70 +172,176 @@ class GenerateReportBar(QWidget):
         interval_layout.addWidget(QLabel("Interval:"))
         interval_layout.addWidget(self.interval_size)
 
+        self.flavor = QComboBox()
+
+        flavor_layout = QHBoxLayout()
+        flavor_layout.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        flavor_layout.addWidget(QLabel("Format:"))
+        flavor_layout.addWidget(self.flavor)
+
         self.create_report_button = QPushButton("Generate report")
         self.create_report_button.clicked.connect(self._create_report_button_clicked)
 
+        self.cancel_report_button = QPushButton("Cancel")
+        self.cancel_report_button.clicked.connect(self.cancelReportPressed)
+
+        # Generation runs in the background, so its progress can only be counted, not measured against a total
+        self.report_progress_bar = QProgressBar()
+        self.report_progress_bar.setRange(0, 0)
+        self.report_progress = QLabel()
+
+        report_progress_layout = QVBoxLayout()
+        report_progress_layout.addWidget(self.report_progress_bar)
+        report_progress_layout.addWidget(self.report_progress)
+
+        report_button_layout = QHBoxLayout()
+        report_button_layout.addWidget(self.create_report_button, 2)
+        report_button_layout.addWidget(self.cancel_report_button, 1)
+
         generate_report_container_layout.addLayout(interval_layout, 1)
-        generate_report_container_layout.addWidget(self.create_report_button, 2)
+        generate_report_container_layout.addLayout(flavor_layout, 1)
+        generate_report_container_layout.addLayout(report_button_layout, 2)
+        generate_report_container_layout.addLayout(report_progress_layout, 2)
+
+        self.set_report_running(False)
 
         self._layout.addWidget(self.date_range_edit, 2)
         self._layout.addWidget(generate_report_container, 3)
 
+    def set_flavors(self, flavors: Iterable[str]) -> None:
+        self.flavor.clear()
+        self.flavor.addItems(flavors)
+
+    def set_report_running(self, running: bool) -> None:
+        self.create_report_button.setEnabled(not running)
+        self.cancel_report_button.setEnabled(running)
+        self.report_progress_bar.setVisible(running)
+        if running:
+            self.set_report_progress((0, 0, 0))
+
+    def set_report_progress(self, progress: tuple[int, int, int]) -> None:
+        rows_fetched, intervals_grouped, bytes_written = progress
+        self.report_progress.setText(
+            f"{rows_fetched} calls, {intervals_grouped} intervals, {bytes_written / (1 << 20):.1f} MiB written"
+        )
+
+    def set_report_status(self, status: str) -> None:
+        self.report_progress.setText(status)
+
     def _create_report_button_clicked(self):
         start, end = self.date_range_edit.get_date_range()
         interval_size = self.interval_size.value()
+        flavor = self.flavor.currentText()
+        extension, description = report_file_type(flavor)
         file_name, _ = QFileDialog.getSaveFileName(
             self,
             "Create report",
-            f"{start.toString(DATETIME_FILE_NAME_FORMAT)}-{end.toString(DATETIME_FILE_NAME_FORMAT)}_({interval_size}_minutes).txt",
-            filter="Text files (*.txt)"
+            f"{start.toString(DATETIME_FILE_NAME_FORMAT)}-{end.toString(DATETIME_FILE_NAME_FORMAT)}_({interval_size}_minutes).{extension}",
+            filter=f"{description} (*.{extension})"
         )
-        self.generateReportPressed.emit((start, end, interval_size, Path(file_name)))
+        if not file_name:
+            return
+        self.generateReportPressed.emit((start, end, interval_size, Path(file_name), flavor))
 
 
-class CallTable(QTableWidget):
-    HEADERS = ("id", "Phone Number", "Start Time", "Duration", "Cases", "")
+class CallSummaryLabel(QLabel):
+    def __init__(self) -> None:
+        super().__init__()
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        self.set_summary(0, 0)
 
+    def set_summary(self, call_count: int, active_minutes: int) -> None:
+        hours, minutes = divmod(active_minutes, 60)
+        self.setText(f"Calls: {call_count}    Active work time: {hours} hours {minutes} minutes")
+
+
+def format_seconds(seconds: int) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+class TopCallersTable(QTableWidget):
+    HEADERS = ("Phone number", "Calls", "Total", "Average", "First call", "Last call")
+
+    def __init__(self) -> None:
+        super().__init__(0, len(self.HEADERS))
+        self.setHorizontalHeaderLabels(self.HEADERS)
+        self.setAlternatingRowColors(True)
+        self.setWordWrap(False)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 8)
+        self.verticalHeader().setVisible(False)
+
+    def set_callers(self, callers: Iterable[CallerStatistics]) -> None:
+        callers = tuple(callers)
+        self.setRowCount(len(callers))
+        for row, (phone_number, call_count, total_duration, average_duration, first_start_time,
+                  last_start_time) in enumerate(callers):
+            for column, text in enumerate((
+                phone_number,
+                str(call_count),
+                format_seconds(total_duration),
+                format_seconds(average_duration),
+                first_start_time.toString(DATETIME_DISPLAY_FORMAT),
+                last_start_time.toString(DATETIME_DISPLAY_FORMAT)
+            )):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.setItem(row, column, item)
+
+
+class CallTable(QTableView):
     callSelected = Signal(int)  # ID of call
     deleteCall = Signal(int)  # ID of call
 
     def __init__(self, initial_calls: Optional[Iterable[Call]] = None) -> None:
         super().__init__()
 
-        initial_calls = initial_calls or tuple()
+        self.call_model = CallTableModel()
+        self.setModel(self.call_model)
 
-        self.setColumnCount(len(self.HEADERS))
-        self.setRowCount(len(initial_calls))
+        self.delete_delegate = PushButtonDelegate("Delete", self)
+        self.delete_delegate.clicked.connect(self._delete_row_clicked)
+        self.setItemDelegateForColumn(CallTableModel.DELETE_COLUMN, self.delete_delegate)
 
         self.setSortingEnabled(True)
+        self.sortByColumn(CallTableModel.START_TIME_COLUMN, Qt.SortOrder.AscendingOrder)
         self.setAlternatingRowColors(True)
+        self.setWordWrap(False)
 
         self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.itemSelectionChanged.connect(self._row_selected)
+        self.selectionModel().selectionChanged.connect(self._row_selected)
 
-        self.setHorizontalHeaderLabels(self.HEADERS)
+        # Fixed sizes keep layout independent of the number of rows
         self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
-        self.horizontalHeader().setSectionResizeMode(self.columnCount() - 1, QHeaderView.ResizeMode.ResizeToContents)
+        self.horizontalHeader().setSectionResizeMode(CallTableModel.ID_COLUMN, QHeaderView.ResizeMode.Fixed)
+        self.horizontalHeader().setSectionResizeMode(CallTableModel.DELETE_COLUMN, QHeaderView.ResizeMode.Fixed)
+        self.horizontalHeader().resizeSection(CallTableModel.ID_COLUMN, 64)
+        self.horizontalHeader().resizeSection(CallTableModel.DELETE_COLUMN, 80)
         # self.hideColumn(0)
-        self.horizontalHeader().sectionClicked.connect(self.sort_table)
 
-        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 12)
         self.verticalHeader().setVisible(False)
 
-        self.set_calls(initial_calls)
+        self.set_calls(initial_calls or tuple())
 
     def _row_selected(self) -> None:
         try:
             row = self.selectionModel().selectedRows()[0].row()
-            id_ = int(self.item(row, 0).text())
-            self.callSelected.emit(id_)
+            self.callSelected.emit(self.call_model.call(row)[0])
         except IndexError:
             return
 
-    def _delete_row_clicked(self, _, call_id: int) -> None:
+    def _delete_row_clicked(self, index: QModelIndex) -> None:
+        call_id = self.call_model.call(index.row())[0]
         if not QGuiApplication.queryKeyboardModifiers() & Qt.KeyboardModifier.ShiftModifier:
             confirmation_message_box = ConfirmationMessageBox("Delete Call",
                                                               "Are you sure you want to delete the call?")
@@ -236,37 +350,16 @@ class CallTable(QTableWidget):
         self.deleteCall.emit(call_id)
 
     def add_call(self, call: Call) -> None:
-        row = self.rowCount()
-        self.insertRow(row)
-
-        id_ = call[0]
-        phone_number = call[1]
-        start_time = call[2]
-        duration = f"{call[3]} minutes"
-        cases = '\n'.join(call[4])
+        self.call_model.insert_call(call)
 
-        for column, data in enumerate((id_, phone_number, start_time, duration, cases)):
-            item = QTableWidgetItem()
-            item.setData(Qt.ItemDataRole.DisplayRole, data)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter)
-            self.setItem(row, column, item)
+    def update_call(self, call: Call) -> None:
+        self.call_model.update_call(call)
 
-        delete = QPushButton("Delete")
-        delete.clicked.connect(lambda state, call_id=id_: self._delete_row_clicked(state, call_id))
-        self.setCellWidget(row, self.columnCount() - 1, delete)
+    def remove_call(self, call_id: int) -> None:
+        self.call_model.remove_call(call_id)
 
     def clear_calls(self) -> None:
-        self.setRowCount(0)
+        self.call_model.set_calls(())
 
     def set_calls(self, calls: Iterable[Call]) -> None:
-        self.clear_calls()
-        for call in calls:
-            self.add_call(call)
-
-    def sort_table(self, column) -> None:
-        self.sortItems(
-            column,
-            Qt.SortOrder.AscendingOrder
-            if self.horizontalHeader().sortIndicatorOrder() == Qt.SortOrder.AscendingOrder else
-            Qt.SortOrder.DescendingOrder
-        )  # WTF
+        self.call_model.set_calls(calls)
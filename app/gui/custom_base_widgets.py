@@ -1,7 +1,10 @@
 from typing import Iterable, Optional
 
 
-from PySide6.QtWidgets import QSpinBox, QDateTimeEdit, QListWidget, QListWidgetItem, QLineEdit, QMessageBox
+from PySide6.QtCore import QAbstractItemModel, QEvent, QModelIndex, QPersistentModelIndex, Qt, Signal
+from PySide6.QtGui import QMouseEvent, QPainter
+from PySide6.QtWidgets import QSpinBox, QDateTimeEdit, QListWidget, QListWidgetItem, QLineEdit, QMessageBox, \
+    QStyledItemDelegate, QStyleOptionButton, QStyleOptionViewItem, QApplication, QStyle
 
 
 from .util import MAX_INT
@@ -81,3 +84,42 @@ class ConfirmationMessageBox(QMessageBox):
         self.setText(prompt)
         self.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         self.setDefaultButton(QMessageBox.StandardButton.No)
+
+
+class PushButtonDelegate(QStyledItemDelegate):
+    """
+    Draws a push button in every cell of a column, without creating a widget per cell.
+    """
+
+    clicked = Signal(QModelIndex)
+
+    def __init__(self, text: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.text = text
+        self._pressed: Optional[QPersistentModelIndex] = None
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = self.text
+        button.state = QStyle.StateFlag.State_Enabled | (
+            QStyle.StateFlag.State_Sunken if self._pressed == index else QStyle.StateFlag.State_Raised
+        )
+        style = option.widget.style() if option.widget is not None else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event: QEvent, model: QAbstractItemModel, option: QStyleOptionViewItem,
+                    index: QModelIndex) -> bool:
+        if not isinstance(event, QMouseEvent) or event.button() != Qt.MouseButton.LeftButton:
+            return False
+
+        if event.type() in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonDblClick):
+            self._pressed = QPersistentModelIndex(index)
+            return True
+        if event.type() == QEvent.Type.MouseButtonRelease:
+            pressed, self._pressed = self._pressed, None
+            if pressed == index and option.rect.contains(event.position().toPoint()):
+                self.clicked.emit(index)
+            return True
+        return False
@@ -1,6 +1,6 @@
-from PySide6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QVBoxLayout
+from PySide6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QGroupBox
 
-from .compund_widgets import CallForm, GenerateReportBar, CallTable
+from .compund_widgets import CallForm, GenerateReportBar, CallSummaryLabel, CallTable, TopCallersTable
 from app.configuration.global_config import get_version
 
 
@@ -18,12 +18,24 @@ class MainWindow(QMainWindow):
         self.call_form.setMaximumWidth(320)
         self.call_form.setMaximumHeight(512)
 
+        top_callers_container = QGroupBox("Top callers")
+        top_callers_container.setMaximumWidth(320)
+        top_callers_layout = QVBoxLayout(top_callers_container)
+        self.top_callers = TopCallersTable()
+        top_callers_layout.addWidget(self.top_callers)
+
+        side_panel_layout = QVBoxLayout()
+        side_panel_layout.addWidget(self.call_form)
+        side_panel_layout.addWidget(top_callers_container)
+
         call_display_layout = QVBoxLayout()
         self.top_bar = GenerateReportBar()
+        self.call_summary = CallSummaryLabel()
         self.call_table = CallTable()
 
         call_display_layout.addWidget(self.top_bar)
+        call_display_layout.addWidget(self.call_summary)
         call_display_layout.addWidget(self.call_table)
 
-        self.central_layout.addWidget(self.call_form)
+        self.central_layout.addLayout(side_panel_layout)
         self.central_layout.addLayout(call_display_layout)
@@ -6,3 +6,5 @@ MAX_INT = (1 << 31) - 1
 
 Call = tuple[int, str, QDateTime, int, tuple[str, ...]]
 NewCall = tuple[None, str, QDateTime, int, tuple[str, ...]]
+# Phone number, call count, total and average duration in seconds, first and last start time
+CallerStatistics = tuple[str, int, int, int, QDateTime, QDateTime]
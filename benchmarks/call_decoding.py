@@ -0,0 +1,78 @@
+"""
+Speed and memory of decoding call rows, before and after the fast decoding path.
+
+"Before" is the original decoding: a JSON cases column, datetime.fromtimestamp, timedelta(seconds=...) and a frozen
+dataclass without slots. "After" is CallDecoder building slotted calls. Rows are decoded from memory, so the numbers
+leave out SQLite itself.
+
+Usage: python -m benchmarks.call_decoding [rows] [callers]
+"""
+import json
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, Iterable, Optional
+
+from app.adapters.spi.sqlite3_call_decoder import CASE_SEPARATOR, CallDecoder
+
+EPOCH = datetime(2020, 1, 1)
+
+
+@dataclass(frozen=True)
+class UnslottedCall:
+    id: Optional[int]
+    phone_number: str
+    start_time: datetime
+    duration: timedelta
+    cases: tuple[str, ...]
+
+
+def reference_row_to_call(row: tuple) -> UnslottedCall:
+    _id, phone_number, start, duration, cases = row
+    return UnslottedCall(_id, phone_number, datetime.fromtimestamp(start), timedelta(seconds=duration),
+                         tuple(json.loads(cases)))
+
+
+def rows(count: int, callers: int, seed: int = 0) -> list[tuple]:
+    """Rows as SQLite returns them, with the phone numbers, durations and cases of a call centre repeating"""
+
+    rng = random.Random(seed)
+    epoch = round(EPOCH.timestamp())
+    phone_numbers = [f"07{rng.randrange(10 ** 8):08}" for _ in range(callers)]
+    cases = [[f"CASE-{rng.randrange(10 ** 4)}" for _ in range(rng.randrange(3))] for _ in range(callers)]
+    result = []
+    for i in range(count):
+        caller = rng.randrange(callers)
+        # SQLite returns a new string for every row
+        result.append((i + 1, "".join(phone_numbers[caller]), epoch + i * 120, rng.randrange(60, 3600, 60),
+                       cases[caller]))
+    return result
+
+
+def measure(name: str, rows_: Iterable[tuple], decode: Callable[[tuple], object]) -> None:
+    rows_ = list(rows_)
+    begin = perf_counter()
+    for row in rows_:
+        decode(row)
+    elapsed = perf_counter() - begin
+
+    tracemalloc.start()
+    calls = list(map(decode, rows_))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{name:<8} {len(rows_) / elapsed:>12,.0f} calls/s {size / len(calls):>8.1f} bytes/call")
+
+
+def main(count: int = 200_000, callers: int = 2_000) -> None:
+    rows_ = rows(count, callers)
+    measure("before", ((*row[:4], json.dumps(row[4])) for row in rows_), reference_row_to_call)
+    measure("after", ((*row[:4], CASE_SEPARATOR.join(row[4]) if row[4] else None) for row in rows_),
+            CallDecoder().decode)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,92 @@
+"""
+A deterministic generator of realistic call histories.
+
+The same count, seed and profile always produce the same calls, so benchmark runs on different machines or revisions
+measure the same work.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Optional
+
+from app.core.model.call import Call
+
+EPOCH = datetime(2020, 1, 1)
+
+
+@dataclass(frozen=True)
+class CallHistoryProfile:
+    callers: int = 5_000
+    # Callers are drawn with weights falling off by rank, so a few of them call far more often than the rest
+    caller_skew: float = 0.8
+    # Mean seconds between calls during and outside office hours
+    office_hours: tuple[int, int] = (8, 17)
+    office_gap: int = 240
+    off_hours_gap: int = 2400
+    # A burst is a run of calls that start within a minute of each other
+    burst_probability: float = 0.02
+    burst_length: tuple[int, int] = (5, 40)
+    duration: tuple[int, int] = (60, 1800)
+    # Long calls cross several interval boundaries
+    long_call_probability: float = 0.03
+    long_call_duration: tuple[int, int] = (3600, 6 * 3600)
+    # The share of calls with no case and with more than one case
+    no_case_probability: float = 0.2
+    multi_case_probability: float = 0.15
+    max_cases: int = 4
+    cases_per_caller: int = 3
+
+
+def generate_calls(count: int, seed: int = 0, start: datetime = EPOCH,
+                   profile: CallHistoryProfile = CallHistoryProfile(), first_id: Optional[int] = 1) -> list[Call]:
+    """
+    Generates a call history in ascending order of start time.
+
+    :param count: The number of calls
+    :param seed: Seeds the random number generator
+    :param start: The earliest possible start time
+    :param profile: Shapes the history
+    :param first_id: The id of the first call, the following calls are numbered consecutively. Calls have no id if None.
+    :return: The calls, with whole second start times and durations
+    """
+
+    rng = random.Random(seed)
+    phone_numbers = [f"07{number:08}" for number in rng.sample(range(10 ** 8), profile.callers)]
+    caller_cases = [tuple(f"{rng.choice('ABCDEFGH')}{rng.randrange(10 ** 5):05}"
+                          for _ in range(profile.cases_per_caller)) for _ in range(profile.callers)]
+    cumulative_weights = list(accumulate(1 / rank ** profile.caller_skew for rank in range(1, profile.callers + 1)))
+
+    calls = []
+    start_time = start
+    burst = 0
+    for index in range(count):
+        if burst:
+            burst -= 1
+            gap = rng.randrange(60)
+        else:
+            if rng.random() < profile.burst_probability:
+                burst = rng.randint(*profile.burst_length)
+            office = profile.office_hours[0] <= start_time.hour < profile.office_hours[1]
+            gap = round(rng.expovariate(1 / (profile.office_gap if office else profile.off_hours_gap)))
+        start_time += timedelta(seconds=gap)
+
+        if rng.random() < profile.long_call_probability:
+            duration = rng.randint(*profile.long_call_duration)
+        else:
+            duration = rng.randint(*profile.duration)
+
+        caller = rng.choices(range(profile.callers), cum_weights=cumulative_weights)[0]
+        draw = rng.random()
+        if draw < profile.no_case_probability:
+            cases = ()
+        elif draw < profile.no_case_probability + profile.multi_case_probability:
+            own = rng.sample(caller_cases[caller], min(2, profile.cases_per_caller))
+            extra = tuple(f"X{rng.randrange(10 ** 5):05}" for _ in range(rng.randint(0, profile.max_cases - 2)))
+            cases = (*own, *extra)
+        else:
+            cases = (rng.choice(caller_cases[caller]),)
+
+        calls.append(Call(None if first_id is None else first_id + index, phone_numbers[caller], start_time,
+                          timedelta(seconds=duration), cases))
+    return calls
@@ -0,0 +1,42 @@
+"""
+Speed of the reference and vectorized interval grouping engines, whose equivalence is tested in
+tests/test_vectorized_interval_groups.py.
+
+Usage: python -m benchmarks.interval_groups [calls ...]
+"""
+import sys
+from datetime import timedelta
+from time import perf_counter
+
+import numpy as np
+
+from app.core.model.report import EPOCH
+from app.core.services.report_service import _interval_groups
+from app.core.services.vectorized_interval_groups import SECOND, interval_membership, vectorized_interval_groups
+from benchmarks.generator import generate_calls
+
+INTERVAL_SIZES = (timedelta(minutes=15), timedelta(minutes=30), timedelta(minutes=60))
+
+
+def measure(name: str, function, *args) -> float:
+    begin = perf_counter()
+    function(*args)
+    elapsed = perf_counter() - begin
+    print(f"{name:<12} {elapsed:>9.3f} s")
+    return elapsed
+
+
+def main(*counts: int) -> None:
+    for count in counts or (10_000, 100_000, 1_000_000):
+        calls = generate_calls(count, seed=1)
+        print(f"{count} calls, {INTERVAL_SIZES[1]} intervals")
+        reference = measure("reference", _interval_groups, calls, INTERVAL_SIZES[1])
+        vectorized = measure("vectorized", vectorized_interval_groups, calls, INTERVAL_SIZES[1])
+        starts = np.fromiter(((call.start_time - EPOCH) // SECOND for call in calls), np.int64, count)
+        durations = np.fromiter((call.duration // SECOND for call in calls), np.int64, count)
+        arrays = measure("arrays only", interval_membership, starts, durations, INTERVAL_SIZES[1] // SECOND)
+        print(f"{'speedup':<12} {reference / vectorized:>9.1f} x ({reference / arrays:.1f} x on arrays)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,126 @@
+"""
+Per-operation latency of SQLite3AdapterSPI on a large database, before and after connection pooling.
+
+"Before" opens a new connection with SQLite's default pragmas for every operation, as the adapter did originally, on
+the database in rollback journal mode. "After" is the pooled adapter, in WAL mode.
+
+Usage: python -m benchmarks.sqlite3_adapter_spi [calls] [operations]
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+from contextlib import closing, contextmanager
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterator
+
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.core.model.call import Call
+from benchmarks.generator import EPOCH, generate_calls
+
+
+def populate(adapter: SQLite3AdapterSPI, calls: int, seed: int = 0) -> list[Call]:
+    history = generate_calls(calls, seed, EPOCH)
+    begin = perf_counter()
+    adapter.store_calls(history)
+    elapsed = perf_counter() - begin
+    print(f"Stored {calls:,} calls in {elapsed:.1f} s, {calls / elapsed:,.0f} calls/s")
+    return history
+
+
+class ConnectPerCallPool:
+    """
+    Stands in for SQLite3ConnectionPool with a new connection, opened with default pragmas, for every checkout.
+    """
+
+    def __init__(self, database: Path) -> None:
+        self.database = database
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.database)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    dedicated_connection = connection
+
+    def close(self) -> None:
+        pass
+
+
+class ConnectPerCallAdapterSPI(SQLite3AdapterSPI):
+    def __init__(self, database: Path) -> None:
+        super().__init__(database)
+        self._pool.close()
+        self._pool = ConnectPerCallPool(database)
+
+
+def set_journal_mode(database: Path, journal_mode: str) -> None:
+    with closing(sqlite3.connect(database)) as connection:
+        connection.execute(f"PRAGMA journal_mode={journal_mode};")
+
+
+def measure(adapter: SQLite3AdapterSPI, history: list[Call], operations: int, rng: random.Random) -> dict[str, float]:
+    """
+    :return: Seconds per operation by name
+    """
+
+    calls = len(history)
+    ids = [rng.randrange(1, calls + 1) for _ in range(operations)]
+    new_call = Call(None, "0700000000", EPOCH, timedelta(minutes=5), ("A00000",))
+    stored = []
+    days = [EPOCH + timedelta(days=rng.randrange((history[-1].start_time - EPOCH).days + 1)) for _ in range(operations)]
+    cases = [rng.choice(history[rng.randrange(calls)].cases or ("A00000",)) for _ in range(operations)]
+
+    # Name, number of operations and the operation
+    operations_: tuple[tuple[str, int, Callable[[int], object]], ...] = (
+        ("store_call", operations, lambda i: stored.append(adapter.store_call(new_call))),
+        ("get_call", operations, lambda i: adapter.get_call(ids[i])),
+        ("update_call", operations, lambda i: adapter.update_call(stored[i])),
+        ("delete_call", operations, lambda i: adapter.delete_call(stored[i].id)),
+        ("get_calls_by_date_range", max(operations // 100, 1),
+         lambda i: adapter.get_calls_by_date_range(days[i], days[i] + timedelta(days=1))),
+        ("get_calls_overlapping_date_range", max(operations // 100, 1),
+         lambda i: adapter.get_calls_overlapping_date_range(days[i], days[i] + timedelta(days=1))),
+        ("get_calls_by_case", operations, lambda i: adapter.get_calls_by_case(cases[i])),
+        ("search_calls", operations, lambda i: adapter.search_calls(cases[i][:4])),
+    )
+
+    results = {}
+    for name, count, operation in operations_:
+        begin = perf_counter()
+        for i in range(count):
+            operation(i)
+        results[name] = (perf_counter() - begin) / count
+    return results
+
+
+def main(calls: int = 1_000_000, operations: int = 1_000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        database = Path(directory) / "benchmark.db"
+        adapter = SQLite3AdapterSPI(database)
+        history = populate(adapter, calls)
+        adapter.close()
+
+        set_journal_mode(database, "DELETE")
+        adapter = ConnectPerCallAdapterSPI(database)
+        before = measure(adapter, history, operations, random.Random(1))
+        adapter.close()
+
+        set_journal_mode(database, "WAL")
+        adapter = SQLite3AdapterSPI(database)
+        after = measure(adapter, history, operations, random.Random(1))
+        adapter.close()
+
+    print(f"{'operation':<34} {'before':>12} {'after':>12} {'speed-up':>9}")
+    for name in before:
+        print(f"{name:<34} {before[name] * 1e6:>9.1f} us {after[name] * 1e6:>9.1f} us "
+              f"{before[name] / after[name]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,93 @@
+"""
+Time to first paint and to the first filled call table of the GUI, measured from outside the process.
+
+Every run starts the application in a fresh process against a database of generated calls that fall within the range
+the window shows by default. The phases are read from the startup timings it logs. Defaults to running the application
+from source, pass the bundled executable with --command to measure that instead.
+
+Usage: python -m benchmarks.startup [--calls N] [--repeat N] [--command COMMAND ...]
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.configuration.global_config import DATABASE
+from benchmarks.generator import generate_calls
+
+PHASE = re.compile(r"Startup phase '(?P<phase>[^']+)' took (?P<took>[\d.]+) ms")
+LAST_PHASE = "first table fill"
+SOURCES = Path(__file__).resolve().parent.parent
+
+
+def run_once(command: list[str], directory: Path, timeout: float) -> dict[str, float]:
+    """
+    :return: Milliseconds every phase took, with the time from starting the process to the end of the phase as
+             "process to <phase>"
+    """
+
+    # Started in a directory of its own, so the sources are put on the path
+    environment = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+                       NJORD_LOG_LEVELS="app.configuration.startup_timings=INFO",
+                       PYTHONPATH=os.pathsep.join(filter(None, (str(SOURCES), os.environ.get("PYTHONPATH")))))
+    began = perf_counter()
+    process = subprocess.Popen(command, cwd=directory, env=environment, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    phases = {}
+    try:
+        for line in process.stdout:
+            match = PHASE.search(line)
+            if match is None:
+                continue
+            phases[match["phase"]] = float(match["took"])
+            phases[f"process to {match['phase']}"] = (perf_counter() - began) * 1000
+            if match["phase"] == LAST_PHASE or perf_counter() - began > timeout:
+                break
+    finally:
+        process.kill()
+        process.wait()
+    return phases
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=10_000, help="Number of calls in the generated database")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times the application is started")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds a single start may take")
+    parser.add_argument("--command", nargs="+", default=[sys.executable, "-m", "app"],
+                        help="Starts the application, the bundled executable for example")
+    arguments = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        template = Path(directory, "template.db")
+        adapter = SQLite3AdapterSPI(template)
+        adapter.store_calls(generate_calls(arguments.calls, start=datetime.now() - timedelta(days=30)))
+        adapter.close()
+
+        runs = []
+        for run in range(arguments.repeat):
+            run_directory = Path(directory, str(run))
+            run_directory.mkdir()
+            shutil.copyfile(template, run_directory / DATABASE.name)
+            runs.append(run_once(arguments.command, run_directory, arguments.timeout))
+
+    if not runs[0]:
+        print("No startup timings were logged")
+        return 1
+    for phase in runs[0]:
+        times = [phases[phase] for phases in runs if phase in phases]
+        print(f"{phase:<32} median {statistics.median(times):>9.1f} ms, min {min(times):>9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Times the paths reports depend on over a generated call history, and compares the results with a stored baseline.
+
+Results are written as JSON. A benchmark regresses when its throughput falls more than the tolerance below the
+baseline, in which case the exit status is 1.
+
+Usage: python -m benchmarks.suite [--calls N] [--repeat N] [--output FILE] [--baseline FILE] [--tolerance FRACTION]
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Optional
+
+from app.adapters.spi.file_report_exporter_adapter_spi import FileReportExporterAdapterSPI
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.adapters.spi.text_report_renderer_adapter_spi import TextReportRendererAdapterSPI
+from app.core.model.call import Call
+from app.core.model.report import Report, ReportSpec
+from app.core.services.report_service import ReportService, _interval_groups, _iter_interval_groups
+from benchmarks.generator import generate_calls
+
+FORMAT_VERSION = 1
+INTERVAL_SIZE = timedelta(minutes=30)
+FLAVOR = "text.utf-8"
+
+
+@dataclass
+class Fixture:
+    directory: Path
+    calls: list[Call]
+    database: Path
+    report: Report
+
+    @property
+    def start(self) -> datetime:
+        return self.calls[0].start_time
+
+    @property
+    def end(self) -> datetime:
+        return self.calls[-1].start_time
+
+
+def timed(function: Callable[[], object]) -> float:
+    begin = perf_counter()
+    function()
+    return perf_counter() - begin
+
+
+def store_calls(fixture: Fixture) -> float:
+    database = fixture.directory / "store_calls.db"
+    adapter = SQLite3AdapterSPI(database)
+    try:
+        return timed(lambda: adapter.store_calls(fixture.calls))
+    finally:
+        adapter.close()
+        database.unlink()
+
+
+def get_calls_by_date_range(fixture: Fixture) -> float:
+    adapter = SQLite3AdapterSPI(fixture.database)
+    try:
+        return timed(lambda: adapter.get_calls_by_date_range(fixture.start, fixture.end))
+    finally:
+        adapter.close()
+
+
+def get_calls_overlapping_date_range(fixture: Fixture) -> float:
+    adapter = SQLite3AdapterSPI(fixture.database)
+    try:
+        return timed(lambda: adapter.get_calls_overlapping_date_range(fixture.start, fixture.end))
+    finally:
+        adapter.close()
+
+
+def interval_groups(fixture: Fixture) -> float:
+    return timed(lambda: _interval_groups(fixture.calls, INTERVAL_SIZE))
+
+
+def report_calls(fixture: Fixture) -> float:
+    # A fresh copy, since the calls of a report are not cached
+    return timed(lambda: fixture.report.calls)
+
+
+def render_report(fixture: Fixture) -> float:
+    renderer = TextReportRendererAdapterSPI(FLAVOR)
+    return timed(lambda: sum(map(len, renderer.render_report(fixture.report))))
+
+
+def report_specs(fixture: Fixture) -> list[ReportSpec]:
+    # Consecutive quarters of the history, each in two interval sizes, as a batch of quarterly reports would ask for
+    specs = []
+    quarter_start = fixture.start
+    while quarter_start <= fixture.end:
+        quarter_end = quarter_start + timedelta(weeks=13) - timedelta(seconds=1)
+        specs.extend((quarter_start, quarter_end, timedelta(minutes=minutes)) for minutes in (30, 60))
+        quarter_start = quarter_end + timedelta(seconds=1)
+    return specs
+
+
+def generate_reports(fixture: Fixture) -> float:
+    adapter = SQLite3AdapterSPI(fixture.database)
+    report_service = ReportService(adapter, (), FileReportExporterAdapterSPI())
+    specs = report_specs(fixture)
+    try:
+        return timed(lambda: report_service.generate_reports(specs))
+    finally:
+        adapter.close()
+
+
+def export_report(fixture: Fixture) -> float:
+    adapter = SQLite3AdapterSPI(fixture.database)
+    # A new service for every run, so that no report is served from its cache
+    report_service = ReportService(adapter, (TextReportRendererAdapterSPI(FLAVOR),), FileReportExporterAdapterSPI())
+    try:
+        return timed(lambda: report_service.export_report(fixture.start, fixture.end, INTERVAL_SIZE,
+                                                          str(fixture.directory / "report.txt"), FLAVOR))
+    finally:
+        adapter.close()
+
+
+# Name, function and what its throughput is counted in
+BENCHMARKS: tuple[tuple[str, Callable[[Fixture], float], Callable[[Fixture], int]], ...] = (
+    ("SQLite3AdapterSPI.store_calls", store_calls, lambda fixture: len(fixture.calls)),
+    ("SQLite3AdapterSPI.get_calls_by_date_range", get_calls_by_date_range, lambda fixture: len(fixture.calls)),
+    ("SQLite3AdapterSPI.get_calls_overlapping_date_range", get_calls_overlapping_date_range,
+     lambda fixture: len(fixture.calls)),
+    ("report_service._interval_groups", interval_groups, lambda fixture: len(fixture.calls)),
+    ("Report.calls", report_calls, lambda fixture: fixture.report.call_count),
+    ("TextReportRendererAdapterSPI.render_report", render_report, lambda fixture: fixture.report.call_count),
+    ("ReportService.export_report", export_report, lambda fixture: len(fixture.calls)),
+    ("ReportService.generate_reports", generate_reports, lambda fixture: len(fixture.calls)),
+)
+
+
+def create_fixture(directory: Path, calls: int, seed: int) -> Fixture:
+    history = generate_calls(calls, seed)
+    database = directory / "calls.db"
+    adapter = SQLite3AdapterSPI(database)
+    adapter.store_calls(history)
+    adapter.close()
+    report = Report.from_interval_groups(INTERVAL_SIZE, _iter_interval_groups(history, INTERVAL_SIZE))
+    return Fixture(directory, history, database, report)
+
+
+def run(calls: int, repeat: int, seed: int = 0, selected: Optional[set[str]] = None) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        fixture = create_fixture(Path(directory), calls, seed)
+        for name, benchmark, items in BENCHMARKS:
+            if selected and name not in selected:
+                continue
+            times = [benchmark(fixture) for _ in range(repeat)]
+            results[name] = {
+                "items": items(fixture),
+                "min": min(times),
+                "median": statistics.median(times),
+                "items_per_second": items(fixture) / min(times),
+            }
+            print(f"{name:<52} {min(times):>9.3f} s {results[name]['items_per_second']:>12,.0f} calls/s")
+
+    return {
+        "format_version": FORMAT_VERSION,
+        "calls": calls,
+        "seed": seed,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares throughput with a baseline.
+
+    :return: The names of the benchmarks that regressed
+    """
+
+    if baseline.get("calls") != results["calls"]:
+        print(f"Baseline was run with {baseline.get('calls')} calls, throughput may not be comparable")
+
+    regressions = []
+    for name, result in results["results"].items():
+        expected = baseline.get("results", {}).get(name)
+        if expected is None:
+            continue
+        ratio = result["items_per_second"] / expected["items_per_second"]
+        regressed = ratio < 1 - tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<52} {ratio:>8.2f} x baseline{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000, help="Number of calls in the generated history")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of every benchmark, the fastest one counts")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated history")
+    parser.add_argument("--benchmark", action="append", help="Only run the named benchmark, may be repeated")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare the results with this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Fraction of baseline throughput that may be lost before a benchmark regresses")
+    arguments = parser.parse_args(argv)
+
+    results = run(arguments.calls, arguments.repeat, arguments.seed,
+                  set(arguments.benchmark) if arguments.benchmark else None)
+    if arguments.output is not None:
+        arguments.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if arguments.baseline is not None:
+        baseline = json.loads(arguments.baseline.read_text(encoding="utf-8"))
+        if compare(results, baseline, arguments.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import random
+import tempfile
+import unittest
+from dataclasses import replace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.adapters.spi.cached_calls_adapter_spi import CachedCallsAdapterSPI
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.core.model.call import Call
+
+START = datetime(2024, 1, 1)
+
+
+def key(call: Call) -> tuple:
+    # Calls compare equal by start time only
+    return call.id, call.phone_number, call.start_time, call.duration, call.cases
+
+
+def random_call(rng: random.Random) -> Call:
+    # Some calls last long enough to be carried into the following buckets
+    return Call(None, f"07{rng.randrange(100):08}", START + timedelta(seconds=rng.randrange(30 * 86400)),
+                timedelta(seconds=rng.choice((0, 59, 600, 86399, 86400, 86401, 3 * 86400 + 7))), ("a",))
+
+
+class CountingCallsAdapterSPI:
+    """
+    Counts the calls made to another calls SPI, by method name.
+    """
+
+    def __init__(self, calls_port_spi: SQLite3AdapterSPI) -> None:
+        self.calls_port_spi = calls_port_spi
+        self.counts: dict[str, int] = {}
+
+    def __getattr__(self, attribute: str):
+        method = getattr(self.calls_port_spi, attribute)
+
+        def counted(*args, **kwargs):
+            self.counts[attribute] = self.counts.get(attribute, 0) + 1
+            return method(*args, **kwargs)
+
+        return counted
+
+
+class CachedCallsAdapterSPITest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database = Path(directory.name) / "calls.db"
+
+        self.sqlite3_adapter_spi = SQLite3AdapterSPI(database)
+        self.addCleanup(self.sqlite3_adapter_spi.close)
+        # Writes to the same database without the cache knowing
+        self.other_sqlite3_adapter_spi = SQLite3AdapterSPI(database)
+        self.addCleanup(self.other_sqlite3_adapter_spi.close)
+
+        self.rng = random.Random(0)
+        self.sqlite3_adapter_spi.store_calls(random_call(self.rng) for _ in range(500))
+        self.counting = CountingCallsAdapterSPI(self.sqlite3_adapter_spi)
+
+    def cached(self, **kwargs) -> CachedCallsAdapterSPI:
+        return CachedCallsAdapterSPI(self.counting, timedelta(days=1), 8, **kwargs)
+
+    def stored_calls(self) -> tuple[Call, ...]:
+        return self.sqlite3_adapter_spi.get_calls_by_date_range(START, START + timedelta(days=30))
+
+    def assert_same_calls(self, cached: CachedCallsAdapterSPI, start: datetime, end: datetime) -> None:
+        self.assertEqual(sorted(map(key, cached.get_calls_by_date_range(start, end))),
+                         sorted(map(key, self.sqlite3_adapter_spi.get_calls_by_date_range(start, end))))
+        overlapping = cached.get_calls_overlapping_date_range(start, end)
+        self.assertEqual(sorted(map(key, overlapping)),
+                         sorted(map(key, self.sqlite3_adapter_spi.get_calls_overlapping_date_range(start, end))))
+        self.assertEqual(list(map(key, cached.iter_calls_overlapping_date_range(start, end))),
+                         list(map(key, overlapping)))
+
+    def test_serves_ranges_from_buckets(self) -> None:
+        cached = self.cached()
+        start, end = START + timedelta(days=3, hours=5), START + timedelta(days=6, hours=7)
+
+        self.assert_same_calls(cached, start, end)
+        queries = self.counting.counts["get_calls_overlapping_date_range"]
+        self.assert_same_calls(cached, start, end)
+        self.assert_same_calls(cached, start + timedelta(hours=1), end - timedelta(hours=1))
+
+        self.assertEqual(self.counting.counts["get_calls_overlapping_date_range"], queries)
+
+    def test_ranges_beyond_the_buckets_pass_through(self) -> None:
+        cached = self.cached()
+        self.assert_same_calls(cached, START, START + timedelta(days=20))
+        # Every query went to the calls SPI once, and no bucket was loaded
+        self.assertEqual(self.counting.counts, {"get_calls_by_date_range": 1, "get_calls_overlapping_date_range": 1,
+                                                "iter_calls_overlapping_date_range": 1})
+
+    def test_randomized_writes_through(self) -> None:
+        cached = self.cached()
+        for trial in range(300):
+            operation = self.rng.random()
+            if operation < .3:
+                cached.store_calls(random_call(self.rng) for _ in range(self.rng.randrange(1, 4)))
+            elif operation < .5:
+                call = self.rng.choice(self.stored_calls())
+                cached.update_call(replace(random_call(self.rng), id=call.id))
+            elif operation < .6:
+                call = self.rng.choice(self.stored_calls())
+                self.assertEqual(key(cached.delete_call(call.id)), key(call))
+            elif operation < .65:
+                start = START + timedelta(seconds=self.rng.randrange(30 * 86400))
+                cached.delete_calls_by_date_range(start, start + timedelta(hours=3))
+
+            start = START + timedelta(seconds=self.rng.randrange(30 * 86400))
+            with self.subTest(trial=trial):
+                self.assert_same_calls(cached, start, start + timedelta(seconds=self.rng.randrange(5 * 86400)))
+
+    def test_checks_data_version_once_per_interval(self) -> None:
+        cached = self.cached(validate_interval=timedelta(hours=1))
+        start, end = START + timedelta(days=3), START + timedelta(days=4)
+
+        for _ in range(100):
+            cached.get_calls_by_date_range(start, end)
+        self.assertEqual(self.counting.counts["get_data_version"], 1)
+
+        # Writes through the cache hand back the data version they left behind
+        cached.store_call(Call(None, "0701234567", start + timedelta(hours=1), timedelta(minutes=5), ()))
+        cached.get_calls_by_date_range(start, end)
+        self.assertEqual(self.counting.counts["get_data_version"], 1)
+        self.assert_same_calls(cached, start, end)
+
+    def test_changes_made_elsewhere(self) -> None:
+        cached = self.cached(validate_interval=timedelta(hours=1))
+        start, end = START + timedelta(days=3), START + timedelta(days=4)
+        calls = cached.get_calls_by_date_range(start, end)
+
+        self.other_sqlite3_adapter_spi.store_call(Call(None, "0701234567", start + timedelta(hours=1),
+                                                       timedelta(minutes=5), ()))
+        self.assertEqual(len(cached.get_calls_by_date_range(start, end)), len(calls))
+        cached.invalidate()
+        self.assert_same_calls(cached, start, end)
+
+        # A write through the cache sees that the data version moved on by more than its own changes
+        self.other_sqlite3_adapter_spi.store_call(Call(None, "0707654321", start + timedelta(hours=2),
+                                                       timedelta(minutes=5), ()))
+        cached.store_call(Call(None, "0707654321", start + timedelta(hours=3), timedelta(minutes=5), ()))
+        self.assert_same_calls(cached, start, end)
+
+    def test_validate_interval_of_zero_sees_every_change(self) -> None:
+        cached = self.cached(validate_interval=timedelta())
+        start, end = START + timedelta(days=3), START + timedelta(days=4)
+        cached.get_calls_by_date_range(start, end)
+
+        self.other_sqlite3_adapter_spi.delete_calls_by_date_range(start, start + timedelta(hours=12))
+        self.assert_same_calls(cached, start, end)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.configuration.njord_batch import MAX_JOBS_PER_TASK, PERIODS, _tasks, njord_batch, report_jobs
+from app.configuration.report_adapters import REPORT_RENDERERS
+from app.core.model.call import Call
+
+FLAVORS = tuple(flavor for flavor, _, _ in REPORT_RENDERERS)
+
+
+class PeriodsTest(unittest.TestCase):
+    def test_months_end_on_the_last_day_of_shorter_months(self) -> None:
+        months = PERIODS["month"]
+        self.assertEqual(months(datetime(2024, 1, 31, 12), 1), datetime(2024, 2, 29, 12))
+        self.assertEqual(months(datetime(2023, 1, 31), 1), datetime(2023, 2, 28))
+        self.assertEqual(months(datetime(2024, 1, 31), 2), datetime(2024, 3, 31))
+        self.assertEqual(months(datetime(2024, 11, 30), 3), datetime(2025, 2, 28))
+        self.assertEqual(months(datetime(2024, 3, 31), -1), datetime(2024, 2, 29))
+        self.assertEqual(PERIODS["year"](datetime(2024, 2, 29), 1), datetime(2025, 2, 28))
+
+    def test_jobs_cover_the_range_without_gaps(self) -> None:
+        start, end = datetime(2024, 1, 31), datetime(2024, 6, 15)
+        interval_sizes = (timedelta(minutes=30), timedelta(minutes=60))
+        jobs = report_jobs(start, end, "month", interval_sizes, FLAVORS, Path("."))
+
+        self.assertEqual([job.interval_size for job in jobs], list(interval_sizes) * 5)
+        periods = [(job.start, job.end) for job in jobs[::2]]
+        self.assertEqual([period_start for period_start, _ in periods], [
+            datetime(2024, 1, 31), datetime(2024, 2, 29), datetime(2024, 3, 31), datetime(2024, 4, 30),
+            datetime(2024, 5, 31)
+        ])
+        self.assertEqual(periods[-1][1], end - timedelta(seconds=1))
+        for (_, period_end), (next_start, _) in zip(periods, periods[1:]):
+            self.assertEqual(period_end + timedelta(seconds=1), next_start)
+
+    def test_tasks_keep_consecutive_jobs_together(self) -> None:
+        jobs = report_jobs(datetime(2020, 1, 1), datetime(2025, 1, 1), "month", (timedelta(minutes=30),), FLAVORS,
+                           Path("."))
+        for workers in (1, 2, 7, 100):
+            with self.subTest(workers=workers):
+                tasks = _tasks(jobs, workers)
+                self.assertEqual(tuple(job for task in tasks for job in task), jobs)
+                self.assertLessEqual(max(map(len, tasks)), MAX_JOBS_PER_TASK)
+                self.assertGreaterEqual(len(tasks), min(workers, len(jobs)))
+
+
+class NjordBatchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.database = self.directory / "calls.db"
+
+        sqlite3_adapter_spi = SQLite3AdapterSPI(self.database)
+        sqlite3_adapter_spi.store_calls((
+            Call(None, "0701234567", datetime(2024, 1, 15, 9, 10), timedelta(minutes=25), ("a",)),
+            Call(None, "0707654321", datetime(2024, 1, 15, 9, 40), timedelta(minutes=5), ()),
+        ))
+        sqlite3_adapter_spi.close()
+
+    def test_empty_period(self) -> None:
+        jobs = report_jobs(datetime(2024, 1, 1), datetime(2024, 3, 1), "month", (timedelta(minutes=30),), FLAVORS,
+                           self.directory)
+        january, february = njord_batch(self.database, jobs, 1)
+
+        self.assertEqual(january.errors, {})
+        self.assertEqual((january.call_count, january.interval_count), (2, 2))
+        self.assertEqual(february.errors, {})
+        self.assertEqual((february.call_count, february.interval_count), (0, 0))
+        for flavor in FLAVORS:
+            with self.subTest(flavor=flavor):
+                self.assertTrue(jobs[0].path(flavor).is_file())
+                self.assertTrue(jobs[1].path(flavor).is_file())
+        text = jobs[1].path(FLAVORS[0]).read_text(encoding="utf-8")
+        self.assertIn("Calls: 0", text)
+
+    def test_flavors_are_exported_independently(self) -> None:
+        jobs = report_jobs(datetime(2024, 1, 1), datetime(2024, 2, 1), "month", (timedelta(minutes=30),),
+                           ("text.utf-8", "unknown", "csv.utf-8"), self.directory)
+        with self.assertLogs(level="ERROR"):
+            result, = njord_batch(self.database, jobs, 1)
+
+        self.assertEqual(list(result.errors), ["unknown"])
+        self.assertEqual(result.call_count, 2)
+        self.assertTrue(jobs[0].path("text.utf-8").is_file())
+        self.assertTrue(jobs[0].path("csv.utf-8").is_file())
+
+
+if __name__ == "__main__":
+    unittest.main()
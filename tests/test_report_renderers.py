@@ -0,0 +1,143 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from app.adapters.spi.csv_report_renderer_adapter_spi import HEADER, CSVReportRendererAdapterSPI
+from app.adapters.spi.file_report_exporter_adapter_spi import FileReportExporterAdapterSPI
+from app.adapters.spi.json_lines_report_renderer_adapter_spi import JSONLinesReportRendererAdapterSPI
+from app.adapters.spi.npz_report_renderer_adapter_spi import ENCODING, NPZReportRendererAdapterSPI
+from app.adapters.spi.text_report_renderer_adapter_spi import TextReportRendererAdapterSPI
+from app.core.model.call import CASE_SEPARATOR, Call
+from app.core.model.report import Report
+from app.core.services.report_service import _iter_interval_groups
+
+INTERVAL_SIZE = timedelta(minutes=30)
+
+CALLS = (
+    Call(1, "0701234567", datetime(2024, 1, 15, 9, 10), timedelta(minutes=40), ("a", "b")),
+    Call(2, "0707654321", datetime(2024, 1, 15, 9, 40), timedelta(minutes=5), ()),
+    Call(3, "0701234567", datetime(2024, 1, 15, 11), timedelta(seconds=45), ("c",)),
+)
+
+
+def rows(report: Report) -> list[tuple[str, int, str, str, int, str]]:
+    # Every call of every interval, the way the CSV and JSON Lines renderers write them
+    return [
+        (interval.isoformat(), call.id, call.phone_number, call.start_time.isoformat(),
+         round(call.duration.total_seconds()), CASE_SEPARATOR.join(call.cases))
+        for interval, calls in report.iter_intervals() for call in calls
+    ]
+
+
+def strings(archive, name: str) -> list[str]:
+    offsets, data = archive[f"{name}_offsets"], archive[name].tobytes()
+    return [data[start:end].decode(ENCODING) for start, end in zip(offsets, offsets[1:])]
+
+
+class ReportRenderersTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.report = Report.from_interval_groups(INTERVAL_SIZE, _iter_interval_groups(CALLS, INTERVAL_SIZE))
+        self.empty_report = Report.from_interval_groups(INTERVAL_SIZE, ())
+
+    def test_text(self) -> None:
+        text = b"".join(TextReportRendererAdapterSPI("text.utf-8").render_report(self.report)).decode("UTF-8")
+        self.assertIn("Calls: 3", text)
+        self.assertIn(f"Initiated 30 minute intervals: {self.report.interval_count}", text)
+        self.assertEqual(text.count("Tel: "), len(rows(self.report)))
+
+        empty = b"".join(TextReportRendererAdapterSPI("text.utf-8").render_report(self.empty_report)).decode("UTF-8")
+        self.assertEqual(empty.splitlines()[:3], ["Period: -", "", "Calls: 0"])
+        self.assertNotIn("Tel:", empty)
+
+    def test_csv(self) -> None:
+        text = b"".join(CSVReportRendererAdapterSPI("csv.utf-8").render_report(self.report)).decode("UTF-8")
+        header, *body = csv.reader(io.StringIO(text))
+        self.assertEqual(tuple(header), HEADER)
+        self.assertEqual(body, [list(map(str, row)) for row in rows(self.report)])
+
+        empty = b"".join(CSVReportRendererAdapterSPI("csv.utf-8").render_report(self.empty_report)).decode("UTF-8")
+        self.assertEqual(list(csv.reader(io.StringIO(empty))), [list(HEADER)])
+
+    def test_json_lines(self) -> None:
+        text = b"".join(JSONLinesReportRendererAdapterSPI("jsonl.utf-8").render_report(self.report)).decode("UTF-8")
+        lines = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual([(line["interval_start"], line["call_id"], line["phone_number"], line["start_time"],
+                           line["duration_seconds"], CASE_SEPARATOR.join(line["cases"])) for line in lines],
+                         rows(self.report))
+
+        self.assertEqual(b"".join(JSONLinesReportRendererAdapterSPI("jsonl.utf-8").render_report(self.empty_report)),
+                         b"")
+
+    def test_npz(self) -> None:
+        for report in (self.report, self.empty_report):
+            with self.subTest(calls=report.call_count):
+                data = b"".join(NPZReportRendererAdapterSPI("npz").render_report(report))
+                with np.load(io.BytesIO(data)) as archive:
+                    self.assertEqual(archive["call_id"].tolist(), report.call_ids.tolist())
+                    self.assertEqual(archive["interval_offsets"].tolist(), report.interval_offsets.tolist())
+                    self.assertEqual(archive["interval_call_index"].tolist(), report.interval_call_indices.tolist())
+                    self.assertEqual(archive["interval_start"].astype(datetime).tolist(),
+                                     [interval for interval, _ in report.iter_intervals()])
+                    self.assertEqual(archive["call_duration"].astype(timedelta).tolist(),
+                                     [call.duration for call in report.calls])
+                    self.assertEqual(strings(archive, "call_phone_number"), list(report.call_phone_numbers))
+                    self.assertEqual(strings(archive, "call_cases"),
+                                     [CASE_SEPARATOR.join(cases) for cases in report.call_cases])
+
+    def test_chunks_do_not_change_the_output(self) -> None:
+        for renderer, small in (
+                (TextReportRendererAdapterSPI("text.utf-8"), TextReportRendererAdapterSPI("text.utf-8", chunk_size=1)),
+                (CSVReportRendererAdapterSPI("csv.utf-8"), CSVReportRendererAdapterSPI("csv.utf-8", chunk_size=1)),
+                (JSONLinesReportRendererAdapterSPI("jsonl.utf-8"),
+                 JSONLinesReportRendererAdapterSPI("jsonl.utf-8", chunk_size=1)),
+        ):
+            with self.subTest(flavor=renderer.get_flavor()):
+                chunks = list(small.render_report(self.report))
+                self.assertGreater(len(chunks), 1)
+                self.assertEqual(b"".join(chunks), b"".join(renderer.render_report(self.report)))
+
+
+class FileReportExporterAdapterSPITest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_export(self) -> None:
+        FileReportExporterAdapterSPI().export_report((b"first ", b"second"), str(self.directory / "report.txt"),
+                                                     "text.utf-8")
+        self.assertEqual((self.directory / "report.txt").read_bytes(), b"first second")
+        self.assertEqual([path.name for path in self.directory.iterdir()], ["report.txt"])
+
+    def test_compressed_export(self) -> None:
+        FileReportExporterAdapterSPI(compress=True).export_report((b"first ", b"second"),
+                                                                  str(self.directory / "report.txt"), "text.utf-8")
+        FileReportExporterAdapterSPI().export_report((b"third",), str(self.directory / "other.txt.gz"), "text.utf-8")
+
+        self.assertEqual(gzip.decompress((self.directory / "report.txt.gz").read_bytes()), b"first second")
+        self.assertEqual(gzip.decompress((self.directory / "other.txt.gz").read_bytes()), b"third")
+
+    def test_failed_export_leaves_nothing_behind(self) -> None:
+        (self.directory / "report.txt").write_bytes(b"previous")
+
+        def chunks() -> Iterator[bytes]:
+            yield b"partial"
+            raise RuntimeError("Rendering failed")
+
+        with self.assertRaises(RuntimeError):
+            FileReportExporterAdapterSPI().export_report(chunks(), str(self.directory / "report.txt"), "text.utf-8")
+
+        self.assertEqual([path.name for path in self.directory.iterdir()], ["report.txt"])
+        self.assertEqual((self.directory / "report.txt").read_bytes(), b"previous")
+
+
+if __name__ == "__main__":
+    unittest.main()
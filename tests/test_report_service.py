@@ -0,0 +1,99 @@
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.adapters.spi.file_report_exporter_adapter_spi import FileReportExporterAdapterSPI
+from app.adapters.spi.sqlite3_adapter_spi import SQLite3AdapterSPI
+from app.core.model.call import Call
+from app.core.model.report import Report
+from app.core.services.report_service import ReportService, _iter_interval_groups
+
+START = datetime(2024, 1, 1)
+
+
+class CountingCallsAdapterSPI:
+    """
+    Counts the ranges read from another calls SPI.
+    """
+
+    def __init__(self, calls_port_spi: SQLite3AdapterSPI) -> None:
+        self.calls_port_spi = calls_port_spi
+        self.ranges_read = 0
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.calls_port_spi, attribute)
+
+    def iter_calls_overlapping_date_range(self, start: datetime, end: datetime, batch_size: int = 1024):
+        self.ranges_read += 1
+        return self.calls_port_spi.iter_calls_overlapping_date_range(start, end, batch_size)
+
+
+class GenerateReportsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.sqlite3_adapter_spi = SQLite3AdapterSPI(Path(directory.name) / "calls.db")
+        self.addCleanup(self.sqlite3_adapter_spi.close)
+
+        # Calls shorter than a day, which the reference engine groups correctly
+        rng = random.Random(0)
+        self.sqlite3_adapter_spi.store_calls(
+            Call(None, f"07{rng.randrange(100):08}", START + timedelta(seconds=rng.randrange(60 * 86400)),
+                 timedelta(seconds=rng.choice((0, 60, 1800, 3600, rng.randrange(1, 86400)))), ())
+            for _ in range(3000)
+        )
+        self.calls_port_spi = CountingCallsAdapterSPI(self.sqlite3_adapter_spi)
+
+    def report_service(self) -> ReportService:
+        # A threshold low enough for larger reports to be grouped by the vectorized engine
+        return ReportService(self.calls_port_spi, (), FileReportExporterAdapterSPI(), vectorized_threshold=256)
+
+    def expected(self, start: datetime, end: datetime, interval_size: timedelta) -> Report:
+        calls = self.sqlite3_adapter_spi.get_calls_overlapping_date_range(start, end)
+        return Report.from_interval_groups(interval_size, _iter_interval_groups(calls, interval_size))
+
+    def test_reports_match_reports_generated_alone(self) -> None:
+        specs = [
+            # A week in two interval sizes, the week after it, and the same week again
+            (START + timedelta(days=7), START + timedelta(days=14, seconds=-1), timedelta(minutes=30)),
+            (START + timedelta(days=7), START + timedelta(days=14, seconds=-1), timedelta(minutes=60)),
+            (START + timedelta(days=14), START + timedelta(days=21, seconds=-1), timedelta(minutes=30)),
+            (START + timedelta(days=7), START + timedelta(days=14, seconds=-1), timedelta(minutes=30)),
+            # Overlapping ranges, and a range far from the others
+            (START + timedelta(days=10, hours=5), START + timedelta(days=12), timedelta(minutes=15)),
+            (START + timedelta(days=40), START + timedelta(days=40, hours=3), timedelta(minutes=30)),
+            # A range without calls
+            (START - timedelta(days=7), START - timedelta(days=1), timedelta(minutes=30)),
+        ]
+
+        reports = self.report_service().generate_reports(specs)
+
+        self.assertEqual(len(reports), len(specs))
+        for spec, report in zip(specs, reports):
+            with self.subTest(spec=spec):
+                self.assertEqual(report, self.expected(*spec))
+        # One read for the adjacent and overlapping ranges, one for the range far from them, and one for the empty one
+        self.assertEqual(self.calls_port_spi.ranges_read, 3)
+
+    def test_reports_are_cached_until_the_calls_change(self) -> None:
+        report_service = self.report_service()
+        specs = [(START + timedelta(days=day), START + timedelta(days=day + 1, seconds=-1), timedelta(minutes=30))
+                 for day in range(3)]
+
+        reports = report_service.generate_reports(specs)
+        self.assertEqual(report_service.generate_reports(specs), reports)
+        self.assertEqual(self.calls_port_spi.ranges_read, 1)
+        self.assertEqual(report_service.get_cache_statistics().hits, len(specs))
+
+        self.sqlite3_adapter_spi.store_call(Call(None, "0701234567", START + timedelta(hours=12),
+                                                 timedelta(minutes=5), ()))
+        first, *_ = report_service.generate_reports(specs)
+        self.assertEqual(self.calls_port_spi.ranges_read, 2)
+        self.assertEqual(first.call_count, reports[0].call_count + 1)
+        self.assertEqual(first, self.expected(*specs[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from dataclasses import replace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.adapters.spi.sqlite3_adapter_spi import INSERT_CALL, INSERT_CALL_CASE, SQLite3AdapterSPI, call_to_row, \
+    case_rows, with_end_time
+from app.adapters.spi.sqlite3_migrations import MIGRATIONS, get_schema_version, migrate, verify_schema_version
+from app.core.model.call import Call
+
+CALLS = (
+    Call(1, "0701234567", datetime(2024, 1, 15, 9, 10), timedelta(minutes=25), ("a", "b")),
+    Call(2, "0707654321", datetime(2024, 1, 15, 23, 50), timedelta(minutes=20), ()),
+    Call(3, "0701234567", datetime(2024, 1, 16, 8), timedelta(seconds=45), ("c",)),
+)
+
+LOGGER = "app.adapters.spi.sqlite3_migrations"
+
+# Everything the triggers derive from the calls
+DERIVED_TABLES = (
+    """SELECT * FROM "call_day_summary" ORDER BY "day";""",
+    """SELECT "id", "start_time", "end_time" FROM "call_time" ORDER BY "id";""",
+    """SELECT "rowid", "phone_number", "cases" FROM "call_search" ORDER BY "rowid";""",
+    """SELECT * FROM "call_case" ORDER BY "call_id", "position";""",
+    """SELECT "version" FROM "data_version";""",
+)
+
+
+def key(call: Call) -> tuple:
+    # Calls compare equal by start time only
+    return call.id, call.phone_number, call.start_time, call.duration, call.cases
+
+
+class SQLite3MigrationsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def connect(self, name: str = "calls.db") -> sqlite3.Connection:
+        connection = sqlite3.connect(self.directory / name)
+        self.addCleanup(connection.close)
+        return connection
+
+    def open(self, name: str = "calls.db") -> SQLite3AdapterSPI:
+        sqlite3_adapter_spi = SQLite3AdapterSPI(self.directory / name)
+        self.addCleanup(sqlite3_adapter_spi.close)
+        return sqlite3_adapter_spi
+
+    def test_migrates_unversioned_database(self) -> None:
+        # The schema from before migrations, with the cases of a call stored as a JSON array
+        with closing(sqlite3.connect(self.directory / "calls.db")) as connection, connection:
+            connection.execute("""
+                CREATE TABLE "call" ("id" INTEGER NOT NULL PRIMARY KEY, "phone_number" TEXT, "start_time" INTEGER,
+                                     "duration" INTEGER, "cases" TEXT);
+            """)
+            connection.executemany("""INSERT INTO "call" VALUES (?, ?, ?, ?, ?);""", (
+                (*call_to_row(call), '[' + ', '.join(f'"{case}"' for case in call.cases) + ']') for call in CALLS
+            ))
+
+        sqlite3_adapter_spi = self.open()
+
+        self.assertEqual(get_schema_version(self.connect()), len(MIGRATIONS))
+        self.assertEqual(list(map(key, sqlite3_adapter_spi.get_calls_by_date_range(datetime(2024, 1, 1),
+                                                                                   datetime(2024, 2, 1)))),
+                         list(map(key, CALLS)))
+        self.assertEqual(list(map(key, sqlite3_adapter_spi.search_calls("b"))), [key(CALLS[0])])
+        self.assertEqual(sqlite3_adapter_spi.get_call_summary(datetime(2024, 1, 15), datetime(2024, 1, 16)).call_count,
+                         2)
+        self.assertEqual(sqlite3_adapter_spi.get_data_version(), 0)
+
+    def test_migrations_are_idempotent(self) -> None:
+        self.open().store_calls(CALLS)
+        connection = self.connect()
+        before = [connection.execute(sql).fetchall() for sql in DERIVED_TABLES]
+
+        connection.execute("PRAGMA user_version=0;")
+        self.assertEqual(migrate(connection), len(MIGRATIONS))
+
+        self.assertEqual([connection.execute(sql).fetchall() for sql in DERIVED_TABLES], before)
+
+    def test_unsupported_schema_versions(self) -> None:
+        connection = self.connect()
+        connection.execute(f"PRAGMA user_version={len(MIGRATIONS) + 1};")
+        with self.assertRaises(sqlite3.DatabaseError), self.assertLogs(LOGGER, "ERROR"):
+            migrate(connection)
+
+        connection.execute(f"PRAGMA user_version={len(MIGRATIONS) - 1};")
+        with self.assertRaises(sqlite3.DatabaseError), self.assertLogs(LOGGER, "ERROR"):
+            verify_schema_version(connection)
+        with self.assertRaises(sqlite3.DatabaseError), self.assertLogs(LOGGER, "ERROR"):
+            SQLite3AdapterSPI(self.directory / "calls.db", read_only=True)
+
+    def test_data_version_counts_changed_calls(self) -> None:
+        sqlite3_adapter_spi = self.open()
+
+        stored = sqlite3_adapter_spi.store_calls(replace(call, id=None) for call in CALLS)
+        self.assertEqual(stored.data_version, 3)
+        updated = sqlite3_adapter_spi.update_calls((replace(stored[0], phone_number="0700000000", cases=("d",)),))
+        self.assertEqual(updated.data_version, 4)
+        deleted = sqlite3_adapter_spi.delete_calls(call.id for call in stored[1:])
+        self.assertEqual(deleted.data_version, 6)
+        self.assertEqual(sqlite3_adapter_spi.get_data_version(), 6)
+
+    def test_failed_write_leaves_data_version(self) -> None:
+        sqlite3_adapter_spi = self.open()
+        sqlite3_adapter_spi.store_calls(CALLS[:1])
+
+        # The second call reuses the id of the stored one, failing the whole batch
+        with self.assertRaises(sqlite3.IntegrityError):
+            sqlite3_adapter_spi.store_calls((replace(CALLS[1], id=None), CALLS[0]))
+
+        self.assertEqual(sqlite3_adapter_spi.get_data_version(), 1)
+        self.assertEqual(len(sqlite3_adapter_spi.get_calls_by_date_range(datetime(2024, 1, 1), datetime(2024, 2, 1))),
+                         1)
+
+    def test_batched_inserts_match_single_inserts(self) -> None:
+        self.open("batched.db").store_calls(CALLS)
+
+        # Inserted a row at a time, which the insert triggers maintain the derived tables for
+        self.open("single.db")
+        with self.connect("single.db") as connection:
+            for call in CALLS:
+                connection.execute(INSERT_CALL, with_end_time(call_to_row(call)))
+                connection.executemany(INSERT_CALL_CASE, case_rows(call.id, call.cases))
+
+        batched, single = self.connect("batched.db"), self.connect("single.db")
+        for sql in DERIVED_TABLES:
+            with self.subTest(sql=sql):
+                self.assertEqual(batched.execute(sql).fetchall(), single.execute(sql).fetchall())
+        self.assertEqual(batched.execute("""SELECT count(*) FROM "call_batch";""").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from app.core.model.call import Call
+from app.core.model.call_columns import CallColumns
+from app.core.model.report import Report
+from app.core.services.report_service import _interval_groups, _iter_interval_groups
+from app.core.services.vectorized_interval_groups import vectorized_interval_groups, vectorized_report
+
+INTERVAL_SIZES = (timedelta(minutes=15), timedelta(minutes=30), timedelta(minutes=60))
+
+
+def random_calls(rng: random.Random, count: int) -> list[Call]:
+    """Adversarial calls: bursts, gaps, exact interval multiples and calls lasting more than a day"""
+
+    start_time = datetime(2020, 1, 1) + timedelta(seconds=rng.randrange(86400))
+    calls = []
+    for id_ in range(count):
+        start_time += timedelta(seconds=rng.choice((0, 60, 300, 1800, 3600, 7200, rng.randrange(1, 86400))))
+        duration = timedelta(seconds=rng.choice((60, 300, 1500, 3600, rng.randrange(1, 7200),
+                                                 rng.randrange(1, 100000))))
+        calls.append(Call(id_, f"07{rng.randrange(10 ** 8):08}", start_time, duration, ()))
+    return calls
+
+
+def identities(groups: dict[datetime, tuple[Call, ...]] | None) -> dict[datetime, tuple[int, ...]] | None:
+    # Calls compare equal by start time only, so groups are compared by object identity instead
+    return None if groups is None else {interval: tuple(map(id, group)) for interval, group in groups.items()}
+
+
+class VectorizedIntervalGroupsTest(unittest.TestCase):
+    def test_randomized_equivalence(self) -> None:
+        rng = random.Random(0)
+        for trial in range(2000):
+            calls = random_calls(rng, rng.randrange(1, 100))
+            interval_size = rng.choice(INTERVAL_SIZES)
+            with self.subTest(trial=trial, interval_size=interval_size):
+                try:
+                    expected = _interval_groups(calls, interval_size)
+                except IndexError:
+                    expected = None
+                self.assertEqual(identities(vectorized_interval_groups(calls, interval_size)), identities(expected))
+                if expected is not None:
+                    report = Report.from_interval_groups(interval_size, _iter_interval_groups(calls, interval_size))
+                    self.assertEqual(vectorized_report(CallColumns.from_calls(calls), interval_size), report)
+
+    def test_call_columns_round_trip(self) -> None:
+        calls = random_calls(random.Random(1), 3000)
+        columns = CallColumns.from_calls(calls, batch_size=1024)
+        self.assertEqual(len(columns), len(calls))
+        self.assertEqual([(call.id, call.phone_number, call.start_time, call.duration, call.cases) for call in columns],
+                         [(call.id, call.phone_number, call.start_time, call.duration, call.cases) for call in calls])
+
+    def test_empty(self) -> None:
+        self.assertEqual(vectorized_interval_groups([], INTERVAL_SIZES[0]), {})
+        self.assertEqual(vectorized_report(CallColumns(), INTERVAL_SIZES[0]),
+                         Report.from_interval_groups(INTERVAL_SIZES[0], ()))
+
+    def test_unsupported_inputs(self) -> None:
+        calls = [Call(0, "0700000000", datetime(2020, 1, 1, microsecond=1), timedelta(minutes=5), ())]
+        self.assertIsNone(vectorized_interval_groups(calls, INTERVAL_SIZES[0]))
+        calls = [Call(0, "0700000000", datetime(2020, 1, 1), timedelta(minutes=5), ())]
+        self.assertIsNone(vectorized_interval_groups(calls, timedelta(seconds=1.5)))
+
+
+if __name__ == "__main__":
+    unittest.main()